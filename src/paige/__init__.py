@@ -6,15 +6,35 @@ from paige.path import (
     from_tools_dir,
     from_bin_dir,
     from_build_dir,
+    invalidate_path_cache,
 )
 from paige.generate import (
     generate_makefiles,
     create_generating_paigefile,
     compile_binary,
 )
-from paige.exec import command, output, context_with_env, run
-from paige.deps import Deps, SerialDeps, Fn
+from paige.components import generate_components
+from paige.exec import (
+    command,
+    output,
+    context_with_env,
+    run,
+    output_mmap,
+    async_command,
+    async_output,
+    async_run,
+    invalidate_env_cache,
+    run_many,
+    async_run_many,
+    CommandSpec,
+)
+from paige.deps import Deps, SerialDeps, AsyncDeps, Fn, target
+from paige.plan import PlannedDeps
+from paige.tools import Tool, tool
 from paige.namespace import Namespace
+from paige.logger import context_with_grouped_output, context_with_spooled_output
+from paige.scheduler import set_jobs
+from paige.cancel import TargetCancelled
 
 __all__ = [
     "Makefile",
@@ -24,15 +44,34 @@ __all__ = [
     "from_tools_dir",
     "from_bin_dir",
     "from_build_dir",
+    "invalidate_path_cache",
     "generate_makefiles",
     "create_generating_paigefile",
     "compile_binary",
+    "generate_components",
     "command",
     "output",
     "context_with_env",
     "run",
+    "output_mmap",
+    "async_command",
+    "async_output",
+    "async_run",
+    "invalidate_env_cache",
+    "run_many",
+    "async_run_many",
+    "CommandSpec",
     "Deps",
     "SerialDeps",
+    "AsyncDeps",
+    "PlannedDeps",
+    "Tool",
+    "tool",
     "Fn",
+    "target",
     "Namespace",
+    "set_jobs",
+    "TargetCancelled",
+    "context_with_grouped_output",
+    "context_with_spooled_output",
 ]
@@ -0,0 +1,514 @@
+"""Benchmarks of paige's hot paths and of synthetic large .paige projects.
+
+Results are written as JSON and can be compared with a stored baseline,
+reporting the benchmarks that got slower as regressions:
+
+    python -m paige.bench --output baseline.json
+    python -m paige.bench --compare baseline.json
+"""
+
+import argparse
+import importlib.util
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import paige
+from paige import deps
+from paige.deps import Deps, Runner
+from paige.exec import command, invalidate_env_cache, prepare_env
+from paige.fingerprint import paige_version, read_json, write_json_atomic
+from paige.generate import compile_binary
+from paige.logger import new_logger, with_logger
+from paige.makefile import Makefile, generate_makefile_content
+from paige.parser import PARSE_CACHE_FILE, generate_init_file, parse_python_files
+from paige.path import from_git_root, invalidate_path_cache
+
+# Version of the results file format
+BENCH_VERSION = 1
+
+# Slowdown relative to the baseline reported as a regression, 0.2 is 20% slower
+REGRESSION_THRESHOLD = 0.2
+
+# Number of dependencies in the Deps benchmarks
+DEPS_WIDTH = 20
+
+
+class ProjectShape:
+    """Size of a synthetic .paige project.
+
+    Each of the modules has targets spread over depth levels, every target
+    calling Deps on fan_out targets of the next level, which are shared
+    between the targets calling them.
+    """
+
+    def __init__(
+        self, modules: int = 20, targets: int = 25, fan_out: int = 3, depth: int = 4
+    ):
+        if min(modules, targets, fan_out, depth) < 1:
+            raise ValueError("project shape values must be at least 1")
+        self.modules = modules
+        self.targets = targets
+        self.fan_out = fan_out
+        self.depth = min(depth, targets)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "modules": self.modules,
+            "targets": self.targets,
+            "fan_out": self.fan_out,
+            "depth": self.depth,
+        }
+
+    def target_count(self) -> int:
+        return self.modules * self.targets
+
+    def levels(self) -> List[List[int]]:
+        """Returns the indices of the targets of a module on each level."""
+        levels: List[List[int]] = [[] for _ in range(self.depth)]
+        for i in range(self.targets):
+            levels[i * self.depth // self.targets].append(i)
+        return levels
+
+    def dependencies(self) -> Dict[int, List[int]]:
+        """Map each target of a module to the targets it calls Deps on."""
+        levels = self.levels()
+        calls: Dict[int, List[int]] = {}
+        for level, following in zip(levels, levels[1:] + [[]]):
+            for pos, i in enumerate(level):
+                picked = [
+                    following[(pos * self.fan_out + k) % len(following)]
+                    for k in range(min(self.fan_out, len(following)))
+                ]
+                calls[i] = sorted(set(picked))
+        return calls
+
+
+def module_source(module: int, shape: ProjectShape) -> str:
+    """Generate the source of a synthetic .paige module."""
+    lines = ["import paige as pg", ""]
+    for i, called in shape.dependencies().items():
+        lines.append("")
+        lines.append(f"def m{module}_t{i}(ctx):")
+        lines.append(f'    """Target {i} of module {module}."""')
+        if called:
+            names = ", ".join(f"m{module}_t{j}" for j in called)
+            lines.append(f"    pg.Deps(ctx, {names})")
+        else:
+            lines.append("    pass")
+    lines.append("")
+    return "\n".join(lines)
+
+
+class SyntheticProject:
+    """A git repository with a generated .paige directory of the given shape."""
+
+    def __init__(self, root: str, shape: ProjectShape):
+        self.root = root
+        self.shape = shape
+        self.paige_dir = os.path.join(root, ".paige")
+        self._roots: Optional[List[Callable]] = None
+
+        os.makedirs(self.paige_dir, exist_ok=True)
+        subprocess.check_call(["git", "init", "-q", root])
+        for module in range(shape.modules):
+            with open(self.module_path(module), "w") as f:
+                f.write(module_source(module, shape))
+        self.functions = parse_python_files(self.paige_dir)
+
+    def module_path(self, module: int) -> str:
+        return os.path.join(self.paige_dir, f"module{module}.py")
+
+    def leaf_target(self) -> str:
+        """Returns a target of the project which calls no other targets."""
+        return f"m0_t{self.shape.targets - 1}"
+
+    def root_targets(self) -> List[Callable]:
+        """Import the modules and return the targets no other target depends on."""
+        if self._roots is None:
+            self._roots = []
+            top = self.shape.levels()[0]
+            for module in range(self.shape.modules):
+                spec = importlib.util.spec_from_file_location(
+                    f"paige_bench_module{module}", self.module_path(module)
+                )
+                loaded = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(loaded)
+                self._roots.extend(getattr(loaded, f"m{module}_t{i}") for i in top)
+        return self._roots
+
+
+def measure(
+    fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.2
+) -> Dict[str, Any]:
+    """Time fn, returning the median and minimum seconds per call.
+
+    fn is called as many times per round as it takes to run for min_time, the
+    median is taken over repeat rounds.
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        # Aim for min_time, growing at most tenfold per step
+        number = max(
+            number + 1, min(number * 10, int(number * min_time / max(elapsed, 1e-9)))
+        )
+    times = [elapsed / number for elapsed in timer.repeat(repeat - 1, number)]
+    times.append(elapsed / number)
+    return {
+        "seconds": statistics.median(times),
+        "min": min(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+# Benchmarks by name, each a function setting up the call to time, and
+# whether its time is reported per target of the project
+BENCHMARKS: Dict[str, Tuple[Callable[[SyntheticProject], Callable[[], Any]], bool]] = {}
+
+
+def benchmark(name: str, per_target: bool = False):
+    """Register a benchmark, taking the project and returning the call to time."""
+
+    def register(make: Callable[[SyntheticProject], Callable[[], Any]]):
+        BENCHMARKS[name] = (make, per_target)
+        return make
+
+    return register
+
+
+def _noop(ctx: dict) -> None:
+    pass
+
+
+def _noop_targets() -> List[Callable]:
+    targets = []
+    for i in range(DEPS_WIDTH):
+
+        def fn(ctx: dict) -> None:
+            pass
+
+        fn.__name__ = fn.__qualname__ = f"bench_dep{i}"
+        targets.append(fn)
+    return targets
+
+
+@benchmark("deps")
+def bench_deps(project: SyntheticProject) -> Callable[[], Any]:
+    """Deps on targets that have not run yet, under a new Runner each call."""
+    ctx = with_logger({}, new_logger("paige.bench"))
+    targets = _noop_targets()
+
+    def run():
+        deps._runner = Runner()
+        Deps(ctx, *targets)
+
+    return run
+
+
+@benchmark("deps_cached")
+def bench_deps_cached(project: SyntheticProject) -> Callable[[], Any]:
+    """Deps on targets that already ran."""
+    ctx = with_logger({}, new_logger("paige.bench"))
+    targets = _noop_targets()
+    Deps(ctx, *targets)
+    return lambda: Deps(ctx, *targets)
+
+
+@benchmark("run_once")
+def bench_run_once(project: SyntheticProject) -> Callable[[], Any]:
+    """Runner.run_once of a key that has not run yet."""
+    runner = Runner()
+    keys = iter(range(sys.maxsize))
+    return lambda: runner.run_once({}, f"bench{next(keys)}", _noop)
+
+
+@benchmark("run_once_cached")
+def bench_run_once_cached(project: SyntheticProject) -> Callable[[], Any]:
+    """Runner.run_once of a key that already ran."""
+    runner = Runner()
+    runner.run_once({}, "bench", _noop)
+    return lambda: runner.run_once({}, "bench", _noop)
+
+
+@benchmark("from_git_root")
+def bench_from_git_root(project: SyntheticProject) -> Callable[[], Any]:
+    from_git_root()
+    return lambda: from_git_root(".paige", "build")
+
+
+@benchmark("from_git_root_uncached")
+def bench_from_git_root_uncached(project: SyntheticProject) -> Callable[[], Any]:
+    def run():
+        invalidate_path_cache()
+        from_git_root(".paige", "build")
+
+    return run
+
+
+@benchmark("prepare_env")
+def bench_prepare_env(project: SyntheticProject) -> Callable[[], Any]:
+    ctx: dict = {}
+    prepare_env(ctx)
+    return lambda: prepare_env(ctx)
+
+
+@benchmark("prepare_env_uncached")
+def bench_prepare_env_uncached(project: SyntheticProject) -> Callable[[], Any]:
+    ctx: dict = {}
+
+    def run():
+        invalidate_env_cache()
+        prepare_env(ctx)
+
+    return run
+
+
+@benchmark("command")
+def bench_command(project: SyntheticProject) -> Callable[[], Any]:
+    """Start a command and wait for it to exit."""
+    ctx = with_logger({}, new_logger("paige.bench"))
+    return lambda: command(ctx, "true").communicate()
+
+
+@benchmark("parse_python_files")
+def bench_parse_python_files(project: SyntheticProject) -> Callable[[], Any]:
+    """Parse the project's modules, all of them in the parse cache."""
+    return lambda: parse_python_files(project.paige_dir)
+
+
+@benchmark("parse_python_files_uncached")
+def bench_parse_python_files_uncached(project: SyntheticProject) -> Callable[[], Any]:
+    """Parse the project's modules without a parse cache."""
+    cache_path = os.path.join(project.paige_dir, "build", PARSE_CACHE_FILE)
+
+    def run():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        parse_python_files(project.paige_dir)
+
+    return run
+
+
+@benchmark("generate_init_file")
+def bench_generate_init_file(project: SyntheticProject) -> Callable[[], Any]:
+    return lambda: generate_init_file(project.functions, [], "0" * 64)
+
+
+@benchmark("generate_makefile_content")
+def bench_generate_makefile_content(project: SyntheticProject) -> Callable[[], Any]:
+    makefile = Makefile(
+        path=os.path.join(project.root, "Makefile"), default_target="m0_t0"
+    )
+    binary = os.path.join(project.paige_dir, "bin", "paigefile")
+    return lambda: generate_makefile_content(
+        makefile, project.functions, binary, [makefile]
+    )
+
+
+@benchmark("project_generate")
+def bench_project_generate(project: SyntheticProject) -> Callable[[], Any]:
+    """Parse the project and compile its binary from scratch."""
+    build_dir = os.path.join(project.paige_dir, "build")
+    bin_dir = os.path.join(project.paige_dir, "bin")
+
+    def run():
+        shutil.rmtree(build_dir, ignore_errors=True)
+        shutil.rmtree(bin_dir, ignore_errors=True)
+        compile_binary(paige_dir=project.paige_dir)
+
+    return run
+
+
+@benchmark("project_cold_start")
+def bench_project_cold_start(project: SyntheticProject) -> Callable[[], Any]:
+    """Run a target of the project through its binary in a new Python process."""
+    binary = compile_binary(paige_dir=project.paige_dir)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(paige.__file__)))
+    pythonpath = os.environ.get("PYTHONPATH")
+    env = dict(
+        os.environ,
+        PAIGE_DAEMON="false",
+        PYTHONPATH=package_parent + (os.pathsep + pythonpath if pythonpath else ""),
+    )
+    args = [sys.executable, binary, project.leaf_target()]
+    return lambda: subprocess.check_call(args, cwd=project.root, env=env)
+
+
+@benchmark("project_schedule", per_target=True)
+def bench_project_schedule(project: SyntheticProject) -> Callable[[], Any]:
+    """Run every target of the project through Deps, under a new Runner each call."""
+    ctx = with_logger({}, new_logger("paige.bench"))
+    roots = project.root_targets()
+
+    def run():
+        deps._runner = Runner()
+        Deps(ctx, *roots)
+
+    return run
+
+
+def run_benchmarks(
+    shape: ProjectShape,
+    names: Optional[List[str]] = None,
+    repeat: int = 5,
+    min_time: float = 0.2,
+) -> Dict[str, Any]:
+    """Run the benchmarks, all of them by default, in a project of the given shape."""
+    if names is None:
+        names = list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results: Dict[str, Any] = {}
+    cwd = os.getcwd()
+    runner = deps._runner
+    with tempfile.TemporaryDirectory() as root:
+        project = SyntheticProject(os.path.realpath(root), shape)
+        os.chdir(project.root)
+        invalidate_path_cache()
+        try:
+            for name in names:
+                make, per_target = BENCHMARKS[name]
+                result = measure(make(project), repeat, min_time)
+                if per_target:
+                    result["per_target"] = result["seconds"] / shape.target_count()
+                results[name] = result
+        finally:
+            os.chdir(cwd)
+            invalidate_path_cache()
+            deps._runner = runner
+
+    return {
+        "version": BENCH_VERSION,
+        "paige": paige_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "project": shape.as_dict(),
+        "benchmarks": results,
+    }
+
+
+def find_regressions(
+    baseline: Dict[str, Any],
+    results: Dict[str, Any],
+    threshold: float = REGRESSION_THRESHOLD,
+) -> List[str]:
+    """Describe the benchmarks that are more than threshold slower than in baseline.
+
+    Benchmarks missing from either side are not compared. Results of another
+    project shape or Python version are not comparable and raise ValueError.
+    """
+    if baseline.get("version") != BENCH_VERSION:
+        raise ValueError(
+            f"baseline has version {baseline.get('version')}, expected {BENCH_VERSION}"
+        )
+    for key in ("project", "python"):
+        if key in baseline and baseline[key] != results.get(key):
+            raise ValueError(
+                f"baseline has {key} {baseline[key]}, results have {results.get(key)}"
+            )
+    regressions = []
+    base_benchmarks = baseline.get("benchmarks", {})
+    for name, result in results.get("benchmarks", {}).items():
+        if name not in base_benchmarks:
+            continue
+        before = base_benchmarks[name]["seconds"]
+        after = result["seconds"]
+        if before > 0 and after > before * (1 + threshold):
+            regressions.append(
+                f"{name}: {format_seconds(before)} -> {format_seconds(after)} "
+                f"({(after / before - 1) * 100:+.0f}%)"
+            )
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def format_results(
+    results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """Lines of a table of the results, with the change against baseline if given."""
+    base_benchmarks = (baseline or {}).get("benchmarks", {})
+    lines = []
+    for name, result in results["benchmarks"].items():
+        line = f"{name:<28} {format_seconds(result['seconds']):>10}"
+        if "per_target" in result:
+            line += f"  ({format_seconds(result['per_target'])} per target)"
+        if name in base_benchmarks and base_benchmarks[name]["seconds"] > 0:
+            change = result["seconds"] / base_benchmarks[name]["seconds"] - 1
+            line += f"  {change * 100:+.0f}%"
+        lines.append(line)
+    return lines
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m paige.bench", description="Benchmark paige's hot paths."
+    )
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("-c", "--compare", help="baseline results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="slowdown reported as a regression, 0.2 is 20%% slower",
+    )
+    parser.add_argument(
+        "-k", "--filter", help="only run benchmarks matching this regex"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=25, help="targets per module")
+    parser.add_argument("--fan-out", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        baseline = read_json(args.compare)
+        if baseline is None:
+            parser.error(f"could not read baseline {args.compare}")
+
+    names = list(BENCHMARKS)
+    if args.filter:
+        names = [name for name in names if re.search(args.filter, name)]
+        if not names:
+            parser.error(f"no benchmarks match {args.filter!r}")
+    shape = ProjectShape(args.modules, args.targets, args.fan_out, args.depth)
+    results = run_benchmarks(shape, names, args.repeat, args.min_time)
+
+    print("\n".join(format_results(results, baseline)))
+    if args.output:
+        write_json_atomic(args.output, results)
+    if baseline is not None:
+        try:
+            regressions = find_regressions(baseline, results, args.threshold)
+        except ValueError as e:
+            sys.exit(f"cannot compare with {args.compare}: {e}")
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.compare}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,290 @@
+import atexit
+import os
+import signal
+import subprocess
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+# Set PAIGE_FAIL_FAST=true to cancel the other targets of a Deps call when one
+# fails. It defaults to on when CI is set.
+FAIL_FAST_ENV = "PAIGE_FAIL_FAST"
+
+# Context key for storing the cancel scope of a target
+CANCEL_SCOPE_KEY = "cancel_scope"
+
+# Seconds between terminating a cancelled command and killing it
+TERMINATE_GRACE_SECONDS = 5.0
+
+
+class TargetCancelled(RuntimeError):
+    """Raised in targets and commands stopped because another target failed."""
+
+
+class CancelScope:
+    """Cancellation shared by the targets of a Deps call and everything they run.
+
+    Cancelling a scope cancels the scopes nested in it, and terminates the
+    commands started under them. A fail_fast scope is cancelled on the first
+    failure, so the commands under it run in their own session.
+    """
+
+    def __init__(self, parent: Optional["CancelScope"] = None, fail_fast: bool = False):
+        self.parent = parent
+        self.fail_fast = fail_fast
+        self.reason = ""
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        scope = self
+        while scope is not None:
+            if scope._cancelled:
+                return True
+            scope = scope.parent
+        return False
+
+    @property
+    def cancellable(self) -> bool:
+        """Check if a failure cancels this scope, i.e. it or a parent is fail_fast."""
+        scope = self
+        while scope is not None:
+            if scope.fail_fast:
+                return True
+            scope = scope.parent
+        return False
+
+    def within(self, other: "CancelScope") -> bool:
+        """Check if this scope is other or nested in it."""
+        scope = self
+        while scope is not None:
+            if scope is other:
+                return True
+            scope = scope.parent
+        return False
+
+    def cancel(self, reason: str) -> None:
+        """Cancel the scope and terminate the commands running under it."""
+        if self._cancelled:
+            return
+        self.reason = reason
+        self._cancelled = True
+        _processes.terminate(self)
+
+    def check(self) -> None:
+        """Raise TargetCancelled if the scope was cancelled."""
+        if self.cancelled:
+            raise TargetCancelled(f"cancelled: {self.cancel_reason()}")
+
+    def cancel_reason(self) -> str:
+        scope = self
+        while scope is not None:
+            if scope._cancelled:
+                return scope.reason
+            scope = scope.parent
+        return ""
+
+
+def fail_fast_enabled() -> bool:
+    """Check if Deps should cancel the other targets when one fails."""
+    value = os.environ.get(FAIL_FAST_ENV)
+    if value is None:
+        value = os.environ.get("CI", "")
+    return value.lower() in ("true", "1", "yes", "on")
+
+
+def get_cancel_scope(ctx: dict) -> Optional[CancelScope]:
+    """Returns the cancel scope of the context, if any."""
+    return ctx.get(CANCEL_SCOPE_KEY)
+
+
+def with_cancel_scope(ctx: dict, fail_fast: bool = False) -> Tuple[dict, CancelScope]:
+    """Returns a context with a new cancel scope nested in the current one."""
+    scope = CancelScope(get_cancel_scope(ctx), fail_fast)
+    new_ctx = ctx.copy()
+    new_ctx[CANCEL_SCOPE_KEY] = scope
+    return new_ctx, scope
+
+
+def check_cancelled(ctx: dict) -> None:
+    """Raise TargetCancelled if the context's scope was cancelled."""
+    scope = ctx.get(CANCEL_SCOPE_KEY)
+    if scope is not None:
+        scope.check()
+
+
+def process_group_kwargs(ctx: dict) -> Dict[str, Any]:
+    """Popen arguments starting a command in its own session when it may be cancelled.
+
+    Terminating its session stops everything the command started. Other
+    commands stay in the process group of paige and keep its terminal, so
+    they get Ctrl-C and can prompt on it.
+    """
+    scope = get_cancel_scope(ctx)
+    if scope is not None and scope.cancellable:
+        return {"start_new_session": True}
+    return {}
+
+
+def _running(proc: Any) -> bool:
+    poll = getattr(proc, "poll", None)
+    if poll is not None:
+        return poll() is None
+    return proc.returncode is None
+
+
+def _signal(proc: Any, sig: int, group: bool) -> None:
+    try:
+        if group:
+            os.killpg(proc.pid, sig)
+        else:
+            os.kill(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+# The cancel scope of a registered command, and whether it has its own process group
+ProcessEntry = Tuple[Optional[CancelScope], bool]
+
+
+class ProcessRegistry:
+    """Running commands, and whether they have their own process group to stop.
+
+    Processes are held weakly, a command that was waited for and dropped is
+    forgotten. Commands that were sent SIGTERM are remembered, so their
+    failure can be told apart from one of their own. Whatever still runs when
+    paige exits, e.g. after Ctrl-C, is terminated.
+    """
+
+    def __init__(self):
+        # Reentrant, a signal handler may terminate the commands while the
+        # main thread holds it
+        self._lock = threading.RLock()
+        self._processes: "weakref.WeakKeyDictionary[Any, ProcessEntry]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._terminated: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._pid = os.getpid()
+        self._registered_exit = False
+
+    def add(self, proc: Any, scope: Optional[CancelScope], group: bool) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked, the processes belong to the parent
+                self._processes = weakref.WeakKeyDictionary()
+                self._terminated = weakref.WeakSet()
+                self._pid = os.getpid()
+            self._processes[proc] = (scope, group)
+            if not self._registered_exit:
+                atexit.register(self.terminate_all)
+                self._registered_exit = True
+        if scope is not None and scope.cancelled:
+            # Cancelled while the command was starting
+            self.terminate(scope)
+
+    def _select(self, scope: Optional[CancelScope]) -> List[Tuple[Any, bool]]:
+        with self._lock:
+            if self._pid != os.getpid():
+                return []
+            items = list(self._processes.items())
+        return [
+            (proc, group)
+            for proc, (proc_scope, group) in items
+            if _running(proc)
+            and (scope is None or proc_scope is not None and proc_scope.within(scope))
+        ]
+
+    def terminate(
+        self,
+        scope: Optional[CancelScope],
+        wait: bool = False,
+    ) -> None:
+        """Send SIGTERM to the commands of scope, all of them if None.
+
+        They get SIGKILL after TERMINATE_GRACE_SECONDS. Commands in their own
+        process group are signalled as a group, also when the command itself
+        exited but left processes behind.
+        """
+        procs = self._select(scope)
+        if not procs:
+            return
+        grace = TERMINATE_GRACE_SECONDS
+        with self._lock:
+            self._terminated.update(proc for proc, _ in procs)
+        for proc, group in procs:
+            _signal(proc, signal.SIGTERM, group)
+
+        def kill() -> None:
+            for proc, group in procs:
+                if group or _running(proc):
+                    _signal(proc, signal.SIGKILL, group)
+
+        if wait:
+            deadline = time.monotonic() + grace
+            for proc, _ in procs:
+                if hasattr(proc, "poll"):
+                    try:
+                        proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+                    except subprocess.TimeoutExpired:
+                        pass
+            kill()
+            return
+        timer = threading.Timer(grace, kill)
+        timer.daemon = True
+        timer.start()
+
+    def terminated(self, proc: Any) -> bool:
+        """Check if proc was still running when it was sent SIGTERM."""
+        with self._lock:
+            return proc in self._terminated
+
+    def terminate_all(self) -> None:
+        """Stop every command still running, waiting at most the grace period."""
+        self.terminate(None, wait=True)
+
+
+# Global registry of running commands
+_processes = ProcessRegistry()
+
+
+def register_process(proc: Any, ctx: dict) -> None:
+    """Track a command started with process_group_kwargs under the context's scope."""
+    _processes.add(proc, get_cancel_scope(ctx), bool(process_group_kwargs(ctx)))
+
+
+def process_terminated(proc: Any) -> bool:
+    """Check if a command was stopped because its scope was cancelled."""
+    return _processes.terminated(proc)
+
+
+def terminate_processes() -> None:
+    """Stop every running command, e.g. when interrupted."""
+    _processes.terminate_all()
+
+
+# Handlers replaced by _terminate_on_signal, restored before dying of the signal
+_previous_handlers: Dict[int, Any] = {}
+
+
+def _terminate_on_signal(signum: int, frame: Any) -> None:
+    terminate_processes()
+    signal.signal(signum, _previous_handlers.pop(signum, signal.SIG_DFL))
+    os.kill(os.getpid(), signum)
+
+
+def install_signal_handlers() -> None:
+    """Stop the running commands when paige gets SIGTERM or SIGHUP, then die of it.
+
+    Called by the entry points of paige, the generated binary and the daemon.
+    Signals that are ignored or handled outside Python are left alone. Handlers
+    can only be installed from the main thread, elsewhere this does nothing.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGTERM, signal.SIGHUP):
+        previous = signal.getsignal(sig)
+        if previous in (None, signal.SIG_IGN, _terminate_on_signal):
+            continue
+        _previous_handlers[sig] = previous
+        signal.signal(sig, _terminate_on_signal)
@@ -5,6 +5,8 @@ import sys
 
 from paige.path import from_paige_dir
 from paige.initfile import init_paige
+from paige.daemon import serve
+from paige.venv import sync_venv
 
 
 @click.group()
@@ -26,9 +28,12 @@ def install(package_name: str):
         sys.exit(1)
 
     try:
-        # Add package to pyproject.toml
+        # Add package to pyproject.toml, sync_venv installs it below
         result = subprocess.run(
-            ["uv", "add", package_name], cwd=paige_dir, capture_output=True, text=True
+            ["uv", "add", "--no-sync", package_name],
+            cwd=paige_dir,
+            capture_output=True,
+            text=True,
         )
 
         if result.returncode != 0:
@@ -36,6 +41,9 @@ def install(package_name: str):
             sys.exit(result.returncode)
 
         click.echo(f"Successfully added {package_name} to pyproject.toml")
+
+        # Install it without touching the shared cache, and record the result there
+        sync_venv(paige_dir)
         click.echo("Package is now available in the .paige environment")
 
     except Exception as e:
@@ -50,5 +58,21 @@ def init(python_version: str):
     init_paige(python_version)
 
 
+@cli.command()
+def daemon():
+    """Keeps .paige modules loaded so generated targets start without importing them."""
+    serve()
+
+
+@cli.command(context_settings={"ignore_unknown_options": True, "help_option_names": []})
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def bench(args):
+    """Benchmarks paige's hot paths, see paige bench --help."""
+    # Imported here, the other commands should not pay for it
+    from paige.bench import main as bench_main
+
+    bench_main(list(args))
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,184 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set
+
+from paige.const import PAIGE_DIR_NAME
+from paige.fingerprint import read_json, write_json_atomic
+from paige.generate import compile_binary, write_if_changed
+from paige.logger import get_logger, new_logger, with_logger
+from paige.parser import list_python_files, parse_paige_dirs
+from paige.path import from_build_dir, from_git_root, from_paige_dir
+from paige.scheduler import get_scheduler
+
+# Index of the components known to the aggregate entry point, in the root build directory
+COMPONENTS_FILE = "components.json"
+
+# Name of the aggregate entry point in the root .paige/bin directory
+COMPONENTS_BINARY = "components"
+
+
+def _ignored_dirs(root: str) -> Set[str]:
+    """Returns the directories under root that git ignores, or nothing outside git."""
+    try:
+        out = subprocess.check_output(
+            [
+                "git",
+                "ls-files",
+                "--others",
+                "--ignored",
+                "--exclude-standard",
+                "--directory",
+                "-z",
+            ],
+            cwd=root,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {
+        os.path.join(root, path.rstrip("/"))
+        for path in out.decode("utf-8", errors="replace").split("\0")
+        if path.endswith("/")
+    }
+
+
+def find_paige_dirs(root: Optional[str] = None) -> List[str]:
+    """Find every .paige directory with modules under root, the git root by default.
+
+    The tree is walked once with os.scandir. Directories git ignores are not
+    entered, and neither are the .paige directories themselves.
+    """
+    if root is None:
+        root = from_git_root()
+    ignored = _ignored_dirs(root)
+    found = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = [
+                    entry
+                    for entry in entries
+                    if entry.is_dir(follow_symlinks=False)
+                    and entry.name != ".git"
+                    and entry.path not in ignored
+                ]
+        except OSError:
+            continue
+        for entry in subdirs:
+            if entry.name == PAIGE_DIR_NAME:
+                if list_python_files(entry.path):
+                    found.append(entry.path)
+            else:
+                stack.append(entry.path)
+    return sorted(found)
+
+
+def component_name(paige_dir: str) -> str:
+    """Returns the name of the component owning paige_dir, its path from the git root."""
+    return os.path.relpath(os.path.dirname(paige_dir), from_git_root())
+
+
+def generate_components_file(components: Dict[str, str]) -> str:
+    """Generate the aggregate entry point running targets of a component's binary.
+
+    components maps each component name to its binary, relative to the git root.
+    """
+    lines = []
+    lines.append("#!/usr/bin/env python3")
+    lines.append("# Code generated by paige. DO NOT EDIT.")
+    lines.append("")
+    lines.append("import os")
+    lines.append("import sys")
+    lines.append("")
+    lines.append(
+        "ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))"
+    )
+    lines.append("")
+    lines.append("COMPONENTS = {")
+    for name, binary in sorted(components.items()):
+        lines.append(f"    {name!r}: {binary!r},")
+    lines.append("}")
+    lines.append("")
+    lines.append("")
+    lines.append("def main():")
+    lines.append("    if len(sys.argv) < 2:")
+    lines.append('        print("Components:")')
+    lines.append("        for name in COMPONENTS:")
+    lines.append('            print(f"\\t{name}")')
+    lines.append("        sys.exit(0)")
+    lines.append("")
+    lines.append("    name = sys.argv[1]")
+    lines.append("    if name not in COMPONENTS:")
+    lines.append('        print(f"unknown component specified: {name}")')
+    lines.append("        sys.exit(1)")
+    lines.append("    binary = os.path.join(ROOT, COMPONENTS[name])")
+    lines.append("    # Hand over to the component's binary, which runs the targets")
+    lines.append(
+        "    os.execv(sys.executable, [sys.executable, binary, *sys.argv[2:]])"
+    )
+    lines.append("")
+    lines.append("")
+    lines.append("if __name__ == '__main__':")
+    lines.append("    main()")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def generate_components(paige_dirs: Optional[List[str]] = None) -> Dict[str, str]:
+    """Compile a binary for each component and the aggregate entry point to them.
+
+    Without paige_dirs, the whole repository is searched with find_paige_dirs.
+    With paige_dirs, only those components are regenerated and added to the
+    ones already known, so the repository is not scanned again. Returns the
+    components mapped to their binaries, relative to the git root.
+    """
+    logger = get_logger(with_logger({}, new_logger("paige")))
+    index_path = from_build_dir(COMPONENTS_FILE)
+    root = from_git_root()
+
+    if paige_dirs is None:
+        paige_dirs = find_paige_dirs(root)
+        components: Dict[str, str] = {}
+    else:
+        paige_dirs = [os.path.abspath(d) for d in paige_dirs]
+        components = dict((read_json(index_path) or {}).get("components", {}))
+
+    # Parse all components together, then compile their binaries in parallel
+    parsed = parse_paige_dirs(paige_dirs)
+    binaries: Dict[str, str] = {}
+
+    def compile_component(paige_dir: str) -> None:
+        functions = parsed[paige_dir]
+        if functions:
+            binaries[paige_dir] = compile_binary(functions, paige_dir)
+        else:
+            logger.warning(f"no target functions found in {paige_dir}")
+
+    tasks = get_scheduler().run_all(
+        [lambda d=d: compile_component(d) for d in paige_dirs]
+    )
+    for task in tasks:
+        if task.error is not None:
+            raise task.error
+
+    for paige_dir in paige_dirs:
+        name = component_name(paige_dir)
+        if paige_dir in binaries:
+            components[name] = os.path.relpath(binaries[paige_dir], root)
+        else:
+            components.pop(name, None)
+
+    write_json_atomic(index_path, {"components": components})
+    entry_point = from_paige_dir("bin", COMPONENTS_BINARY)
+    content = generate_components_file(components)
+    write_if_changed(entry_point, content, mode=0o755)
+    logger.info(f"Generated {len(components)} components: {entry_point}")
+    return components
+
+
+if __name__ == "__main__":
+    # python -m paige.components [path/to/.paige ...]
+    generate_components(sys.argv[1:] or None)
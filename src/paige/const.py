@@ -5,6 +5,9 @@ MAKEFILE_NAME = "Makefile"
 GITHUB_URL = "https://github.com/TheodorEmanuelsson/paige.git"
 GITHUB_URL_SHORT = f"git+{GITHUB_URL}"
 
+# Context key for the chain of targets leading to the current one
+DEPENDENCY_CHAIN_KEY = "dependency_chain"
+
 
 UV_CONTENT = """\
 [project]
@@ -20,6 +23,7 @@ dependencies = [
 GITIGNORE_CONTENT = """\
 /.gitignore
 /bin
+/build
 /include
 /lib
 pyvenv.cfg
@@ -0,0 +1,224 @@
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+from paige.cancel import install_signal_handlers
+from paige.deps import Fn, run_main_targets
+from paige.logger import flush_logs, new_logger
+from paige.parser import build_target_table, list_python_files, parse_python_files
+from paige.path import from_build_dir, from_paige_dir, invalidate_path_cache
+from paige.report import reset_recorder, write_report
+from paige.trace import reset_tracer, save_trace
+
+# Socket of the daemon, relative to .paige/build
+SOCKET_NAME = "daemon.sock"
+
+# Set PAIGE_DAEMON=false to make the generated binary ignore a running daemon
+DAEMON_ENV = "PAIGE_DAEMON"
+
+# Size of the length header preceding each request
+HEADER_SIZE = 8
+
+
+def socket_path() -> str:
+    """Returns the path of the daemon socket."""
+    return from_build_dir(SOCKET_NAME)
+
+
+class Daemon:
+    """Keeps the .paige modules imported in a warm process and runs targets for clients.
+
+    Each request is served by a forked child, which inherits the imported
+    modules, takes over the client's stdin/stdout/stderr and reports the exit
+    status back over the socket. Modules are reloaded when .paige sources change.
+    """
+
+    def __init__(self):
+        self.paige_dir = from_paige_dir()
+        self.logger = new_logger("paige.daemon")
+        self.table: Dict[str, Tuple[str, Optional[str], str, int]] = {}
+        self._signature = None
+
+    def serve(self) -> None:
+        path = socket_path()
+        if os.path.exists(path):
+            os.remove(path)
+
+        sys.path.insert(0, self.paige_dir)
+        self.reload_if_changed()
+
+        # Children are reaped automatically, they report their status themselves
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(path)
+            os.chmod(path, 0o600)
+            server.listen()
+            self.logger.info(f"paige daemon listening on {path}")
+            while True:
+                conn, _ = server.accept()
+                self.reload_if_changed()
+                self._fork(conn)
+        finally:
+            server.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sources_signature(self) -> List[Tuple[str, int, int]]:
+        """Cheap signature of the .paige sources, compared before each request."""
+        signature = []
+        for py_file in list_python_files(self.paige_dir):
+            st = os.stat(os.path.join(self.paige_dir, py_file))
+            signature.append((py_file, st.st_mtime_ns, st.st_size))
+        return signature
+
+    def reload_if_changed(self) -> None:
+        signature = self.sources_signature()
+        if signature == self._signature:
+            return
+        if self._signature is not None:
+            self.logger.info(".paige sources changed, reloading modules")
+
+        # Forget the previously imported modules so they are imported again,
+        # including helpers without targets
+        self.forget_paige_modules()
+        importlib.invalidate_caches()
+
+        self.table = build_target_table(parse_python_files())
+        self._signature = signature
+
+        # Import every module up front so forked children start warm
+        for module_name in {entry[0] for entry in self.table.values()}:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                self.logger.error(f"Could not import {module_name}: {e}")
+
+    def forget_paige_modules(self) -> None:
+        """Remove the modules loaded from the .paige directory from sys.modules.
+
+        Packages installed in its virtual environment, paige among them, are kept.
+        """
+        paige_dir = os.path.realpath(self.paige_dir)
+        kept = (os.path.join(paige_dir, ".venv"), os.path.realpath(sys.prefix))
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None)
+            if not path:
+                continue
+            path = os.path.realpath(path)
+            if os.path.commonpath([path, paige_dir]) != paige_dir:
+                continue
+            if any(os.path.commonpath([path, k]) == k for k in kept):
+                continue
+            del sys.modules[name]
+
+    def _fork(self, conn: socket.socket) -> None:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid != 0:
+            conn.close()
+            return
+
+        code = 1
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            install_signal_handlers()
+            code = self._handle(conn)
+        except SystemExit as e:
+            code = 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            # The child exits without running atexit handlers
+            try:
+                save_trace()
+                write_report()
+            except OSError as e:
+                print(f"could not write trace or report: {e}", file=sys.stderr)
+            flush_logs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            try:
+                conn.sendall(json.dumps({"exit": code}).encode("utf-8"))
+            except OSError:
+                pass
+            os._exit(code)
+
+    def _handle(self, conn: socket.socket) -> int:
+        """Run a single request in the forked child and return its exit code."""
+        header, fds, _, _ = socket.recv_fds(conn, HEADER_SIZE, 3)
+        length = int.from_bytes(header, "big")
+        payload = b""
+        while len(payload) < length:
+            chunk = conn.recv(length - len(payload))
+            if not chunk:
+                raise ConnectionError("client disconnected")
+            payload += chunk
+        request = json.loads(payload)
+
+        # Take over the client's standard streams, working directory and environment
+        for target_fd, fd in enumerate(fds):
+            os.dup2(fd, target_fd)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        invalidate_path_cache()
+        reset_tracer()
+        reset_recorder()
+
+        # The client closing the connection early means it was interrupted
+        threading.Thread(target=self._watch_client, args=(conn,), daemon=True).start()
+
+        calls = []
+        for target, args in request["calls"]:
+            if target not in self.table:
+                print(f"unknown target specified: {target}")
+                return 1
+            calls.append((self.table[target], args))
+        run_targets(calls)
+        return 0
+
+    def _watch_client(self, conn: socket.socket) -> None:
+        try:
+            conn.recv(1)
+        except OSError:
+            pass
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+def run_targets(
+    calls: List[Tuple[Tuple[str, Optional[str], str, int], List[str]]],
+) -> None:
+    """Run target table entries with their command line arguments in order.
+
+    The targets share one runner, so dependencies they have in common run once.
+    A failure is raised as it is, see run_main_targets.
+    """
+    fns = []
+    for entry, args in calls:
+        module_name, namespace, func_name, arity = entry
+        module = importlib.import_module(module_name)
+        if namespace:
+            # Call as method on namespace instance
+            fn = getattr(getattr(module, namespace)(), func_name)
+        else:
+            fn = getattr(module, func_name)
+        fns.append(Fn(fn, *args[:arity]))
+    run_main_targets({}, *fns)
+
+
+def serve() -> None:
+    """Run the paige daemon until it is interrupted."""
+    try:
+        Daemon().serve()
+    except KeyboardInterrupt:
+        pass
@@ -1,7 +1,31 @@
+import asyncio
+import inspect
+import json
+import os
 import threading
-from typing import List, Callable, Union
-
-from paige.logger import get_logger
+from typing import Awaitable, Dict, List, Callable, Optional, Tuple, Union
+
+from paige.cancel import (
+    CancelScope,
+    TargetCancelled,
+    check_cancelled,
+    fail_fast_enabled,
+    with_cancel_scope,
+)
+from paige.const import DEPENDENCY_CHAIN_KEY
+from paige.exec import CMD_ENV_KEY, run_coroutine
+from paige.fingerprint import TargetStamp
+from paige.logger import (
+    get_logger,
+    grouped_output_enabled,
+    with_output_group,
+    with_target_logger,
+)
+from paige.pool import run_in_process
+from paige.report import get_recorder
+from paige.report import now as report_now
+from paige.scheduler import get_scheduler
+from paige.trace import Tracer, get_tracer
 
 
 class Target:
@@ -19,13 +43,82 @@ class Target:
         """Run the Target."""
         raise NotImplementedError
 
+    async def run_async(self, ctx: dict) -> None:
+        """Run the Target from an event loop, by default on a separate thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self.run, ctx)
+
+    def dependencies(self) -> List["Target"]:
+        """Targets declared to run before this one, used by PlannedDeps."""
+        return []
+
+
+class TargetOptions:
+    """Declarative options of a target function, see the target decorator."""
+
+    def __init__(
+        self,
+        inputs: Optional[List[str]] = None,
+        outputs: Optional[List[str]] = None,
+        env: Optional[List[str]] = None,
+        deps: Optional[List[Union["Target", Callable]]] = None,
+        process: Optional[bool] = None,
+    ):
+        # Input globs and output paths are relative to the git root
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.env = list(env or [])
+        self.deps = list(deps or [])
+        # Run in the shared process pool instead of a thread, see paige.pool
+        self.process = bool(process)
+
+    def tracks_files(self) -> bool:
+        """Check if the target declared inputs or outputs and can be skipped when up to date."""
+        return bool(self.inputs or self.outputs)
+
+
+# Attribute used by the target decorator to store options on a function
+TARGET_OPTIONS_ATTR = "__paige_options__"
+
+# Set PAIGE_FORCE=true to rerun targets even when they are up to date
+FORCE_ENV = "PAIGE_FORCE"
+
+
+def target(
+    inputs: Optional[List[str]] = None,
+    outputs: Optional[List[str]] = None,
+    env: Optional[List[str]] = None,
+    deps: Optional[List[Union["Target", Callable]]] = None,
+    process: bool = False,
+) -> Callable[[Callable], Callable]:
+    """Declare the input globs, output paths, environment variables and dependencies of a target.
+
+    A target with inputs or outputs is skipped when its inputs, arguments and
+    environment are unchanged and its outputs are untouched since the last
+    successful run. Inputs the target rewrites itself, like a formatter does,
+    are declared as outputs too. deps are run before the target by PlannedDeps.
+    A target with process set runs in a worker process, for CPU-bound Python code.
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        options = TargetOptions(inputs, outputs, env, deps, process)
+        setattr(fn, TARGET_OPTIONS_ATTR, options)
+        return fn
+
+    return decorate
+
+
+def get_target_options(fn: Callable) -> TargetOptions:
+    """Returns the options declared on a target function."""
+    return getattr(fn, TARGET_OPTIONS_ATTR, None) or TargetOptions()
+
 
 class FnTarget(Target):
     """Creates a Target from a compatible function and args."""
 
-    def __init__(self, target: Callable, *args):
+    def __init__(self, target: Callable, *args, options: TargetOptions = None):
         self.target = target
         self.args = args
+        self.options = options or get_target_options(target)
         self._name = self._get_function_name()
         self._id = self._generate_id()
 
@@ -35,30 +128,155 @@ class FnTarget(Target):
 
     def _generate_id(self) -> str:
         """Generate unique ID for this function call."""
-        import json
-
         args_json = json.dumps(self.args)
+        if inspect.ismethod(self.target):
+            # Methods of different namespaces may share a name
+            return f"{self.target.__qualname__}({args_json})"
         return f"{self.target.__name__}({args_json})"
 
+    def _stamp(self, ctx: dict) -> TargetStamp:
+        """Create the stamp recording successful runs of this function call."""
+        key = f"{self.target.__module__}.{self.target.__qualname__}({json.dumps(self.args)})"
+        return TargetStamp(
+            key,
+            self.options.inputs,
+            self.options.outputs,
+            self.options.env,
+            ctx.get(CMD_ENV_KEY, ()),
+        )
+
     def name(self) -> str:
         return self._name
 
     def id(self) -> str:
         return self._id
 
+    def dependencies(self) -> List[Target]:
+        return check_functions(*self.options.deps)
+
+    def is_async(self) -> bool:
+        """Check if the target function is a coroutine function."""
+        return inspect.iscoroutinefunction(self.target)
+
+    def _start(self, ctx: dict) -> Tuple[bool, Optional[TargetStamp]]:
+        """Returns whether the target is up to date, and the stamp to save after it ran."""
+        if not self.options.tracks_files():
+            return False, None
+        stamp = self._stamp(ctx)
+        stamp.take_inputs()
+        if not is_true(os.environ.get(FORCE_ENV, "")) and stamp.up_to_date():
+            get_logger(ctx).info(f"{self.name()} is up to date")
+            return True, None
+        return False, stamp
+
+    def _failed(self, ctx: dict, e: Exception) -> None:
+        if isinstance(e, TargetCancelled):
+            # Not an error of this target, see report_errors
+            return
+        if get_logger(ctx):
+            get_logger(ctx).error(f"Error in {self.name()}: {e}")
+
     def run(self, ctx: dict) -> None:
-        """Run the target function."""
+        """Run the target function, skipping it if its declared outputs are up to date."""
+        up_to_date, stamp = self._start(ctx)
+        if up_to_date:
+            return
+
         try:
-            self.target(ctx, *self.args)
+            if self.options.process:
+                run_in_process(ctx, self.target, self.args)
+            elif self.is_async():
+                run_coroutine(self.target(ctx, *self.args))
+            else:
+                self.target(ctx, *self.args)
         except Exception as e:
-            if get_logger(ctx):
-                get_logger(ctx).error(f"Error in {self.name()}: {e}")
+            self._failed(ctx, e)
             raise
 
+        if stamp:
+            stamp.save()
+
+    async def run_async(self, ctx: dict) -> None:
+        """Await the target function, running it on a separate thread if it is not async."""
+        if self.options.process or not self.is_async():
+            await super().run_async(ctx)
+            return
 
-def Fn(target: Callable, *args) -> Target:
-    """Create a Target from a compatible function and args."""
-    return FnTarget(target, *args)
+        up_to_date, stamp = self._start(ctx)
+        if up_to_date:
+            return
+
+        try:
+            await self.target(ctx, *self.args)
+        except Exception as e:
+            self._failed(ctx, e)
+            raise
+
+        if stamp:
+            stamp.save()
+
+
+def Fn(
+    target: Callable,
+    *args,
+    inputs: Optional[List[str]] = None,
+    outputs: Optional[List[str]] = None,
+    env: Optional[List[str]] = None,
+    deps: Optional[List[Union[Target, Callable]]] = None,
+    process: Optional[bool] = None,
+) -> Target:
+    """Create a Target from a compatible function and args.
+
+    inputs, outputs, env, deps and process override the options declared with
+    the target decorator.
+    """
+    options = None
+    overrides = (inputs, outputs, env, deps, process)
+    if any(option is not None for option in overrides):
+        options = TargetOptions(*overrides)
+    return FnTarget(target, *args, options=options)
+
+
+class Once:
+    """State of a function run at most once, shared by the sync and async paths of Runner."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """Mark the function started, returning False if it already was."""
+        with self._lock:
+            first = not self._started
+            self._started = True
+            return first
+
+    def begin(self) -> Callable[[Optional[Exception]], None]:
+        """Start recording the first run, returning the function that ends it."""
+        tracer = get_tracer()
+        recorder = get_recorder()
+        start = tracer.now() if tracer else 0
+        recorded_start = report_now() if recorder else 0
+
+        def end(error: Optional[Exception]) -> None:
+            self.error = error
+            if tracer:
+                trace_target(tracer, self.key, start, error)
+            if recorder:
+                recorder.add_timing(self.key, recorded_start, report_now())
+            self.done.set()
+
+        return end
+
+    def hit(self) -> None:
+        """Record a call deduplicated by the once-cache."""
+        tracer = get_tracer()
+        if tracer:
+            args = {"id": self.key, "done": self.done.is_set()}
+            tracer.instant(self.key, "run-once", args)
 
 
 class Runner:
@@ -66,33 +284,69 @@ class Runner:
 
     def __init__(self):
         self._lock = threading.Lock()
-        self._once_fns = {}
+        self._once: Dict[str, Once] = {}
 
-    def run_once(self, ctx: dict, key: str, fn: Callable[[dict], None]) -> None:
-        """Run function exactly once and always return the result from the initial run."""
+    def _get(self, key: str) -> Once:
         with self._lock:
-            if key not in self._once_fns:
-                self._once_fns[key] = self._make_once_fn(fn)
-
-        self._once_fns[key](ctx)
+            if key not in self._once:
+                self._once[key] = Once(key)
+            return self._once[key]
 
-    def _make_once_fn(self, fn: Callable[[dict], None]) -> Callable[[dict], None]:
-        """Create a function that runs exactly once."""
-        result = {"error": None, "run": False}
+    def run_once(self, ctx: dict, key: str, fn: Callable[[dict], None]) -> None:
+        """Run function exactly once and always return the result from the initial run."""
+        once = self._get(key)
+        if once.claim():
+            end = once.begin()
+            error = None
+            try:
+                fn(ctx)
+            except Exception as e:
+                error = e
+            finally:
+                end(error)
+        else:
+            once.hit()
+            if not once.done.is_set():
+                # Another thread is running it, free our slot while we wait
+                with get_scheduler().blocking():
+                    once.done.wait()
+
+        if once.error:
+            raise once.error
+
+    async def run_once_async(
+        self, ctx: dict, key: str, fn: Callable[[dict], Awaitable[None]]
+    ) -> None:
+        """Await a coroutine function exactly once, sharing the once-cache with run_once."""
+        once = self._get(key)
+        if once.claim():
+            end = once.begin()
+            error = None
+            try:
+                await fn(ctx)
+            except Exception as e:
+                error = e
+            finally:
+                end(error)
+        else:
+            once.hit()
+            if not once.done.is_set():
+                # Running elsewhere, possibly on another thread
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, once.done.wait)
 
-        def once_fn(ctx: dict) -> None:
-            if not result["run"]:
-                try:
-                    fn(ctx)
-                except Exception as e:
-                    result["error"] = e
-                finally:
-                    result["run"] = True
+        if once.error:
+            raise once.error
 
-            if result["error"]:
-                raise result["error"]
 
-        return once_fn
+def trace_target(
+    tracer: Tracer, key: str, start: float, error: Optional[Exception]
+) -> None:
+    """Record the span of a target run by the Runner."""
+    args = {"id": key}
+    if error:
+        args["error"] = str(error)
+    tracer.complete(key, "target", start, tracer.now(), args)
 
 
 # Global runner instance
@@ -117,10 +371,6 @@ def is_true(s: str) -> bool:
     return s.lower() in ("true", "1", "yes", "on")
 
 
-# Context key for dependency chain
-DEPENDENCY_CHAIN_KEY = "dependency_chain"
-
-
 def get_dependencies(ctx: dict) -> List[Target]:
     """Get the current dependency chain from context."""
     return ctx.get(DEPENDENCY_CHAIN_KEY, [])
@@ -130,6 +380,9 @@ def with_dependency(ctx: dict, target: Target) -> dict:
     """Create a new context with an additional dependency."""
     new_ctx = ctx.copy()
     dependencies = get_dependencies(ctx)
+    recorder = get_recorder()
+    if recorder and dependencies:
+        recorder.add_edge(dependencies[-1].id(), target.id())
     dependencies = dependencies + [target]
     new_ctx[DEPENDENCY_CHAIN_KEY] = dependencies
     return new_ctx
@@ -140,6 +393,7 @@ def Deps(ctx: dict, *functions: Union[Target, Callable]) -> None:
 
     Dependencies must be of type function or Target.
     Each function will be run exactly once, even across multiple calls to Deps.
+    At most PAIGE_JOBS targets run at the same time, see paige.scheduler.
     """
     if not functions:
         return
@@ -147,7 +401,24 @@ def Deps(ctx: dict, *functions: Union[Target, Callable]) -> None:
     # Convert functions to targets
     targets = check_functions(*functions)
 
-    # Check for dependency cycles
+    check_cycles(ctx, targets)
+
+    # Run targets in parallel on the shared scheduler, in a scope cancelled
+    # on the first failure with fail-fast
+    fail_fast = fail_fast_enabled()
+    group_ctx, scope = with_cancel_scope(ctx, fail_fast)
+    fns = []
+    for target in targets:
+        target_ctx = with_dependency(group_ctx, target)
+        fns.append(lambda t=target, tc=target_ctx: run_target(tc, t, scope, fail_fast))
+
+    tasks = get_scheduler().run_all(fns)
+    errors = [(t.name(), task.error) for t, task in zip(targets, tasks) if task.error]
+    report_errors(ctx, errors)
+
+
+def check_cycles(ctx: dict, targets: List[Target]) -> None:
+    """Raise if any of the targets is already on the dependency chain."""
     for target in targets:
         dependencies = get_dependencies(ctx)
         for dep in dependencies:
@@ -156,39 +427,131 @@ def Deps(ctx: dict, *functions: Union[Target, Callable]) -> None:
                 msg = f"dependency cycle calling {target.name()}! chain: {','.join(dep_names)}"
                 raise RuntimeError(msg)
 
-    # Run targets in parallel
-    errors = []
-    threads = []
 
-    for target in targets:
-        target_ctx = with_dependency(ctx, target)
+def run_target(
+    ctx: dict,
+    target: Target,
+    scope: Optional[CancelScope] = None,
+    fail_fast: bool = False,
+) -> None:
+    """Run a target once through the global runner, grouping its output if enabled.
 
-        def run_target(t=target, tc=target_ctx):
-            try:
-                _runner.run_once(tc, t.id(), t.run)
-            except Exception as e:
-                errors.append((t.name(), e))
+    Its lines are prefixed with its name, see with_target_logger. A target
+    whose scope was cancelled is not started. With fail_fast, a failure
+    cancels scope, stopping the other targets in it.
+    """
+    check_cancelled(ctx)
+    ctx = with_target_logger(ctx, target.name())
+    try:
+        if not grouped_output_enabled(ctx):
+            _runner.run_once(ctx, target.id(), target.run)
+            return
+        ctx, group = with_output_group(ctx)
+        try:
+            _runner.run_once(ctx, target.id(), target.run)
+        finally:
+            group.flush()
+    except Exception as e:
+        if fail_fast and scope is not None and not isinstance(e, TargetCancelled):
+            scope.cancel(f"{target.name()} failed")
+        raise
+
+
+async def AsyncDeps(ctx: dict, *functions: Union[Target, Callable]) -> None:
+    """Run each of the provided functions concurrently on the running event loop.
+
+    Async targets are awaited directly, so a single thread can supervise many
+    of them. Other targets run on separate threads. Targets share the run-once
+    cache with Deps.
+    """
+    if not functions:
+        return
+
+    targets = check_functions(*functions)
+    check_cycles(ctx, targets)
+
+    fail_fast = fail_fast_enabled()
+    group_ctx, scope = with_cancel_scope(ctx, fail_fast)
+    results = await asyncio.gather(
+        *[
+            run_target_async(with_dependency(group_ctx, t), t, scope, fail_fast)
+            for t in targets
+        ],
+        return_exceptions=True,
+    )
+    for result in results:
+        # Let cancellation and interrupts through instead of reporting them
+        if isinstance(result, BaseException) and not isinstance(result, Exception):
+            raise result
+    errors = [
+        (t.name(), result)
+        for t, result in zip(targets, results)
+        if isinstance(result, Exception)
+    ]
+    report_errors(ctx, errors)
+
+
+async def run_target_async(
+    ctx: dict,
+    target: Target,
+    scope: Optional[CancelScope] = None,
+    fail_fast: bool = False,
+) -> None:
+    """Await a target once through the global runner, grouping its output if enabled.
+
+    Prefixes and cancellation work as in run_target.
+    """
+    check_cancelled(ctx)
+    ctx = with_target_logger(ctx, target.name())
+    try:
+        if not grouped_output_enabled(ctx):
+            await _runner.run_once_async(ctx, target.id(), target.run_async)
+            return
+        ctx, group = with_output_group(ctx)
+        try:
+            await _runner.run_once_async(ctx, target.id(), target.run_async)
+        finally:
+            group.flush()
+    except Exception as e:
+        if fail_fast and scope is not None and not isinstance(e, TargetCancelled):
+            scope.cancel(f"{target.name()} failed")
+        raise
 
-        thread = threading.Thread(target=run_target)
-        threads.append(thread)
-        thread.start()
 
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
+def report_errors(ctx: dict, errors: List[Tuple[str, BaseException]]) -> None:
+    """Log the errors of failed targets and raise if there are any.
 
-    # Report errors
+    Targets that were cancelled because another one failed are not errors of
+    their own. When all targets were cancelled, the cancellation is raised.
+    """
+    cancelled = [name for name, error in errors if isinstance(error, TargetCancelled)]
+    errors = [(n, e) for n, e in errors if not isinstance(e, TargetCancelled)]
+    logger = get_logger(ctx)
+    if cancelled:
+        logger.info(f"Cancelled {len(cancelled)} targets: {', '.join(cancelled)}")
     if errors:
         for name, error in errors:
-            logger = get_logger(ctx)
             if logger:
                 logger.error(f"Error in {name}: {error}")
             else:
                 print(f"Error in {name}: {error}")
         raise RuntimeError(f"Errors occurred in {len(errors)} targets")
+    if cancelled:
+        check_cancelled(ctx)
+        raise TargetCancelled(f"cancelled: {', '.join(cancelled)}")
 
 
 def SerialDeps(ctx: dict, *targets: Union[Target, Callable]) -> None:
     """Run all dependencies serially instead of in parallel."""
     for target in targets:
         Deps(ctx, target)
+
+
+def run_main_targets(ctx: dict, *functions: Union[Target, Callable]) -> None:
+    """Run the targets given on the command line in order, each once like Deps.
+
+    Unlike SerialDeps, the first failure is raised as it is rather than
+    collected, so its own traceback is shown. The target logs it once.
+    """
+    for target in check_functions(*functions):
+        run_target(with_dependency(ctx, target), target)
@@ -1,13 +1,64 @@
+import asyncio
+import logging
+import mmap
 import os
+import re
+import shutil
 import subprocess
-
-from paige.path import from_git_root, from_bin_dir, from_paige_dir
-from paige.logger import get_logger
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import (
+    IO,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from paige.cancel import (
+    TargetCancelled,
+    check_cancelled,
+    fail_fast_enabled,
+    process_group_kwargs,
+    process_terminated,
+    register_process,
+    with_cancel_scope,
+)
+from paige.const import DEPENDENCY_CHAIN_KEY
+from paige.path import from_git_root, from_build_dir, from_paige_dir
+from paige.logger import get_logger, get_line_logger, spooled_output_enabled
+from paige.scheduler import get_scheduler
+from paige.trace import TracedPopen, Tracer, get_tracer, trace_command
+
+T = TypeVar("T")
 
 
 # Context key for storing environment variables
 CMD_ENV_KEY = "cmd_env"
 
+# Number of stderr lines kept by run for the error message
+STDERR_TAIL_LINES = 50
+
+# Seconds between the lines shown from a spooled command, and bytes read for them
+SPOOL_TAIL_INTERVAL = 1.0
+SPOOL_TAIL_BYTES = 4096
+
+# Bytes read from the end of a log file for the error message of a spooled command
+SPOOL_ERROR_BYTES = 64 * 1024
+
+# Bytes read at a time from the output of async commands
+PUMP_CHUNK_SIZE = 64 * 1024
+
 
 def clean_up_paige_executable():
     """Clean up the paige executable."""
@@ -23,55 +74,211 @@ def context_with_env(ctx: dict, *env_vars: str) -> dict:
     return new_ctx
 
 
-def command(ctx: dict, path: str, *args: str) -> subprocess.Popen:
-    """Should be used when returning exec.Cmd from tools to set opinionated standard fields."""
+def command(
+    ctx: dict,
+    path: str,
+    *args: str,
+    text: bool = True,
+    stdout: Union[int, IO] = subprocess.PIPE,
+    stderr: Union[int, IO] = subprocess.PIPE,
+) -> subprocess.Popen:
+    """Should be used when returning exec.Cmd from tools to set opinionated standard fields.
+
+    Pass text=False to read the output as bytes, and stdout or stderr to send
+    the output somewhere other than a pipe.
+    """
+    # Commands of a cancelled target are not started
+    check_cancelled(ctx)
+
     # Create command with context
     cmd_args = [path] + list(args)
-    cmd = subprocess.Popen(
-        cmd_args,
-        cwd=from_git_root("."),
-        env=prepare_env(ctx),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
+    env = _command_env.environ(tuple(ctx.get(CMD_ENV_KEY, ())))
+    cwd = from_git_root(".")
+    kwargs = dict(
+        cwd=cwd,
+        env=env,
+        stdout=stdout,
+        stderr=stderr,
+        text=text,
+        # Its own session when cancellable, to stop it with everything it started
+        **process_group_kwargs(ctx),
     )
+    # Start the resolved executable, argv[0] stays as given
+    executable = _command_env.executable(path, env, cwd)
+    try:
+        cmd = _popen(cmd_args, executable=executable, **kwargs)
+    except FileNotFoundError:
+        if executable is None:
+            raise
+        # The cached executable is gone, look it up again
+        _command_env.forget(path)
+        cmd = _popen(cmd_args, **kwargs)
+    register_process(cmd, ctx)
     return cmd
 
 
-def prepare_env(ctx: dict) -> dict:
-    """Prepare environment variables for command execution."""
-    env = os.environ.copy()
-
-    # Add environment variables from context
-    if CMD_ENV_KEY in ctx:
-        env_vars = ctx[CMD_ENV_KEY]
+def _popen(cmd_args: List[str], **kwargs) -> subprocess.Popen:
+    tracer = get_tracer()
+    if tracer:
+        # Record the command until it is waited for, see paige.trace
+        return TracedPopen(tracer, cmd_args, **kwargs)
+    return subprocess.Popen(cmd_args, **kwargs)
+
+
+class CommandEnv:
+    """Caches the environment commands are started with, and where their executables are.
+
+    The base environment, os.environ with the bin directories prepended to
+    PATH, is built once and shared read-only until os.environ, the git root or
+    one of the bin directories changes. Installing a tool into a bin directory
+    changes its modification time, which also forgets the resolved
+    executables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (hash of os.environ, bin directory state, base environment, PATH prefix)
+        self._snapshot: Union[Tuple[int, tuple, Mapping[str, str], str], None] = None
+        self._executables: Dict[Tuple[str, str, str], str] = {}
+
+    def _bin_dirs(self) -> tuple:
+        dirs = []
+        for directory in (from_paige_dir("bin"), from_paige_dir(".venv", "bin")):
+            try:
+                dirs.append((directory, os.stat(directory).st_mtime_ns))
+            except OSError:
+                dirs.append((directory, None))
+        return tuple(dirs)
+
+    def _refresh(self) -> Tuple[int, tuple, Mapping[str, str], str]:
+        # Hashing the items is much cheaper than building the environment
+        environ_key = hash(frozenset(os.environ.items()))
+        state = self._bin_dirs()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[:2] == (environ_key, state):
+            return snapshot
+        # Bin directory first, then the paige virtualenv, e.g. for ruff
+        prefix = "".join(f"{d}:" for d, mtime in state if mtime is not None)
+        base = dict(os.environ)
+        base["PATH"] = prefix + base.get("PATH", "")
+        snapshot = (environ_key, state, MappingProxyType(base), prefix)
+        with self._lock:
+            self._snapshot = snapshot
+            self._executables = {}
+        return snapshot
+
+    def environ(self, env_vars: Tuple[str, ...] = ()) -> Mapping[str, str]:
+        """Returns the base environment with env_vars (KEY=VALUE) applied.
+
+        Without env_vars the shared, read-only base environment is returned.
+        """
+        _, _, base, prefix = self._refresh()
+        if not env_vars:
+            return base
+        env = dict(base)
         for env_var in env_vars:
             if "=" in env_var:
                 key, value = env_var.split("=", 1)
+                if key == "PATH":
+                    value = prefix + value
                 env[key] = value
+        return env
+
+    def executable(
+        self, name: str, env: Mapping[str, str], cwd: str
+    ) -> Union[str, None]:
+        """Returns the absolute path of name on the PATH of env, or None when not found.
+
+        Relative PATH entries are resolved against cwd, the directory the
+        command runs in. Names containing a path separator are not looked up.
+        """
+        if os.sep in name:
+            return None
+        key = (name, env.get("PATH", ""), cwd)
+        path = self._executables.get(key)
+        if path is None:
+            # An empty entry is the current directory
+            search_path = os.pathsep.join(
+                os.path.join(cwd, entry) for entry in key[1].split(os.pathsep)
+            )
+            # Misses are not cached, the tool may be installed later
+            path = shutil.which(name, path=search_path)
+            if path is not None:
+                self._executables[key] = path
+        return path
+
+    def forget(self, name: str) -> None:
+        """Forget where name was found, e.g. after it was removed."""
+        for key in [key for key in self._executables if key[0] == name]:
+            self._executables.pop(key, None)
+
+    def invalidate(self) -> None:
+        """Forget the base environment and all resolved executables."""
+        with self._lock:
+            self._snapshot = None
+            self._executables = {}
+
+
+# Global command environment cache
+_command_env = CommandEnv()
+
+
+def invalidate_env_cache() -> None:
+    """Forget the cached command environment and resolved executables."""
+    _command_env.invalidate()
+
+
+def prepare_env(ctx: dict) -> dict:
+    """Prepare environment variables for command execution."""
+    return dict(_command_env.environ(tuple(ctx.get(CMD_ENV_KEY, ()))))
+
+
+# A line starting with path:line or path:line:col, where path is not just a number
+FILE_REFERENCE_PATTERN = re.compile(r"\s*(?!\d+:)([^\s:]+):\d+")
 
-    # Prepend .paige/.venv/bin directory to PATH for commands like ruff
-    paige_venv_bin = from_paige_dir(".venv", "bin")
-    if os.path.exists(paige_venv_bin):
-        env["PATH"] = f"{paige_venv_bin}:{env.get('PATH', '')}"
+# Number of paths whose existence is remembered by has_file_references
+PATH_CACHE_SIZE = 4096
 
-    # Prepend bin directory to PATH
-    bin_dir = from_bin_dir()
-    if os.path.exists(bin_dir):
-        env["PATH"] = f"{bin_dir}:{env.get('PATH', '')}"
 
-    return env
+class PathExistsCache:
+    """Bounded, thread-safe cache of os.path.exists results, evicting the oldest entries."""
+
+    def __init__(self, size: int = PATH_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._exists: "OrderedDict[str, bool]" = OrderedDict()
+
+    def exists(self, path: str) -> bool:
+        with self._lock:
+            if path in self._exists:
+                self._exists.move_to_end(path)
+                return self._exists[path]
+        exists = os.path.exists(path)
+        with self._lock:
+            self._exists[path] = exists
+            if len(self._exists) > self.size:
+                self._exists.popitem(last=False)
+        return exists
+
+    def clear(self) -> None:
+        with self._lock:
+            self._exists.clear()
+
+
+# Shared by all LogWriters
+_path_cache = PathExistsCache()
 
 
 def has_file_references(line: str) -> bool:
-    """Check if a line contains file references (e.g., lint errors)."""
-    line = line.strip()
-    if ":" in line:
-        # Check if the part before ':' is a valid file path
-        file_part = line.split(":", 1)[0]
-        if os.path.exists(file_part):
-            return True
-    return False
+    """Check if a line contains file references (e.g., lint errors).
+
+    Only lines shaped like path:line[:col] are checked against the filesystem,
+    and the result is cached per path.
+    """
+    match = FILE_REFERENCE_PATTERN.match(line)
+    if not match:
+        return False
+    return _path_cache.exists(match.group(1))
 
 
 class LogWriter:
@@ -84,9 +291,13 @@ class LogWriter:
         self.has_file_references = False
 
     def write(self, data: str):
-        """Write data with proper logging."""
-        lines = data.split("\n")
-        for line in lines:
+        """Write data with proper logging.
+
+        Lines printed without the logger prefix, and the empty line before
+        them, are written to the output stream in a single call.
+        """
+        batch = []
+        for line in data.split("\n"):
             if not line.strip():
                 continue
 
@@ -95,18 +306,19 @@ class LogWriter:
                 if self.has_file_references:
                     # Print empty line with logger prefix to enable GitHub autodetection
                     if self.logger:
-                        self.logger.info("")
+                        batch.append(getattr(self.logger, "prefix", ""))
 
             if self.has_file_references:
                 # Print line without logger prefix for file references
-                line = line.strip()
-                print(line, file=self.output_stream)
-            else:
+                batch.append(line.strip())
+            elif self.logger:
                 # Print with logger prefix
-                if self.logger:
-                    self.logger.info(line)
-                else:
-                    print(line, file=self.output_stream)
+                self.logger.info(line)
+            else:
+                batch.append(line)
+
+        if batch:
+            self.output_stream.write("\n".join(batch) + "\n")
 
     def flush(self):
         """Flush the output stream."""
@@ -114,9 +326,12 @@ class LogWriter:
             self.output_stream.flush()
 
 
-def output(cmd: subprocess.Popen) -> str:
+def output(cmd: subprocess.Popen) -> Union[str, bytes]:
     """Run the given command, and return all output from stdout in a neatly, trimmed manner,
-    raising an exception if an error occurs."""
+    raising an exception if an error occurs.
+
+    Returns bytes for a command created with text=False.
+    """
     stdout, stderr = cmd.communicate()
     if cmd.returncode != 0:
         raise RuntimeError(f"{cmd.args[0]} failed: {stderr}")
@@ -134,34 +349,511 @@ def run_command_output(ctx: dict, path: str, *args: str) -> str:
     return output(cmd)
 
 
+def _pump_lines(stream, handle: Callable[[str], None]) -> None:
+    """Pass each line of stream to handle as soon as it arrives."""
+    try:
+        for line in stream:
+            handle(line)
+    finally:
+        stream.close()
+
+
 def run(ctx: dict, path: str, *args: str) -> None:
-    """Run a command and log its output, handling empty output gracefully."""
-    logger = get_logger(ctx)
-    cmd = command(ctx, path, *args)
+    """Run a command and log its output, handling empty output gracefully.
 
-    stdout, stderr = cmd.communicate()
+    stdout and stderr are streamed to the logger line by line while the command
+    runs. Only the last STDERR_TAIL_LINES lines of stderr are kept for the error.
+    With spooled output, see run_spooled, the output goes to a log file instead.
+    """
+    if spooled_output_enabled(ctx):
+        run_spooled(ctx, path, *args)
+        return
 
-    # Log stdout if there is any
-    if stdout.strip():
-        for line in stdout.strip().split("\n"):
-            if line.strip():
-                logger.info(line.strip())
+    log = get_line_logger(ctx)
+    cmd = command(ctx, path, *args)
 
-    # Log stderr if there is any
-    if stderr.strip():
-        for line in stderr.strip().split("\n"):
-            if line.strip():
-                logger.warning(line.strip())
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    state = {"output": False}
+
+    def on_stdout(line: str) -> None:
+        line = line.strip()
+        if line:
+            state["output"] = True
+            log(logging.INFO, line)
+
+    def on_stderr(line: str) -> None:
+        line = line.strip()
+        if line:
+            state["output"] = True
+            stderr_tail.append(line)
+            log(logging.WARNING, line)
+
+    # Read stderr on a helper thread so neither pipe can fill up and block the command
+    stderr_thread = threading.Thread(
+        target=_pump_lines, args=(cmd.stderr, on_stderr), daemon=True
+    )
+    stderr_thread.start()
+    _pump_lines(cmd.stdout, on_stdout)
+    stderr_thread.join()
+    cmd.wait()
 
     # Check return code
     if cmd.returncode != 0:
         error_msg = (
-            stderr.strip()
-            if stderr.strip()
+            "\n".join(stderr_tail)
+            if stderr_tail
             else f"{path} failed with exit code {cmd.returncode}"
         )
+        # Stopped because another target failed
+        check_cancelled(ctx)
         raise RuntimeError(error_msg)
 
     # If no output but command succeeded, log a success message
-    if not stdout.strip() and not stderr.strip():
-        logger.info(f"{path} completed successfully")
+    if not state["output"]:
+        log(logging.INFO, f"{path} completed successfully")
+
+
+# Target logs truncated by this process, and the lock held while appending to them
+_opened_logs = set()
+_opened_logs_lock = threading.Lock()
+
+
+def target_log_path(ctx: dict) -> str:
+    """Returns the log file of the target running with ctx, under the build directory."""
+    chain = ctx.get(DEPENDENCY_CHAIN_KEY)
+    name = chain[-1].id() if chain else "paige"
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+    return from_build_dir("logs", f"{name}.log")
+
+
+def append_target_log(log_path: str, data: IO[bytes]) -> None:
+    """Append data to a target log, truncating the log on first use in this process.
+
+    Appends are serialized and the log is opened with O_APPEND, so output of
+    commands finishing at the same time is never interleaved or overwritten.
+    """
+    with _opened_logs_lock:
+        mode = "ab" if log_path in _opened_logs else "wb"
+        _opened_logs.add(log_path)
+        with open(log_path, mode) as log_file:
+            shutil.copyfileobj(data, log_file)
+
+
+def _last_line(data: bytes) -> str:
+    lines = [line for line in data.splitlines() if line.strip()]
+    return lines[-1].decode(errors="replace").strip() if lines else ""
+
+
+def run_spooled(ctx: dict, path: str, *args: str) -> None:
+    """Run a command writing its raw output to the target's log file.
+
+    The output is never decoded or held in memory. Each command spools to its
+    own file, appended to the target log when it exits, so commands of a target
+    running at the same time keep their output apart. While the command runs,
+    its latest line is shown at most every SPOOL_TAIL_INTERVAL seconds. If it
+    fails, the error holds its last STDERR_TAIL_LINES lines.
+    """
+    log = get_line_logger(ctx)
+    log_path = target_log_path(ctx)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with tempfile.TemporaryFile(dir=os.path.dirname(log_path)) as out:
+        fd = out.fileno()
+        out.write(f"$ {' '.join([path, *args])}\n".encode())
+        out.flush()
+        start = out.tell()
+        cmd = command(
+            ctx, path, *args, text=False, stdout=out, stderr=subprocess.STDOUT
+        )
+
+        # Show the latest line now and then, reading only the end of the new output
+        stop = threading.Event()
+
+        def show_tail() -> None:
+            shown = start
+            while not stop.wait(SPOOL_TAIL_INTERVAL):
+                size = os.fstat(fd).st_size
+                if size > shown:
+                    tail_start = max(shown, size - SPOOL_TAIL_BYTES)
+                    line = _last_line(os.pread(fd, size - tail_start, tail_start))
+                    if line:
+                        log(logging.INFO, line)
+                    shown = size
+
+        tail_thread = threading.Thread(target=show_tail, daemon=True)
+        tail_thread.start()
+        try:
+            cmd.wait()
+        finally:
+            stop.set()
+            tail_thread.join()
+        end = os.fstat(fd).st_size
+
+        data = b""
+        if cmd.returncode != 0:
+            error_start = max(start, end - SPOOL_ERROR_BYTES)
+            data = os.pread(fd, end - error_start, error_start)
+        out.seek(0)
+        append_target_log(log_path, out)
+
+    if cmd.returncode != 0:
+        lines = data.decode(errors="replace").strip().splitlines()[-STDERR_TAIL_LINES:]
+        message = f"{path} failed with exit code {cmd.returncode}, output in {log_path}"
+        check_cancelled(ctx)
+        raise RuntimeError("\n".join([message, *lines]))
+
+    log(logging.INFO, f"{path} completed, output in {log_path}")
+
+
+def output_mmap(ctx: dict, path: str, *args: str) -> Union[mmap.mmap, bytes]:
+    """Run a command and return its stdout as a read-only memory map, without copying it.
+
+    stdout is written to a temporary file under the build directory, which is
+    removed once the map is closed. Empty output is returned as b"".
+    """
+    tmp_dir = from_build_dir("tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    with tempfile.TemporaryFile(dir=tmp_dir) as out:
+        cmd = command(ctx, path, *args, text=False, stdout=out)
+        _pump_lines(cmd.stderr, stderr_tail.append)
+        cmd.wait()
+        if cmd.returncode != 0:
+            stderr = b"".join(stderr_tail).decode(errors="replace")
+            check_cancelled(ctx)
+            raise RuntimeError(f"{path} failed: {stderr}")
+        if os.fstat(out.fileno()).st_size == 0:
+            return b""
+        # The map stays valid after the file is closed and removed
+        return mmap.mmap(out.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+async def async_command(ctx: dict, path: str, *args: str) -> asyncio.subprocess.Process:
+    """Start a command on the running event loop with the same fields as command."""
+    check_cancelled(ctx)
+    tracer = get_tracer()
+    start = tracer.now() if tracer else 0
+    env = _command_env.environ(tuple(ctx.get(CMD_ENV_KEY, ())))
+    cwd = from_git_root(".")
+    proc = await asyncio.create_subprocess_exec(
+        path,
+        *args,
+        executable=_command_env.executable(path, env, cwd),
+        cwd=cwd,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **process_group_kwargs(ctx),
+    )
+    register_process(proc, ctx)
+    # Like Popen.args, for error messages
+    proc.args = [path, *args]
+    if tracer:
+        # Record the command when it is waited for, like TracedPopen
+        _trace_async_wait(tracer, [path, *args], start, proc)
+    return proc
+
+
+def _trace_async_wait(
+    tracer: Tracer, argv: List[str], start: float, proc: asyncio.subprocess.Process
+) -> None:
+    wait = proc.wait
+    state = {"traced": False}
+
+    async def traced_wait() -> int:
+        code = await wait()
+        if not state["traced"]:
+            state["traced"] = True
+            trace_command(tracer, argv, start, code)
+        return code
+
+    proc.wait = traced_wait
+
+
+def _decode(data: bytes) -> str:
+    return data.decode(errors="replace")
+
+
+async def async_output(proc: asyncio.subprocess.Process) -> str:
+    """Await the given command, and return all output from stdout in a neatly, trimmed manner,
+    raising an exception if an error occurs."""
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{proc.args[0]} failed: {_decode(stderr)}")
+    return _decode(stdout).strip()
+
+
+async def _pump_lines_async(
+    stream: asyncio.StreamReader, handle: Callable[[str], None]
+) -> None:
+    """Pass each line of stream to handle as soon as it arrives.
+
+    The stream is read in chunks and split here, since StreamReader.readline
+    fails on lines longer than its buffer limit.
+    """
+    pending = b""
+    while True:
+        chunk = await stream.read(PUMP_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            handle(_decode(line + b"\n"))
+    if pending:
+        handle(_decode(pending))
+
+
+async def _kill_async(proc: asyncio.subprocess.Process) -> None:
+    """Kill a command and wait for it to exit."""
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    await proc.wait()
+
+
+async def _pump_output(
+    proc: asyncio.subprocess.Process,
+    on_stdout: Callable[[str], None],
+    on_stderr: Callable[[str], None],
+) -> None:
+    """Pass the output lines of a command to the handlers until it closes its output.
+
+    On any error, e.g. raised by a handler, the command is killed and reaped.
+    """
+    pumps = [
+        asyncio.ensure_future(_pump_lines_async(proc.stdout, on_stdout)),
+        asyncio.ensure_future(_pump_lines_async(proc.stderr, on_stderr)),
+    ]
+    try:
+        await asyncio.gather(*pumps)
+    except BaseException:
+        for pump in pumps:
+            pump.cancel()
+        await _kill_async(proc)
+        raise
+
+
+async def async_run(ctx: dict, path: str, *args: str) -> None:
+    """Run a command on the running event loop and log its output, like run."""
+    log = get_line_logger(ctx)
+    proc = await async_command(ctx, path, *args)
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    state = {"output": False}
+
+    def on_stdout(line: str) -> None:
+        line = line.strip()
+        if line:
+            state["output"] = True
+            log(logging.INFO, line)
+
+    def on_stderr(line: str) -> None:
+        line = line.strip()
+        if line:
+            state["output"] = True
+            stderr_tail.append(line)
+            log(logging.WARNING, line)
+
+    await _pump_output(proc, on_stdout, on_stderr)
+    await proc.wait()
+
+    # Check return code
+    if proc.returncode != 0:
+        error_msg = (
+            "\n".join(stderr_tail)
+            if stderr_tail
+            else f"{path} failed with exit code {proc.returncode}"
+        )
+        check_cancelled(ctx)
+        raise RuntimeError(error_msg)
+
+    # If no output but command succeeded, log a success message
+    if not state["output"]:
+        log(logging.INFO, f"{path} completed successfully")
+
+
+def run_coroutine(coro: Awaitable[T]) -> T:
+    """Run a coroutine to completion from synchronous code and return its result."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # This thread already runs an event loop, so use a fresh one on another thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+# Number of output lines of each failed command shown in the error of run_many
+RUN_MANY_ERROR_LINES = 10
+
+
+class CommandSpec:
+    """A command for run_many, with the name its output lines are prefixed with.
+
+    env holds KEY=VALUE pairs set for this command only, on top of the ones
+    set with context_with_env.
+    """
+
+    def __init__(self, *argv: str, name: Optional[str] = None, env: Sequence[str] = ()):
+        if not argv:
+            raise ValueError("a command needs at least the path of the executable")
+        self.argv = list(argv)
+        self.name = name or " ".join(argv)
+        self.env = tuple(env)
+
+
+class CommandResult:
+    """The outcome of a command run by run_many.
+
+    exit_code is None for a command that never started because another one
+    failed with fail_fast, and cancelled is set for it and for commands that
+    were stopped for that reason. error holds an exception raised while
+    running the command, e.g. by its output handling, after which it was
+    killed. output_tail holds the last lines of output.
+    """
+
+    def __init__(self, spec: CommandSpec):
+        self.spec = spec
+        self.exit_code: Optional[int] = None
+        self.error: Optional[Exception] = None
+        self.duration = 0.0
+        self.output_tail: List[str] = []
+        self.cancelled = False
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and self.error is None
+
+    def __repr__(self) -> str:
+        return (
+            f"CommandResult(name={self.spec.name!r}, exit_code={self.exit_code}, "
+            f"duration={self.duration:.3f})"
+        )
+
+
+def _command_spec(command: Union[CommandSpec, Sequence[str]]) -> CommandSpec:
+    if isinstance(command, CommandSpec):
+        return command
+    if isinstance(command, str):
+        raise ValueError(f"expected an argv list, not the string {command!r}")
+    return CommandSpec(*command)
+
+
+async def async_run_many(
+    ctx: dict,
+    commands: Sequence[Union[CommandSpec, Sequence[str]]],
+    max_parallel: Optional[int] = None,
+    fail_fast: Optional[bool] = None,
+    check: bool = True,
+) -> List[CommandResult]:
+    """Run commands on the running event loop, see run_many."""
+    if max_parallel is not None and max_parallel < 1:
+        raise ValueError(f"max_parallel must be at least 1, not {max_parallel}")
+    specs = [_command_spec(command) for command in commands]
+    results = [CommandResult(spec) for spec in specs]
+    semaphore = asyncio.Semaphore(max_parallel or get_scheduler().jobs)
+    if fail_fast is None:
+        fail_fast = fail_fast_enabled()
+    # Cancelling the scope stops these commands only; it is nested in the
+    # caller's scope, so cancelling that one stops them as well
+    scope_ctx, scope = with_cancel_scope(ctx, fail_fast)
+    log = get_line_logger(ctx)
+    base_env = tuple(ctx.get(CMD_ENV_KEY, ()))
+
+    async def run_one(result: CommandResult) -> None:
+        spec = result.spec
+        async with semaphore:
+            if scope.cancelled:
+                result.cancelled = True
+                return
+            tail = deque(maxlen=STDERR_TAIL_LINES)
+            prefix = f"[{spec.name}] "
+
+            def handler(level: int) -> Callable[[str], None]:
+                def handle(line: str) -> None:
+                    line = line.rstrip()
+                    if line:
+                        tail.append(line)
+                        log(level, prefix + line)
+
+                return handle
+
+            start = time.perf_counter()
+            try:
+                cmd_ctx = context_with_env(scope_ctx, *base_env, *spec.env)
+                proc = await async_command(cmd_ctx, *spec.argv)
+            except TargetCancelled:
+                result.cancelled = True
+                return
+            except OSError as e:
+                # Report a command that cannot be started like the shell does
+                result.exit_code = 127
+                result.output_tail = [str(e)]
+                log(logging.WARNING, prefix + str(e))
+            else:
+                try:
+                    await _pump_output(
+                        proc, handler(logging.INFO), handler(logging.WARNING)
+                    )
+                except Exception as e:
+                    # The command was killed, the error is reported with the others
+                    result.error = e
+                    log(logging.WARNING, f"{prefix}{type(e).__name__}: {e}")
+                result.exit_code = await proc.wait()
+                result.output_tail = list(tail)
+                # Only commands stopped by the scope, not those failing on their own
+                result.cancelled = (
+                    result.error is None
+                    and result.exit_code != 0
+                    and process_terminated(proc)
+                )
+            result.duration = time.perf_counter() - start
+            if fail_fast and not result.ok and not scope.cancelled:
+                scope.cancel(f"{spec.name} failed")
+
+    await asyncio.gather(*[run_one(result) for result in results])
+
+    if check and any(r.cancelled for r in results):
+        # Stopped because a target outside failed, rather than one of ours
+        check_cancelled(ctx)
+    failed = [r for r in results if not r.ok and not r.cancelled]
+    if check and failed:
+        lines = [f"{len(failed)} of {len(results)} commands failed:"]
+        for result in failed:
+            if result.error is not None:
+                error = result.error
+                lines.append(f"[{result.spec.name}] {type(error).__name__}: {error}")
+            else:
+                lines.append(f"[{result.spec.name}] exit code {result.exit_code}")
+            lines += [
+                f"  {line}" for line in result.output_tail[-RUN_MANY_ERROR_LINES:]
+            ]
+        cancelled = sum(r.cancelled for r in results)
+        if cancelled:
+            lines.append(f"{cancelled} commands were cancelled")
+        raise RuntimeError("\n".join(lines))
+    return results
+
+
+def run_many(
+    ctx: dict,
+    commands: Sequence[Union[CommandSpec, Sequence[str]]],
+    max_parallel: Optional[int] = None,
+    fail_fast: Optional[bool] = None,
+    check: bool = True,
+) -> List[CommandResult]:
+    """Run many commands, at most max_parallel at a time, and log their output.
+
+    Commands are argv lists or CommandSpecs. Each output line is logged as it
+    arrives, prefixed with the name of its command. max_parallel must be at
+    least 1 and defaults to the job limit. All commands run even when some fail, unless fail_fast is
+    set, which stops the running commands and skips the rest on the first
+    failure. It defaults to PAIGE_FAIL_FAST, see paige.cancel. The failures
+    are raised as one error at the end, pass check=False to get the results
+    instead.
+    """
+    return run_coroutine(
+        async_run_many(ctx, commands, max_parallel, fail_fast=fail_fast, check=check)
+    )
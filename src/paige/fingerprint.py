@@ -0,0 +1,173 @@
+import glob
+import hashlib
+import importlib.metadata
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+from paige.const import PACKAGE_NAME
+from paige.path import from_build_dir, from_git_root
+
+# Directory under .paige/build holding the stamps of successful target runs
+STAMPS_DIR = "stamps"
+
+
+def hash_json(value: Any) -> str:
+    """Returns a stable sha256 hex digest of a JSON serializable value."""
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def hash_files(paths: Iterable[str]) -> str:
+    """Returns a sha256 hex digest over the names and contents of files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def paige_version() -> str:
+    """Returns the installed paige version, or "unknown" when running from a source tree."""
+    try:
+        return importlib.metadata.version(PACKAGE_NAME)
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def stat_signature(path: str) -> Optional[List[int]]:
+    """Returns [size, mtime_ns] for a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def expand_globs(patterns: Iterable[str]) -> List[str]:
+    """Expand glob patterns relative to the git root into a sorted list of files."""
+    root = from_git_root()
+    files = set()
+    for pattern in patterns:
+        if not os.path.isabs(pattern):
+            pattern = os.path.join(root, pattern)
+        for match in glob.glob(pattern, recursive=True):
+            if os.path.isfile(match):
+                files.add(match)
+    return sorted(files)
+
+
+def temporary_path(path: str) -> str:
+    """Return a path next to path to build it in, unique per process and thread."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@contextmanager
+def atomic_write(path: str, mode: Optional[int] = None) -> Iterator[IO[str]]:
+    """Open a temporary file that replaces path once the block succeeds.
+
+    Readers never see partial content. The file gets mode, if given.
+    """
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, "w") as f:
+            yield f
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path: str, value: Any) -> None:
+    """Write JSON to path through a temporary file so readers never see partial content."""
+    with atomic_write(path) as f:
+        json.dump(value, f, sort_keys=True)
+
+
+def read_json(path: str) -> Optional[Any]:
+    """Read JSON from path, returning None if it is missing or invalid."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class TargetStamp:
+    """Records the fingerprint of a target's last successful run.
+
+    The fingerprint covers the target key, its input files (size and mtime),
+    the declared environment variables and the context environment. The
+    target is up to date when the fingerprint matches and none of its outputs
+    changed since the stamp was written.
+
+    The input files are taken before the run, so an input edited while the
+    target runs makes it run again. Inputs that are also outputs are taken
+    again after the run: a formatter that rewrites them is up to date next
+    time.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        inputs: List[str],
+        outputs: List[str],
+        env: List[str],
+        cmd_env: Iterable[str] = (),
+    ):
+        self.key = key
+        self.inputs = inputs
+        self.outputs = outputs
+        self.env = env
+        self.cmd_env = list(cmd_env)
+        self.files: Optional[Dict[str, Optional[List[int]]]] = None
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        self.path = from_build_dir(STAMPS_DIR, f"{digest}.json")
+
+    def take_inputs(self) -> None:
+        """Record the input files as they are before the run."""
+        self.files = {path: stat_signature(path) for path in expand_globs(self.inputs)}
+
+    def fingerprint(self) -> str:
+        if self.files is None:
+            self.take_inputs()
+        files = self.files
+        env = {name: os.environ.get(name) for name in self.env}
+        return hash_json(
+            {"key": self.key, "files": files, "env": env, "cmd_env": self.cmd_env}
+        )
+
+    def outputs_signature(self) -> Dict[str, Optional[List[int]]]:
+        root = from_git_root()
+        return {path: stat_signature(os.path.join(root, path)) for path in self.outputs}
+
+    def up_to_date(self) -> bool:
+        """Check if the last successful run is still valid."""
+        stamp = read_json(self.path)
+        if not stamp:
+            return False
+        outputs = self.outputs_signature()
+        if any(signature is None for signature in outputs.values()):
+            return False
+        return (
+            stamp.get("outputs") == outputs
+            and stamp.get("fingerprint") == self.fingerprint()
+        )
+
+    def save(self) -> None:
+        """Record a successful run, with the inputs taken before it."""
+        if self.files is None:
+            self.take_inputs()
+        written = set(expand_globs(self.inputs)) & set(expand_globs(self.outputs))
+        for path in written:
+            self.files[path] = stat_signature(path)
+        write_json_atomic(
+            self.path,
+            {"fingerprint": self.fingerprint(), "outputs": self.outputs_signature()},
+        )
@@ -1,71 +1,112 @@
 import os
-import subprocess
 import importlib.util
+import inspect
 import sys
-from typing import List
-import shutil
+from typing import Any, Dict, List, Optional
 
+from paige import venv
+from paige.fingerprint import atomic_write, hash_files, hash_json, paige_version
 from paige.path import from_paige_dir
 from paige.makefile import Makefile, generate_makefile_content
 from paige.logger import new_logger, with_logger, get_logger
-from paige.parser import parse_python_files, generate_init_file
+from paige.scheduler import get_scheduler
+from paige.parser import (
+    parse_python_files,
+    generate_init_file,
+    list_python_files,
+    read_fingerprint,
+    validate_init_file,
+)
 
 
-def compile_binary() -> str:
-    """Compile a Python executable binary and return its path."""
+def binary_fingerprint(paige_dir: Optional[str] = None) -> str:
+    """Fingerprint of everything the generated binary is built from."""
+    if paige_dir is None:
+        paige_dir = from_paige_dir()
+    sources = [os.path.join(paige_dir, f) for f in list_python_files(paige_dir)]
+    return hash_json({"paige": paige_version(), "sources": hash_files(sources)})
+
+
+def write_init_file(path: str, content: str) -> None:
+    """Atomically write an executable generated file."""
+    write_if_changed(path, content, 0o755)
+
+
+def write_if_changed(path: str, content: str, mode: Optional[int] = None) -> bool:
+    """Atomically write a generated file, unless it already has this content.
+
+    Leaving an unchanged file alone keeps its mtime, so make does not
+    consider everything depending on it out of date. The file gets mode,
+    if given. Returns whether the file was written.
+    """
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_write(path, mode) as f:
+        f.write(content)
+    return True
+
+
+def write_venv_bootstrap(paige_dir: Optional[str] = None) -> None:
+    """Copy paige.venv into .paige, where generated Makefiles run it."""
+    if paige_dir is None:
+        paige_dir = from_paige_dir()
+    write_if_changed(
+        os.path.join(paige_dir, venv.BOOTSTRAP_FILE), inspect.getsource(venv)
+    )
+
+
+def compile_binary(
+    functions: Dict[str, List[Dict[str, Any]]] = None,
+    paige_dir: Optional[str] = None,
+) -> str:
+    """Compile a Python executable binary and return its path.
+
+    The binary is only rewritten when the fingerprint of the paige version and
+    the .paige sources changed. functions may be passed in when the caller
+    already parsed the .paige directory. paige_dir defaults to the .paige
+    directory at the git root.
+    """
     ctx = with_logger({}, new_logger("paige"))
     logger = get_logger(ctx)
+    if paige_dir is None:
+        paige_dir = from_paige_dir()
 
     # Create bin directory
-    bin_dir = from_paige_dir("bin")
+    bin_dir = os.path.join(paige_dir, "bin")
     os.makedirs(bin_dir, exist_ok=True)
 
     # Binary path
     binary_path = os.path.join(bin_dir, "paigefile")
 
+    fingerprint = binary_fingerprint(paige_dir)
+    if read_fingerprint(binary_path) == fingerprint:
+        # Bump the mtime so make considers the binary newer than its sources
+        os.utime(binary_path)
+        logger.info(f"Binary is up to date: {binary_path}")
+        return binary_path
+
     # Parse Python files to find target functions
-    functions = parse_python_files()
+    if functions is None:
+        functions = parse_python_files(paige_dir)
     if not functions:
-        raise ValueError("no target functions found in .paige directory")
+        raise ValueError(f"no target functions found in {paige_dir}")
 
-    # Generate the init file
-    init_filename = from_paige_dir("generating_paigefile.py")
-    init_content = generate_init_file(functions, [])
-
-    with open(init_filename, "w") as f:
-        f.write(init_content)
-
-    # Make the file executable
-    os.chmod(init_filename, 0o755)
-
-    try:
-        # Test that the generated file works
-        result = subprocess.run([init_filename], capture_output=True, text=True)
-        if result.returncode == 0:
-            logger.info("Generated executable file works correctly")
-        else:
-            logger.warning(f"Generated file had issues: {result.stderr}")
-
-        # Copy the executable to the bin directory
-        shutil.copy2(init_filename, binary_path)
-        os.chmod(binary_path, 0o755)
-        logger.info(f"Compiled binary to: {binary_path}")
-
-    finally:
-        # Clean up the temporary file
-        try:
-            os.remove(init_filename)
-        except Exception:
-            pass
+    # Generate and validate the binary without executing it
+    content = generate_init_file(functions, [], fingerprint)
+    validate_init_file(content, functions, paige_dir)
+    write_init_file(binary_path, content)
+    logger.info(f"Compiled binary to: {binary_path}")
 
     return binary_path
 
 
 def create_generating_paigefile() -> str:
     """Create the generating_paigefile.py executable and return its path."""
-    ctx = with_logger({}, new_logger("paige"))
-    logger = get_logger(ctx)
-
     # Parse Python files to find target functions
     functions = parse_python_files()
     if not functions:
@@ -74,22 +115,8 @@ def create_generating_paigefile() -> str:
     # Generate the init file
     init_filename = from_paige_dir("generating_paigefile.py")
     init_content = generate_init_file(functions, [])
-
-    with open(init_filename, "w") as f:
-        f.write(init_content)
-
-    # Make the file executable
-    os.chmod(init_filename, 0o755)
-
-    try:
-        # Test that the generated file works
-        result = subprocess.run([init_filename], capture_output=True, text=True)
-        if result.returncode == 0:
-            logger.info("Generated executable file works correctly")
-        else:
-            logger.warning(f"Generated file had issues: {result.stderr}")
-    except Exception as e:
-        logger.error(f"Error testing generated file: {e}")
+    validate_init_file(init_content, functions)
+    write_init_file(init_filename, init_content)
 
     return init_filename
 
@@ -104,27 +131,29 @@ def generate_makefiles(makefiles: List[Makefile]):
             "no makefiles to generate, see https://github.com/TheodorEmanuelsson/paige for more info"
         )
 
+    # Parse once and share the result between the binary and all Makefiles
+    functions = parse_python_files()
+
     # Compile the persistent binary
-    binary_path = compile_binary()
+    binary_path = compile_binary(functions)
+    write_venv_bootstrap()
 
-    # Generate the makefiles
     for makefile in makefiles:
         if not makefile.path:
             raise ValueError("Path needs to be defined for Makefile")
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(makefile.path), exist_ok=True)
-
-        # Generate Makefile content
-        content = generate_makefile_content(
-            makefile, parse_python_files(), binary_path, makefiles
-        )
-
-        # Write Makefile
-        with open(makefile.path, "w") as f:
-            f.write(content)
+    def generate(makefile: Makefile) -> None:
+        content = generate_makefile_content(makefile, functions, binary_path, makefiles)
+        if write_if_changed(makefile.path, content):
+            logger.info(f"Generated Makefile: {makefile.path}")
+        else:
+            logger.info(f"Makefile is up to date: {makefile.path}")
 
-        logger.info(f"Generated Makefile: {makefile.path}")
+    # Render and write the Makefiles in parallel
+    tasks = get_scheduler().run_all([lambda mk=mk: generate(mk) for mk in makefiles])
+    for task in tasks:
+        if task.error is not None:
+            raise task.error
 
     logger.info("Makefile generation complete!")
 
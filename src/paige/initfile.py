@@ -8,9 +8,10 @@ from paige.const import (
     GITHUB_URL,
     GITHUB_URL_SHORT,
 )
-from paige.path import from_paige_dir, from_tools_dir, from_work_dir, from_git_root
+from paige.path import from_paige_dir, from_tools_dir, from_git_root
 from paige.generate import generate_makefiles
 from paige.makefile import Makefile
+from paige.venv import sync_venv
 
 
 def _init_dot_paige() -> None:
@@ -50,39 +51,10 @@ def _init_uv(python_version: str) -> None:
         return
 
     try:
-        # Change to .paige directory for uv to create venv in the right place
-        original_dir = from_work_dir()
-        os.chdir(paige_path)
-        try:
-            # Create the virtual environment
-            subprocess.check_call(
-                ["uv", "venv", ".venv"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            print(f"Created uv environment in: {os.path.join(paige_path, '.venv')}")
-
-            # Set VIRTUAL_ENV to the new environment and run sync
-            venv_path = os.path.join(paige_path, ".venv")
-            env = os.environ.copy()
-            env["VIRTUAL_ENV"] = venv_path
-
-            # Install paige from GitHub URL
-            # _install_paige(venv_path)
-
-            # Sync other dependencies with verbose output
-            try:
-                result = subprocess.run(
-                    ["uv", "sync", "--active"], env=env, capture_output=True, text=True
-                )
-                if result.returncode != 0:
-                    print(f"Error syncing dependencies: {result.stderr}")
-                else:
-                    print("Synced dependencies in the new environment")
-            except Exception as e:
-                print(f"Error during sync: {e}")
-        finally:
-            os.chdir(original_dir)
+        # Create the environment, or link in a cached one, see paige.venv
+        status = sync_venv(paige_path)
+        venv_path = os.path.join(paige_path, ".venv")
+        print(f"Python environment in {venv_path}: {status}")
     except Exception as e:
         print(f"Error setting up uv venv environment: {e}")
         return
@@ -1,11 +1,122 @@
 import logging
+import os
+import queue
 import re
+import sys
+import threading
+from typing import IO, Callable, Dict, List, Optional, Tuple
 
 LOGGER_CONTEXT_KEY = "paige_logger"
+OUTPUT_GROUP_KEY = "paige_output_group"
+GROUPED_OUTPUT_KEY = "paige_grouped_output"
+SPOOLED_OUTPUT_KEY = "paige_spooled_output"
 
+# Set PAIGE_OUTPUT=grouped to buffer each target's output and print it in one block,
+# or PAIGE_OUTPUT=spool to write command output to per-target log files
+OUTPUT_ENV = "PAIGE_OUTPUT"
+OUTPUT_GROUPED = "grouped"
+OUTPUT_SPOOL = "spool"
 
-def new_logger(name: str) -> logging.Logger:
-    """Returns a standard logger with formatted prefix."""
+
+class LogQueue:
+    """Writes the log lines of all threads in batches, before logging returns.
+
+    A thread queues its lines and then writes whatever is queued under the
+    write lock. Threads logging in parallel mostly find their lines written
+    in one call by the thread holding the lock. Lines are written when
+    logging returns, so they keep their order with print and tracebacks.
+    """
+
+    # Most lines written in one call
+    BATCH_SIZE = 1024
+
+    def __init__(self):
+        self._start()
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self) -> None:
+        # A lock held by another thread at fork would never be released
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+
+    def put(self, stream: IO[str], text: str) -> None:
+        """Write text to stream, along with the text other threads queued."""
+        self._queue.put((stream, text))
+        self.flush()
+
+    def flush(self) -> None:
+        """Write everything queued so far."""
+        with self._lock:
+            while True:
+                items = []
+                while len(items) < self.BATCH_SIZE:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not items:
+                    return
+                self._write(items)
+
+    def _write(self, items: List[Tuple[IO[str], str]]) -> None:
+        pending: List[Tuple[IO[str], List[str]]] = []
+        for stream, text in items:
+            if pending and pending[-1][0] is stream:
+                pending[-1][1].append(text)
+            else:
+                pending.append((stream, [text]))
+        for stream, texts in pending:
+            try:
+                stream.write("".join(texts))
+                stream.flush()
+            except (OSError, ValueError):
+                # The stream was closed, there is nowhere to report it
+                pass
+
+
+_log_queue = LogQueue()
+
+
+def flush_logs() -> None:
+    """Write all queued log lines."""
+    _log_queue.flush()
+
+
+class QueueHandler(logging.Handler):
+    """Formats records in the logging thread and writes them through the queue.
+
+    Each line is prefixed with the prefix of the logger, see new_logger and
+    with_target_logger. The
+    stream is looked up when a record is logged, so redirecting sys.stderr
+    also redirects the records logged afterwards.
+    """
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # No handler lock, the queue is thread-safe
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            logger = _loggers.get(record.name)
+            prefix = getattr(logger, "prefix", "")
+            lines = self.format(record).split("\n")
+            _log_queue.put(sys.stderr, "".join(f"{prefix}{line}\n" for line in lines))
+        except Exception:
+            self.handleError(record)
+
+
+# Handler shared by all loggers created with new_logger
+_handler = QueueHandler()
+_handler.setFormatter(logging.Formatter("%(message)s"))
+
+_loggers: Dict[str, logging.Logger] = {}
+_loggers_lock = threading.Lock()
+
+
+def _logger_prefix(name: str) -> str:
     # Clean up the name
     prefix = name
     prefix = prefix.replace("main.", "")
@@ -14,24 +125,40 @@ def new_logger(name: str) -> logging.Logger:
     prefix = re.sub(r"([a-z0-9])([A-Z])", r"\1-\2", prefix)
     prefix = prefix.lower().replace("_", "-")
 
-    prefix = f"[{prefix}] "
+    return f"[{prefix}] "
 
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
 
-    # Create handler if it doesn't exist
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            "%(message)s"
-        )  # Just the message, prefix is in logger name
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+def _get_logger(
+    name: str, prefix: str, handlers: Optional[List[logging.Handler]] = None
+) -> logging.Logger:
+    """Returns the cached logger with name, creating it with prefix and handlers if needed."""
+    logger = _loggers.get(name)
+    if logger is not None:
+        return logger
+    with _loggers_lock:
+        if name not in _loggers:
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.INFO)
 
-    # Store prefix in logger for later use
-    logger.prefix = prefix
-    return logger
+            # Write through the shared queue, unless handlers were set up already
+            if not logger.handlers:
+                for handler in handlers or [_handler]:
+                    logger.addHandler(handler)
+                # Parent loggers would write the same record again
+                logger.propagate = False
+
+            # Store prefix in logger for later use
+            logger.prefix = prefix
+            _loggers[name] = logger
+        return _loggers[name]
+
+
+def new_logger(name: str) -> logging.Logger:
+    """Returns a standard logger with formatted prefix.
+
+    Loggers are cached by name, and write through the shared queue.
+    """
+    return _get_logger(name, _logger_prefix(name))
 
 
 def with_logger(ctx: dict, logger: logging.Logger) -> dict:
@@ -44,16 +171,42 @@ def with_logger(ctx: dict, logger: logging.Logger) -> dict:
 def append_logger_prefix(ctx: dict, prefix: str) -> dict:
     """Appends a prefix to the current logger."""
     logger = get_logger(ctx)
-    new_logger = logging.getLogger(logger.name + prefix)
-    new_logger.setLevel(logging.INFO)
+    new_logger = _get_logger(
+        logger.name + prefix, getattr(logger, "prefix", "") + prefix, logger.handlers
+    )
+    return with_logger(ctx, new_logger)
 
-    # Copy handlers
-    for handler in logger.handlers:
-        new_logger.addHandler(handler)
 
-    # Update prefix
-    new_logger.prefix = logger.prefix + prefix
-    return with_logger(ctx, new_logger)
+def with_target_logger(ctx: dict, target_name: str) -> dict:
+    """Attaches a logger prefixing lines with the target name to the context.
+
+    The target logger is a child of the context's logger, or of the logger
+    the context's target logger belongs to, and its records propagate there.
+    """
+    logger = get_logger(ctx)
+    base = getattr(logger, "target_base", logger)
+    name = f"{base.name}.{target_name}"
+    target_logger = _loggers.get(name)
+    if target_logger is None:
+        with _loggers_lock:
+            if name not in _loggers:
+                target_logger = logging.getLogger(name)
+                target_logger.setLevel(logging.INFO)
+                target_logger.prefix = _logger_prefix(target_name)
+                target_logger.target_base = base
+                _loggers[name] = target_logger
+            target_logger = _loggers[name]
+    return with_logger(ctx, target_logger)
+
+
+def _writes_to_queue(logger: logging.Logger) -> bool:
+    """Check if logger only writes through the queue, possibly by propagating."""
+    base = getattr(logger, "target_base", None)
+    if base is not None:
+        if logger.handlers or not logger.propagate:
+            return False
+        logger = base
+    return logger.handlers == [_handler] and not logger.propagate
 
 
 def get_logger(ctx: dict) -> logging.Logger:
@@ -61,3 +214,87 @@ def get_logger(ctx: dict) -> logging.Logger:
     if LOGGER_CONTEXT_KEY in ctx:
         return ctx[LOGGER_CONTEXT_KEY]
     return new_logger("paige")
+
+
+class OutputGroup:
+    """Buffers a target's log lines so they can be flushed as one block."""
+
+    # Shared by all groups so flushed blocks never interleave
+    _flush_lock = threading.Lock()
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._lines: List[Tuple[int, str]] = []
+
+    def log(self, level: int, line: str) -> None:
+        with self._lock:
+            self._lines.append((level, line))
+
+    def flush(self) -> None:
+        """Write all buffered lines to the logger at once."""
+        with self._lock:
+            lines, self._lines = self._lines, []
+        if not lines:
+            return
+        with OutputGroup._flush_lock:
+            for level, line in lines:
+                self.logger.log(level, line)
+
+
+def context_with_grouped_output(ctx: dict, enabled: bool = True) -> dict:
+    """Returns a context where Deps buffers each target's output and flushes it when the target ends."""
+    new_ctx = ctx.copy()
+    new_ctx[GROUPED_OUTPUT_KEY] = enabled
+    return new_ctx
+
+
+def grouped_output_enabled(ctx: dict) -> bool:
+    """Check if grouped output is enabled through the context or PAIGE_OUTPUT."""
+    if GROUPED_OUTPUT_KEY in ctx:
+        return ctx[GROUPED_OUTPUT_KEY]
+    return os.environ.get(OUTPUT_ENV, "").lower() == OUTPUT_GROUPED
+
+
+def context_with_spooled_output(ctx: dict, enabled: bool = True) -> dict:
+    """Returns a context where run writes command output to log files and only shows a tail."""
+    new_ctx = ctx.copy()
+    new_ctx[SPOOLED_OUTPUT_KEY] = enabled
+    return new_ctx
+
+
+def spooled_output_enabled(ctx: dict) -> bool:
+    """Check if spooled output is enabled through the context or PAIGE_OUTPUT."""
+    if SPOOLED_OUTPUT_KEY in ctx:
+        return ctx[SPOOLED_OUTPUT_KEY]
+    return os.environ.get(OUTPUT_ENV, "").lower() == OUTPUT_SPOOL
+
+
+def with_output_group(ctx: dict) -> Tuple[dict, OutputGroup]:
+    """Attaches a new output group to the provided context."""
+    group = OutputGroup(get_logger(ctx))
+    new_ctx = ctx.copy()
+    new_ctx[OUTPUT_GROUP_KEY] = group
+    return new_ctx, group
+
+
+def get_line_logger(ctx: dict) -> Callable[[int, str], None]:
+    """Returns a function logging a line through the context's output group, or its logger."""
+    group = ctx.get(OUTPUT_GROUP_KEY)
+    if group is not None:
+        return group.log
+    logger = get_logger(ctx)
+    if not _writes_to_queue(logger):
+        return logger.log
+    prefix = getattr(logger, "prefix", "")
+
+    def log_line(level: int, line: str) -> None:
+        # Queue plain lines without creating a LogRecord, as long as the
+        # logger still only writes through the queue
+        if _writes_to_queue(logger):
+            if logger.isEnabledFor(level) and not logger.disabled:
+                _log_queue.put(sys.stderr, f"{prefix}{line}\n")
+        else:
+            logger.log(level, line)
+
+    return log_line
@@ -1,7 +1,9 @@
 import re
 from typing import List, Dict, Any, Union
 
+from paige import venv
 from paige.namespace import get_namespace_name, get_namespace_metadata
+from paige.parser import target_name as paige_target_name
 
 
 class Makefile:
@@ -75,6 +77,39 @@ def should_be_generated(makefiles: List[Makefile], namespace: str) -> tuple[bool
     return part_of_makefile, namespace_struct
 
 
+def makefile_functions(
+    makefile: Makefile,
+    functions: Dict[str, List[Dict[str, Any]]],
+    all_makefiles: List[Makefile] = None,
+) -> List[Dict[str, Any]]:
+    """Returns the functions that get a target in makefile.
+
+    A namespaced Makefile gets the methods of its namespace. The main Makefile
+    gets the plain functions, and the methods of namespaces that have no
+    Makefile of their own.
+    """
+    namespace = makefile.get_namespace_name()
+    generated = {mk.get_namespace_name() for mk in all_makefiles or [makefile]}
+    targets = []
+    for module_functions in functions.values():
+        for func in module_functions:
+            func_namespace = func.get("namespace") or ""
+            if func_namespace == namespace:
+                targets.append(func)
+            elif not namespace and func_namespace not in generated:
+                targets.append(func)
+    return targets
+
+
+def make_target_name(makefile: Makefile, func: Dict[str, Any]) -> str:
+    """Returns the make target of a function, prefixed by its namespace when outside its own Makefile."""
+    name = to_make_target(func["name"])
+    func_namespace = func.get("namespace")
+    if func_namespace and func_namespace != makefile.get_namespace_name():
+        return f"{to_make_target(func_namespace)}-{name}"
+    return name
+
+
 def generate_makefile_content(
     makefile: Makefile,
     functions: Dict[str, List[Dict[str, Any]]],
@@ -100,28 +135,37 @@ def generate_makefile_content(
     lines.append("paige_venv := $(paige_dir)/.venv")
     lines.append("python := $(paige_venv)/bin/python")
     lines.append("paige_binary := $(paige_dir)/bin/paigefile")
+    lines.append(f"paige_venv_ready := $(paige_venv)/{venv.FINGERPRINT_FILE}")
     lines.append("")
 
-    # Python setup
+    # Python setup, reusing a cached environment when pyproject.toml and
+    # uv.lock did not change. paige may not be installed yet, so this runs
+    # the copy of paige.venv in .paige, which picks the Python for the
+    # requires-python of the project itself.
     lines.append("# Setup Python environment")
-    lines.append("$(python):")
-    lines.append("\t@echo 'Setting up Paige Python environment...'")
-    lines.append("\t@cd $(paige_dir) && uv sync --active")
+    lines.append(
+        "paige_venv_sync = cd $(paige_dir) && "
+        f'"$$(uv python find --system)" {venv.BOOTSTRAP_FILE} sync'
+    )
+    lines.append("")
+    lines.append(
+        "$(paige_venv_ready): "
+        "$(wildcard $(paige_dir)/pyproject.toml $(paige_dir)/uv.lock)"
+    )
+    lines.append("\t@$(paige_venv_sync)")
     lines.append("")
 
     # Main paige target
     lines.append(".PHONY: paige")
-    lines.append("paige: $(python)")
+    lines.append("paige: $(paige_venv_ready)")
     lines.append("\t@cd $(paige_dir) && $(python) paigefile.py")
     lines.append("")
 
-    # Update paige target
+    # Update paige target, the new lock file gets a new environment
     lines.append(".PHONY: update-paige")
-    lines.append("update-paige: $(python)")
-    lines.append(
-        "\t@cd $(paige_dir) && uv pip install --upgrade git+https://github.com/TheodorEmanuelsson/paige.git"
-    )
-    lines.append("\t@cd $(paige_dir) && uv sync --active")
+    lines.append("update-paige: $(paige_venv_ready)")
+    lines.append("\t@cd $(paige_dir) && uv lock --upgrade-package paige")
+    lines.append("\t@$(paige_venv_sync)")
     lines.append("")
 
     # Clean paige target
@@ -132,48 +176,53 @@ def generate_makefile_content(
     lines.append("\t@rm -rf $(paige_dir)/bin")
     lines.append("")
 
-    # Rule to create the binary when needed
-    lines.append("$(paige_binary):")
-    lines.append("\tpython -m paige.generate")
+    # Rebuild the binary when a .paige source is newer than it. The generator
+    # only rewrites it when the source fingerprint actually changed.
+    lines.append("$(paige_binary): $(wildcard $(paige_dir)/*.py) | $(paige_venv_ready)")
+    lines.append("\t@cd $(paige_dir) && $(python) -m paige.generate")
     lines.append("")
 
-    # Generate targets for functions
+    # Generate targets for the functions of this Makefile's namespace
     namespace = makefile.get_namespace_name()
+    targets = makefile_functions(makefile, functions, all_makefiles)
+
+    # Paige goals given on the command line run in a single paigefile call, so
+    # Deps they share run once. The first goal runs them all, the rest do nothing.
+    # Set PAIGE_BATCH=false to run each goal in its own call.
+    make_targets = [make_target_name(makefile, func) for func in targets]
+    lines.append("PAIGE_BATCH ?= true")
+    lines.append(f"paige_targets := {' '.join(make_targets)}")
+    lines.append(
+        "paige_goals := $(if $(filter true,$(PAIGE_BATCH)),$(filter $(paige_targets),$(MAKECMDGOALS)))"
+    )
+    lines.append(
+        "paige_call = $(if $(filter $1,$(firstword $(paige_goals))),"
+        "$(foreach goal,$(paige_goals),$(paige_args_$(goal))),"
+        "$(if $(filter $1,$(paige_goals)),,$(paige_args_$1)))"
+    )
+    lines.append("")
 
-    for module_name, module_functions in functions.items():
-        for func in module_functions:
-            # Check if this function belongs to this namespace
-            if namespace:
-                # For now, we'll assume functions in the module belong to the namespace
-                # TODO: Implement proper namespace detection from AST
-                pass
-            else:
-                # Main namespace - include all functions
-                pass
-
-            target_name = to_make_target(func["name"])
-            parameters = func["args"][1:]  # Skip context parameter
-            make_vars = to_make_vars(parameters)
-
-            lines.append(f".PHONY: {target_name}")
-            lines.append(f"{target_name}: $(paige_binary)")
-
-            # Add parameter validation
-            for var in make_vars:
-                lines.append(f"ifndef {var}")
-                lines.append(f'\t$(error missing argument {var}="...")')
-                lines.append("endif")
-
-            # Build the command
-            cmd_parts = ["@cd $(paige_dir) && ./bin/paigefile"]
-            cmd_parts.append(f"{func['name']}")
-
-            # Add parameters
-            for var in make_vars:
-                cmd_parts.append(f'"$({var})"')
-
-            lines.append("\t" + " ".join(cmd_parts))
-            lines.append("")
+    for func, target_name in zip(targets, make_targets):
+        parameters = func["args"][1:]  # Skip context parameter
+        make_vars = to_make_vars(parameters)
+
+        # The paigefile arguments of the target, checking its parameters when expanded
+        checks = "".join(
+            f'$(if $({var}),,$(error missing argument {var}="..."))'
+            for var in make_vars
+        )
+        lines.append(
+            f"paige_args_{target_name} = {checks}{to_paige_function(paige_target_name(func), make_vars)}"
+        )
+        lines.append(f".PHONY: {target_name}")
+        lines.append(f"{target_name}: $(paige_binary)")
+
+        # Build the command, a no-op for goals batched into an earlier call
+        lines.append(
+            f"\t$(if $(call paige_call,{target_name}),"
+            f"@cd $(paige_dir) && ./bin/paigefile $(call paige_call,{target_name}),@:)"
+        )
+        lines.append("")
 
     # Add sub-makefiles for other namespaces
     if not namespace and all_makefiles:
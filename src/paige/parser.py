@@ -1,114 +1,309 @@
 import ast
+import hashlib
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 
-from paige.path import from_paige_dir
+from paige.fingerprint import read_json, write_json_atomic
+from paige.path import from_paige_dir, ensure_parent_dir
 
 
-def parse_python_files() -> Dict[str, List[Dict[str, Any]]]:
-    """Parse Python files in .paige directory to find target functions."""
-    paige_dir = from_paige_dir()
-    functions = {}
+# Bump when the parse result format changes to invalidate existing caches
+PARSE_CACHE_VERSION = 2
+PARSE_CACHE_FILE = "parse_cache.json"
 
-    if not os.path.exists(paige_dir):
-        return functions
+# Header line of the generated binary recording the fingerprint it was built from
+FINGERPRINT_PREFIX = "# paige-fingerprint: "
 
-    # Find all Python files in .paige directory
-    for py_file in os.listdir(paige_dir):
+# Below this many files to parse, a process pool costs more than it saves
+PARALLEL_PARSE_THRESHOLD = 16
+
+
+def _is_namespace_class(node: ast.ClassDef) -> bool:
+    """Check if this class inherits from Namespace."""
+    for base in node.bases:
+        if isinstance(base, ast.Name) and base.id == "Namespace":
+            return True
+        elif isinstance(base, ast.Attribute):
+            if base.attr == "Namespace":
+                return True
+    return False
+
+
+def parse_source(source: str, module_name: str) -> List[Dict[str, Any]]:
+    """Find target functions in the source of a .paige module."""
+    tree = ast.parse(source)
+
+    module_functions = []
+    namespace_methods = {}
+    function_nodes = []
+
+    # Single pass: collect the methods of namespace classes and candidate functions
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            if _is_namespace_class(node):
+                for child in node.body:
+                    if isinstance(child, ast.FunctionDef):
+                        namespace_methods[child] = node.name
+        elif isinstance(node, ast.FunctionDef):
+            function_nodes.append(node)
+
+    for node in function_nodes:
+        # Check if it's a public function (not starting with _)
+        if node.name.startswith("_"):
+            continue
+        # Check if it has the right signature (at least one parameter)
+        if not node.args.args:
+            continue
+        # Check if first parameter is 'ctx' or has no annotation
+        first_param = node.args.args[0]
+        if not (
+            first_param.arg == "ctx"
+            or first_param.annotation is None
+            or isinstance(first_param.annotation, ast.Name)
+            and first_param.annotation.id == "dict"
+        ):
+            continue
+
+        # Check if this is a method (has self parameter)
+        if node.args.args[0].arg == "self" and len(node.args.args) > 1:
+            # This is a method, only those of namespace classes are targets
+            if node in namespace_methods:
+                module_functions.append(
+                    {
+                        "name": node.name,
+                        "args": [arg.arg for arg in node.args.args[1:]],  # Skip self
+                        "module": module_name,
+                        "namespace": namespace_methods[node],
+                    }
+                )
+        else:
+            # This is a regular function
+            module_functions.append(
+                {
+                    "name": node.name,
+                    "args": [arg.arg for arg in node.args.args],
+                    "module": module_name,
+                    "namespace": None,
+                }
+            )
+
+    return module_functions
+
+
+def _parse_file(
+    file_path: str, module_name: str
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """Parse a file, returning the error rather than raising so it crosses process boundaries."""
+    try:
+        with open(file_path, "r") as f:
+            return parse_source(f.read(), module_name), None
+    except Exception as e:
+        return None, str(e)
+
+
+class ParseCache:
+    """Parse results of .paige modules persisted in .paige/build.
+
+    Entries are keyed by file path and validated by mtime and size, falling
+    back to the content hash when only the mtime changed (e.g. after a checkout).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        data = read_json(path)
+        if data and data.get("version") == PARSE_CACHE_VERSION:
+            self.entries = data.get("entries", {})
+
+    def lookup(self, file_path: str) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """Returns the cached functions for a file, or None and its content hash."""
+        st = os.stat(file_path)
+        entry = self.entries.get(file_path)
+        if (
+            entry
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and entry["size"] == st.st_size
+        ):
+            return entry["functions"], entry["sha256"]
+
+        with open(file_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if entry and entry["sha256"] == digest:
+            self.store(file_path, entry["functions"], digest)
+            return entry["functions"], digest
+        return None, digest
+
+    def store(
+        self, file_path: str, functions: List[Dict[str, Any]], digest: str
+    ) -> None:
+        st = os.stat(file_path)
+        self.entries[file_path] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": digest,
+            "functions": functions,
+        }
+        self.dirty = True
+
+    def prune(self, file_paths: List[str]) -> None:
+        """Drop entries for files that no longer exist."""
+        for file_path in set(self.entries) - set(file_paths):
+            del self.entries[file_path]
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        ensure_parent_dir(self.path)
+        write_json_atomic(
+            self.path, {"version": PARSE_CACHE_VERSION, "entries": self.entries}
+        )
+        self.dirty = False
+
+
+def list_python_files(paige_dir: str) -> List[str]:
+    """List the .paige modules which may contain targets."""
+    files = []
+    for py_file in sorted(os.listdir(paige_dir)):
         if not py_file.endswith(".py") or py_file == "__init__.py":
             continue
+        files.append(py_file)
+    return files
+
+
+def parse_python_files(
+    paige_dir: Optional[str] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Parse Python files in .paige directory to find target functions.
+
+    Unchanged files are served from the parse cache in .paige/build, the rest
+    are parsed in parallel when there are many of them. paige_dir defaults to
+    the .paige directory at the git root.
+    """
+    if paige_dir is None:
+        paige_dir = from_paige_dir()
+    return parse_paige_dirs([paige_dir])[paige_dir]
+
+
+def parse_paige_dirs(
+    paige_dirs: List[str],
+) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Parse the modules of several .paige directories, mapping each directory to its functions.
+
+    The files of all directories that are not in their parse cache are parsed
+    together, so one process pool serves them all.
+    """
+    caches: Dict[str, ParseCache] = {}
+    listed: Dict[str, List[str]] = {}
+    results: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    to_parse = []
+
+    for paige_dir in paige_dirs:
+        if not os.path.exists(paige_dir):
+            listed[paige_dir] = []
+            continue
+        cache = ParseCache(os.path.join(paige_dir, "build", PARSE_CACHE_FILE))
+        caches[paige_dir] = cache
+        listed[paige_dir] = list_python_files(paige_dir)
+
+        for py_file in listed[paige_dir]:
+            file_path = os.path.join(paige_dir, py_file)
+            try:
+                cached, digest = cache.lookup(file_path)
+            except OSError as e:
+                print(f"Warning: Could not parse {py_file}: {e}")
+                continue
+            if cached is not None:
+                results[paige_dir, py_file] = cached
+            else:
+                to_parse.append((paige_dir, py_file, file_path, digest))
 
-        file_path = os.path.join(paige_dir, py_file)
-        try:
-            with open(file_path, "r") as f:
-                tree = ast.parse(f.read())
-
-            module_functions = []
-            namespace_classes = []
-
-            # First pass: find namespace classes
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    # Check if this class inherits from Namespace
-                    for base in node.bases:
-                        if isinstance(base, ast.Name) and base.id == "Namespace":
-                            namespace_classes.append(node.name)
-                            break
-                        elif isinstance(base, ast.Attribute):
-                            if base.attr == "Namespace":
-                                namespace_classes.append(node.name)
-                                break
-
-            # Second pass: find functions and methods
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    # Check if it's a public function (not starting with _)
-                    if not node.name.startswith("_"):
-                        # Check if it has the right signature (at least one parameter)
-                        if node.args.args:
-                            # Check if first parameter is 'ctx' or has no annotation
-                            first_param = node.args.args[0]
-                            if (
-                                first_param.arg == "ctx"
-                                or first_param.annotation is None
-                                or isinstance(first_param.annotation, ast.Name)
-                                and first_param.annotation.id == "dict"
-                            ):
-                                # Check if this is a method (has self parameter)
-                                if (
-                                    node.args.args[0].arg == "self"
-                                    and len(node.args.args) > 1
-                                ):
-                                    # This is a method, check if it's in a namespace class
-                                    # For now, we'll assume it's a namespace method if the class exists
-                                    if namespace_classes:
-                                        module_functions.append(
-                                            {
-                                                "name": node.name,
-                                                "args": [
-                                                    arg.arg
-                                                    for arg in node.args.args[1:]
-                                                ],  # Skip self
-                                                "module": py_file[
-                                                    :-3
-                                                ],  # Remove .py extension
-                                                "namespace": namespace_classes[0]
-                                                if namespace_classes
-                                                else None,
-                                            }
-                                        )
-                                else:
-                                    # This is a regular function
-                                    module_functions.append(
-                                        {
-                                            "name": node.name,
-                                            "args": [arg.arg for arg in node.args.args],
-                                            "module": py_file[
-                                                :-3
-                                            ],  # Remove .py extension
-                                            "namespace": None,
-                                        }
-                                    )
-
-            if module_functions:
-                functions[py_file[:-3]] = module_functions
-
-        except Exception as e:
-            print(f"Warning: Could not parse {py_file}: {e}")
-
-    return functions
+    file_paths = [file_path for _, _, file_path, _ in to_parse]
+    module_names = [py_file[:-3] for _, py_file, _, _ in to_parse]
+    if len(to_parse) >= PARALLEL_PARSE_THRESHOLD:
+        with ProcessPoolExecutor() as executor:
+            parsed = list(executor.map(_parse_file, file_paths, module_names))
+    else:
+        parsed = [
+            _parse_file(path, name) for path, name in zip(file_paths, module_names)
+        ]
+
+    for (paige_dir, py_file, file_path, digest), (module_functions, error) in zip(
+        to_parse, parsed
+    ):
+        if error is not None:
+            print(f"Warning: Could not parse {py_file}: {error}")
+            continue
+        caches[paige_dir].store(file_path, module_functions, digest)
+        results[paige_dir, py_file] = module_functions
+
+    all_functions = {}
+    for paige_dir in paige_dirs:
+        py_files = listed[paige_dir]
+        if paige_dir in caches:
+            cache = caches[paige_dir]
+            cache.prune([os.path.join(paige_dir, py_file) for py_file in py_files])
+            try:
+                cache.save()
+            except OSError as e:
+                print(f"Warning: Could not write parse cache: {e}")
+
+        # Keep the sorted file order so generated output is stable
+        functions = {}
+        for py_file in py_files:
+            if results.get((paige_dir, py_file)):
+                functions[py_file[:-3]] = results[paige_dir, py_file]
+        all_functions[paige_dir] = functions
+
+    return all_functions
+
+
+def target_name(func: Dict[str, Any]) -> str:
+    """Returns the name a function is invoked as, prefixed by its namespace if it has one."""
+    if func.get("namespace"):
+        return f"{func['namespace']}:{func['name']}"
+    return func["name"]
+
+
+def build_target_table(
+    functions: Dict[str, List[Dict[str, Any]]],
+) -> Dict[str, Tuple[str, Optional[str], str, int]]:
+    """Map each target name to its (module, namespace, callable, arity)."""
+    table = {}
+    for module_name, module_functions in functions.items():
+        for func in module_functions:
+            arity = len(func["args"]) - 1  # -1 for context parameter
+            table[target_name(func)] = (
+                module_name,
+                func.get("namespace"),
+                func["name"],
+                arity,
+            )
+    return table
 
 
 def generate_init_file(
-    functions: Dict[str, List[Dict[str, Any]]], makefiles: List
+    functions: Dict[str, List[Dict[str, Any]]],
+    makefiles: List,
+    fingerprint: Optional[str] = None,
 ) -> str:
-    """Generate a temporary Python file that imports all functions and creates CLI."""
+    """Generate a Python file that dispatches targets to the .paige modules.
+
+    Targets are looked up in a table built at generation time, and only the
+    module owning the requested target is imported. The fingerprint, if given,
+    is recorded in the header so unchanged sources are not regenerated.
+    """
     lines = []
 
     # Header
     lines.append("#!/usr/bin/env python3")
     lines.append("# Code generated by paige. DO NOT EDIT.")
+    if fingerprint:
+        lines.append(f"{FINGERPRINT_PREFIX}{fingerprint}")
     lines.append("")
+    lines.append("import importlib")
     lines.append("import sys")
     lines.append("import os")
     lines.append("")
@@ -118,82 +313,189 @@ def generate_init_file(
     )
     lines.append("")
 
-    # Import all modules
-    for module_name in functions.keys():
-        lines.append(f"import {module_name}")
+    # Target table: name -> (module, namespace, callable, arity)
+    lines.append("TARGETS = {")
+    for name, entry in build_target_table(functions).items():
+        lines.append(f"    {name!r}: {entry!r},")
+    lines.append("}")
+    lines.append("")
+    lines.append(
+        'DAEMON_SOCKET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build", "daemon.sock")'
+    )
+    lines.append("")
+    lines.append("")
+
+    # Thin client for a warm `paige daemon`, see paige.daemon
+    lines.append("def run_in_daemon(calls):")
+    lines.append(
+        '    """Run targets in a warm paige daemon, returning the exit code or None if none is running."""'
+    )
+    lines.append(
+        '    if os.environ.get("PAIGE_DAEMON", "true").lower() in ("0", "false", "no", "off"):'
+    )
+    lines.append("        return None")
+    lines.append("    if not os.path.exists(DAEMON_SOCKET):")
+    lines.append("        return None")
+    lines.append("")
+    lines.append("    import json")
+    lines.append("    import socket")
+    lines.append("")
+    lines.append("    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)")
+    lines.append("    try:")
+    lines.append("        conn.connect(DAEMON_SOCKET)")
+    lines.append("    except OSError:")
+    lines.append("        conn.close()")
+    lines.append("        return None")
+    lines.append("")
+    lines.append(
+        '    request = {"calls": calls, "cwd": os.getcwd(), "env": dict(os.environ)}'
+    )
+    lines.append('    payload = json.dumps(request).encode("utf-8")')
+    lines.append('    response = b""')
+    lines.append("    with conn:")
+    lines.append(
+        "        # Pass our stdin/stdout/stderr so output streams straight to the terminal"
+    )
+    lines.append(
+        '        socket.send_fds(conn, [len(payload).to_bytes(8, "big")], [0, 1, 2])'
+    )
+    lines.append("        conn.sendall(payload)")
+    lines.append("        while True:")
+    lines.append("            chunk = conn.recv(4096)")
+    lines.append("            if not chunk:")
+    lines.append("                break")
+    lines.append("            response += chunk")
+    lines.append("    try:")
+    lines.append('        return json.loads(response)["exit"]')
+    lines.append("    except (ValueError, KeyError):")
+    lines.append("        return 1")
+    lines.append("")
+    lines.append("")
+
+    # Split the command line into target calls
+    lines.append("def parse_targets(argv):")
+    lines.append(
+        '    """Split argv into (target, args) pairs, each target taking as many args as its arity."""'
+    )
+    lines.append("    calls = []")
+    lines.append("    i = 0")
+    lines.append("    while i < len(argv):")
+    lines.append("        target = argv[i]")
+    lines.append("        if target not in TARGETS:")
+    lines.append('            print(f"unknown target specified: {target}")')
+    lines.append("            sys.exit(1)")
+    lines.append("        arity = TARGETS[target][3]")
+    lines.append("        args = argv[i + 1 : i + 1 + arity]")
+    lines.append("        if len(args) != arity:")
+    lines.append(
+        '            print(f"wrong number of arguments to {target}, got {len(args)} expected {arity}")'
+    )
+    lines.append("            sys.exit(1)")
+    lines.append("        calls.append((target, args))")
+    lines.append("        i += 1 + arity")
+    lines.append("    return calls")
+    lines.append("")
+    lines.append("")
+
+    # Accept -j N / -jN / --jobs N / --jobs=N before the targets to set the job limit
+    lines.append("def parse_jobs_option(argv):")
+    lines.append(
+        '    """Remove a leading job limit option from argv, returning its value or None."""'
+    )
+    lines.append("    if not argv:")
+    lines.append("        return None")
+    lines.append("    option = argv[0]")
+    lines.append('    if option in ("-j", "--jobs"):')
+    lines.append('        value = argv[1] if len(argv) > 1 else ""')
+    lines.append("        del argv[:2]")
+    lines.append('    elif option.startswith("--jobs="):')
+    lines.append('        value = option[len("--jobs=") :]')
+    lines.append("        del argv[0]")
+    lines.append('    elif option.startswith("-j"):')
+    lines.append("        value = option[2:]")
+    lines.append("        del argv[0]")
+    lines.append("    else:")
+    lines.append("        return None")
+    lines.append("    if not value.isdigit() or int(value) < 1:")
+    lines.append(
+        '        print(f"{option} needs a job limit of at least 1, got: {value!r}")'
+    )
+    lines.append("        sys.exit(1)")
+    lines.append("    return value")
+    lines.append("")
     lines.append("")
 
     # Main function
     lines.append("def main():")
-    lines.append("    if len(sys.argv) < 2:")
+    lines.append("    argv = sys.argv[1:]")
+    lines.append("    jobs = parse_jobs_option(argv)")
+    lines.append("    if jobs is not None:")
+    lines.append('        os.environ["PAIGE_JOBS"] = jobs')
+    lines.append("")
+    lines.append("    if not argv:")
     lines.append('        print("Targets:")')
-
-    # List all available targets
-    for module_name, module_functions in functions.items():
-        for func in module_functions:
-            if func.get("namespace"):
-                lines.append(f'        print("\\t{func["namespace"]}:{func["name"]}")')
-            else:
-                lines.append(f'        print("\\t{func["name"]}")')
-
+    lines.append("        for name in TARGETS:")
+    lines.append('            print(f"\\t{name}")')
     lines.append("        sys.exit(0)")
     lines.append("")
-    lines.append("    target = sys.argv[1]")
+    lines.append("    calls = parse_targets(argv)")
+    lines.append("")
+    lines.append("    code = run_in_daemon(calls)")
+    lines.append("    if code is not None:")
+    lines.append("        sys.exit(code)")
+    lines.append("")
+    lines.append("    import paige")
+    lines.append("")
+    lines.append("    # Stop the commands of the targets when terminated")
+    lines.append("    paige.cancel.install_signal_handlers()")
+    lines.append("")
+    lines.append("    fns = []")
+    lines.append("    for target, args in calls:")
+    lines.append("        module_name, namespace, func_name, _ = TARGETS[target]")
+    lines.append("        module = importlib.import_module(module_name)")
+    lines.append("        if namespace:")
+    lines.append("            # Call as method on namespace instance")
+    lines.append("            fn = getattr(getattr(module, namespace)(), func_name)")
+    lines.append("        else:")
+    lines.append("            fn = getattr(module, func_name)")
+    lines.append("        fns.append(paige.Fn(fn, *args))")
+    lines.append("")
+    lines.append(
+        "    # Run the targets in order under one runner, so shared Deps run only once"
+    )
+    lines.append("    paige.deps.run_main_targets({}, *fns)")
+    lines.append("    sys.exit(0)")
     lines.append("")
-
-    # Switch statement for each target
-    for module_name, module_functions in functions.items():
-        for func in module_functions:
-            func_name = func["name"]
-            func_args = func["args"]
-            namespace = func.get("namespace")
-
-            # Create target name with namespace if applicable
-            if namespace:
-                target_name = f"{namespace}:{func_name}"
-            else:
-                target_name = func_name
-
-            lines.append(f'    if target == "{target_name}":')
-
-            # Validate argument count
-            expected_args = len(func_args) - 1  # -1 for context parameter
-            if expected_args > 0:
-                lines.append(f"        if len(sys.argv[2:]) != {expected_args}:")
-                lines.append(
-                    f'            print(f"wrong number of arguments to {target_name}, got {{len(sys.argv[2:])}} expected {expected_args}")'
-                )
-                lines.append("            sys.exit(1)")
-                lines.append("")
-
-            # Call the function
-            call_args = []
-            for i, arg in enumerate(func_args[1:], 0):  # Skip first arg (context)
-                lines.append(f"        {arg} = sys.argv[{i + 2}]")
-                call_args.append(arg)
-
-            if namespace:
-                # Call as method on namespace instance
-                lines.append(
-                    f"        {module_name}.{namespace}().{func_name}({{}}, {', '.join(call_args)})"
-                )
-            else:
-                # Call as regular function
-                lines.append(
-                    f"        {module_name}.{func_name}({{}}, {', '.join(call_args)})"
-                )
-            lines.append("        sys.exit(0)")
-            lines.append("")
-
-    lines.append('    print(f"unknown target specified: {target}")')
-    lines.append("    sys.exit(1)")
     lines.append("")
     lines.append("if __name__ == '__main__':")
     lines.append("    main()")
-    lines.append("    # Self-delete after execution")
-    lines.append("    try:")
-    lines.append("        os.remove(__file__)")
-    lines.append("    except Exception:")
-    lines.append("        pass")
+    lines.append("")
 
     return "\n".join(lines)
+
+
+def read_fingerprint(path: str) -> Optional[str]:
+    """Returns the fingerprint recorded in a generated file, if any."""
+    try:
+        with open(path, "r") as f:
+            for _ in range(3):
+                line = f.readline()
+                if line.startswith(FINGERPRINT_PREFIX):
+                    return line[len(FINGERPRINT_PREFIX) :].strip()
+    except OSError:
+        pass
+    return None
+
+
+def validate_init_file(
+    content: str,
+    functions: Dict[str, List[Dict[str, Any]]],
+    paige_dir: Optional[str] = None,
+):
+    """Check a generated file in-process instead of executing it."""
+    compile(content, "paigefile", "exec")
+    if paige_dir is None:
+        paige_dir = from_paige_dir()
+    for module_name in functions:
+        if not os.path.exists(os.path.join(paige_dir, f"{module_name}.py")):
+            raise ValueError(f"module {module_name} not found in .paige directory")
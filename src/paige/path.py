@@ -1,5 +1,6 @@
 import os
 import subprocess
+import threading
 
 from paige.const import PAIGE_DIR_NAME
 
@@ -9,15 +10,69 @@ def from_work_dir(*path_elems: str | None) -> str:
     return cwd if not path_elems else os.path.join(cwd, *path_elems)
 
 
+class GitRootResolver:
+    """Resolves the git root once per working directory and caches the result.
+
+    The root is found by walking up from the working directory looking for a
+    .git directory. Worktrees and submodules (where .git is a file) and
+    explicit GIT_DIR/GIT_WORK_TREE setups fall back to asking git.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roots = {}
+
+    def resolve(self) -> str:
+        cwd = os.getcwd()
+        root = self._roots.get(cwd)
+        if root is None:
+            root = self._find_root(cwd)
+            with self._lock:
+                self._roots[cwd] = root
+        return root
+
+    def invalidate(self) -> None:
+        """Forget all cached roots."""
+        with self._lock:
+            self._roots.clear()
+
+    def _find_root(self, start: str) -> str:
+        if "GIT_DIR" not in os.environ and "GIT_WORK_TREE" not in os.environ:
+            directory = start
+            while True:
+                dot_git = os.path.join(directory, ".git")
+                if os.path.isdir(dot_git):
+                    return directory
+                if os.path.exists(dot_git):
+                    # Worktree or submodule, let git resolve it
+                    break
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+        return self._git_root()
+
+    def _git_root(self) -> str:
+        try:
+            git_root_bytes = subprocess.check_output(
+                ["git", "rev-parse", "--show-toplevel"], stderr=subprocess.DEVNULL
+            )
+            return git_root_bytes.decode("utf-8").strip()
+        except subprocess.CalledProcessError:
+            raise Exception("Not in a git repository or git command failed.")
+
+
+# Global resolver instance
+_resolver = GitRootResolver()
+
+
+def invalidate_path_cache() -> None:
+    """Forget the cached git root, e.g. after moving the repository or changing directory layout."""
+    _resolver.invalidate()
+
+
 def from_git_root(*path_elems: str | None) -> str:
-    try:
-        git_root_bytes = subprocess.check_output(
-            ["git", "rev-parse", "--show-toplevel"], stderr=subprocess.DEVNULL
-        )
-        git_root = git_root_bytes.decode("utf-8").strip()
-        return os.path.join(git_root, *path_elems)
-    except subprocess.CalledProcessError:
-        raise Exception("Not in a git repository or git command failed.")
+    return os.path.join(_resolver.resolve(), *path_elems)
 
 
 def from_paige_dir(*path_elems: str | None):
@@ -0,0 +1,159 @@
+import threading
+from typing import Callable, Dict, List, Union
+
+from paige.cancel import fail_fast_enabled, with_cancel_scope
+from paige.deps import (
+    Target,
+    check_functions,
+    get_dependencies,
+    report_errors,
+    run_target,
+    with_dependency,
+)
+from paige.scheduler import get_scheduler
+
+
+class Plan:
+    """The dependency graph of a set of targets, built before anything runs.
+
+    Targets declare their dependencies through Target.dependencies, for
+    functions with the deps option of the target decorator or Fn.
+    """
+
+    def __init__(self, targets: List[Target]):
+        self.targets: Dict[str, Target] = {}
+        self.prerequisites: Dict[str, List[str]] = {}
+        self.order: List[str] = []
+        self._build(targets)
+
+    def _build(self, roots: List[Target]) -> None:
+        """Collect all targets and order them so prerequisites come first.
+
+        This is an iterative depth-first search, so a cycle is found in time
+        linear in the size of the graph.
+        """
+        visiting, visited = set(), set()
+        for root in roots:
+            if root.id() in visited:
+                continue
+            self.targets.setdefault(root.id(), root)
+            stack = [(root, iter(self._expand(root)))]
+            visiting.add(root.id())
+            while stack:
+                target, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    visiting.discard(target.id())
+                    visited.add(target.id())
+                    self.order.append(target.id())
+                    continue
+                if child.id() in visiting:
+                    chain = [t.name() for t, _ in stack]
+                    start = [t.id() for t, _ in stack].index(child.id())
+                    path = " -> ".join(chain[start:] + [child.name()])
+                    raise RuntimeError(f"dependency cycle: {path}")
+                if child.id() in visited:
+                    continue
+                visiting.add(child.id())
+                stack.append((child, iter(self._expand(child))))
+
+    def _expand(self, target: Target) -> List[Target]:
+        """Register a target's dependencies in the graph and return them."""
+        if target.id() in self.prerequisites:
+            return [self.targets[key] for key in self.prerequisites[target.id()]]
+        children = []
+        for child in target.dependencies():
+            # The first target seen with an id stands for all of them
+            child = self.targets.setdefault(child.id(), child)
+            if child not in children:
+                children.append(child)
+        self.prerequisites[target.id()] = [child.id() for child in children]
+        return children
+
+    def run(self, ctx: dict) -> None:
+        """Run every target as soon as its prerequisites have finished.
+
+        Targets depending on a failed target are not run. Each target still
+        runs at most once per process, shared with Deps.
+        """
+        dependents: Dict[str, List[str]] = {key: [] for key in self.order}
+        waiting = {}
+        for key in self.order:
+            waiting[key] = len(self.prerequisites[key])
+            for prerequisite in self.prerequisites[key]:
+                dependents[prerequisite].append(key)
+
+        cond = threading.Condition()
+        state = {"finished": 0}
+        errors = []
+        scheduler = get_scheduler()
+        # With fail-fast, the first failure cancels the targets still running
+        # and skips the rest
+        fail_fast = fail_fast_enabled()
+        run_ctx, scope = with_cancel_scope(ctx, fail_fast)
+
+        def finish(key: str, failed: bool) -> List[str]:
+            """Mark a target finished and return the targets that became ready."""
+            ready = []
+            skipped = [key] if failed else []
+            state["finished"] += 1
+            if not failed:
+                for dependent in dependents[key]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+            # Skip everything that depends on a failed target
+            while skipped:
+                for dependent in dependents[skipped.pop()]:
+                    if waiting[dependent] > 0:
+                        waiting[dependent] = -1
+                        state["finished"] += 1
+                        skipped.append(dependent)
+            return ready
+
+        def start(keys: List[str]) -> None:
+            scheduler.submit([lambda k=key: execute(k) for key in keys])
+
+        def execute(key: str) -> None:
+            target = self.targets[key]
+            failed = False
+            try:
+                run_target(with_dependency(run_ctx, target), target, scope, fail_fast)
+            except Exception as e:
+                failed = True
+                with cond:
+                    errors.append((target.name(), e))
+            finally:
+                with cond:
+                    ready = finish(key, failed)
+                    cond.notify_all()
+                start(ready)
+
+        start([key for key in self.order if waiting[key] == 0])
+        with scheduler.blocking():
+            with cond:
+                cond.wait_for(lambda: state["finished"] == len(self.order))
+        report_errors(ctx, errors)
+
+
+def PlannedDeps(ctx: dict, *functions: Union[Target, Callable]) -> None:
+    """Run the provided functions and their declared dependencies in dependency order.
+
+    Unlike Deps, the whole graph is built and checked for cycles before any
+    target runs, and each target starts as soon as its own prerequisites are
+    done rather than when its parent calls Deps.
+    """
+    if not functions:
+        return
+    targets = check_functions(*functions)
+
+    # Targets already on the chain of the caller would wait on themselves
+    running = {dep.id(): dep for dep in get_dependencies(ctx)}
+    plan = Plan(targets)
+    for key in plan.order:
+        if key in running:
+            names = [d.name() for d in get_dependencies(ctx)]
+            msg = f"dependency cycle calling {running[key].name()}! chain: {','.join(names)}"
+            raise RuntimeError(msg)
+    plan.run(ctx)
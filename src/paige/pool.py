@@ -0,0 +1,107 @@
+import contextlib
+import io
+import logging
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from paige.exec import CMD_ENV_KEY
+from paige.logger import get_line_logger, new_logger, with_logger
+from paige.scheduler import get_scheduler
+
+# Name of the logger given to targets running in a worker process
+WORKER_LOGGER_NAME = "paige.worker"
+
+
+class _LineCollector(logging.Handler):
+    """Collects the log lines of a worker so they can be sent back to the parent."""
+
+    def __init__(self):
+        super().__init__()
+        self.lines: List[Tuple[int, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append((record.levelno, record.getMessage()))
+
+
+def _run_in_worker(fn: Callable, args: Tuple, env: Tuple[str, ...]) -> Dict[str, Any]:
+    """Run a target function in a worker process.
+
+    Returns the log lines and printed output of the function, and the error it
+    raised, if any, instead of raising it.
+    """
+    collector = _LineCollector()
+    logger = new_logger(WORKER_LOGGER_NAME)
+    logger.handlers = [collector]
+    logger.propagate = False
+    ctx = with_logger({CMD_ENV_KEY: env}, logger)
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    error = None
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            fn(ctx, *args)
+    except Exception as e:
+        error = e
+        try:
+            pickle.dumps(e)
+        except Exception:
+            # Send back what can be sent of an error that cannot be pickled
+            error = RuntimeError(f"{type(e).__name__}: {e}")
+
+    lines = collector.lines
+    lines += [(logging.INFO, line) for line in stdout.getvalue().splitlines()]
+    lines += [(logging.WARNING, line) for line in stderr.getvalue().splitlines()]
+    return {"lines": lines, "error": error}
+
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Returns the process pool shared by all targets marked to run in a process.
+
+    Workers are spawned rather than forked, as forking a process running
+    threads is unsafe. The pool has as many workers as the job limit.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=get_scheduler().jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the worker processes, a new pool is started when needed."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def run_in_process(ctx: dict, fn: Callable, args: Tuple) -> None:
+    """Run a target function in the shared process pool and wait for it.
+
+    The function gets a fresh context carrying the environment set with
+    context_with_env. Its log lines and printed output are logged through
+    ctx once it finishes, and the error it raised is raised here.
+    """
+    future = get_process_pool().submit(
+        _run_in_worker, fn, tuple(args), tuple(ctx.get(CMD_ENV_KEY, ()))
+    )
+    result = future.result()
+
+    log = get_line_logger(ctx)
+    for level, line in result["lines"]:
+        log(level, line)
+
+    error = result["error"]
+    if error is not None:
+        raise error
@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from paige.fingerprint import atomic_write
+from paige.logger import new_logger
+from paige.scheduler import get_scheduler
+
+# Set PAIGE_REPORT=true to print a critical path report after the run, or
+# PAIGE_REPORT=report.json to write it as JSON instead
+REPORT_ENV = "PAIGE_REPORT"
+
+
+class RunRecorder:
+    """Records the targets run by Deps, their timings and the dependency edges between them.
+
+    Targets run their dependencies from inside their own body, so the time a
+    target spends waiting on its dependencies is not part of its own time. The
+    critical path is the chain of targets, each followed by its slowest
+    dependency, that determines the total wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._edges: Dict[str, List[str]] = {}
+        self._timings: Dict[str, Tuple[float, float]] = {}
+
+    def add_edge(self, parent: str, child: str) -> None:
+        """Record that parent depends on child."""
+        with self._lock:
+            children = self._edges.setdefault(parent, [])
+            if child not in children:
+                children.append(child)
+
+    def add_timing(self, key: str, start: float, end: float) -> None:
+        """Record the start and end of a target, in seconds."""
+        with self._lock:
+            self._timings[key] = (start, end)
+
+    def report(self, jobs: int) -> Dict[str, Any]:
+        """Compute the critical path, slack and concurrency of the recorded run."""
+        with self._lock:
+            timings = dict(self._timings)
+            edges = {
+                parent: [c for c in children if c in timings]
+                for parent, children in self._edges.items()
+                if parent in timings
+            }
+        if not timings:
+            return {"targets": {}, "critical_path": [], "wall_time": 0.0}
+
+        own = {key: _own_time(key, timings, edges) for key in timings}
+
+        # Length of the longest chain starting at each target
+        length: Dict[str, float] = {}
+
+        def chain_length(key: str) -> float:
+            if key not in length:
+                children = edges.get(key, [])
+                length[key] = own[key] + max(
+                    (chain_length(c) for c in children), default=0.0
+                )
+            return length[key]
+
+        children_of_any = {c for children in edges.values() for c in children}
+        roots = [key for key in timings if key not in children_of_any]
+        total = max(chain_length(key) for key in roots)
+
+        # Slack: how much longer a target could take without delaying the run
+        slack: Dict[str, float] = {key: total - chain_length(key) for key in roots}
+        for key in _top_down(roots, edges):
+            children = edges.get(key, [])
+            longest = max((length[c] for c in children), default=0.0)
+            for child in children:
+                child_slack = slack[key] + longest - length[child]
+                slack[child] = min(slack.get(child, child_slack), child_slack)
+
+        critical_path = [max(roots, key=chain_length)]
+        while edges.get(critical_path[-1]):
+            critical_path.append(max(edges[critical_path[-1]], key=chain_length))
+
+        wall_time = max(end for _, end in timings.values()) - min(
+            start for start, _ in timings.values()
+        )
+        busy = sum(own.values())
+        concurrency = busy / wall_time if wall_time > 0 else 0.0
+        return {
+            "wall_time": wall_time,
+            "critical_path": critical_path,
+            "critical_path_time": total,
+            "average_concurrency": concurrency,
+            "jobs": jobs,
+            "efficiency": concurrency / jobs,
+            "targets": {
+                key: {
+                    "duration": timings[key][1] - timings[key][0],
+                    "own_time": own[key],
+                    "slack": slack[key],
+                    "dependencies": edges.get(key, []),
+                }
+                for key in timings
+            },
+        }
+
+    def write(self, value: str) -> None:
+        """Print the report, or write it as JSON when value is a path."""
+        report = self.report(get_scheduler().jobs)
+        if not report["targets"]:
+            return
+        if value.lower() in ("true", "1", "yes", "on"):
+            logger = new_logger("paige.report")
+            for line in format_report(report):
+                logger.info(line)
+            return
+        with atomic_write(value) as f:
+            json.dump(report, f, indent=2)
+
+
+def _own_time(
+    key: str, timings: Dict[str, Tuple[float, float]], edges: Dict[str, List[str]]
+) -> float:
+    """Duration of a target minus the wall time it spent waiting on its dependencies."""
+    start, end = timings[key]
+    intervals = sorted(
+        (max(start, timings[c][0]), min(end, timings[c][1])) for c in edges.get(key, [])
+    )
+    waited = 0.0
+    current_start, current_end = None, None
+    for s, e in intervals:
+        if e <= s:
+            continue
+        if current_end is None or s > current_end:
+            if current_end is not None:
+                waited += current_end - current_start
+            current_start, current_end = s, e
+        else:
+            current_end = max(current_end, e)
+    if current_end is not None:
+        waited += current_end - current_start
+    return max(0.0, end - start - waited)
+
+
+def _top_down(roots: List[str], edges: Dict[str, List[str]]) -> List[str]:
+    """Order targets so each comes after every target depending on it."""
+    order: List[str] = []
+    visited: Set[str] = set()
+
+    def visit(key: str) -> None:
+        if key in visited:
+            return
+        visited.add(key)
+        for child in edges.get(key, []):
+            visit(child)
+        order.append(key)
+
+    for root in roots:
+        visit(root)
+    return order[::-1]
+
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    """Format a report as lines for the terminal."""
+    path = " -> ".join(report["critical_path"])
+    lines = [
+        f"critical path ({report['critical_path_time']:.2f}s of "
+        f"{report['wall_time']:.2f}s wall time): {path}"
+    ]
+    targets = sorted(report["targets"].items(), key=lambda item: item[1]["slack"])
+    width = max(len(key) for key, _ in targets)
+    lines.append(f"{'target':<{width}}  {'duration':>9}  {'own':>9}  {'slack':>9}")
+    for key, target in targets:
+        lines.append(
+            f"{key:<{width}}  {target['duration']:>8.2f}s  "
+            f"{target['own_time']:>8.2f}s  {target['slack']:>8.2f}s"
+        )
+    lines.append(
+        f"average concurrency {report['average_concurrency']:.2f} of "
+        f"{report['jobs']} jobs ({report['efficiency']:.0%} efficiency)"
+    )
+    return lines
+
+
+def now() -> float:
+    """Returns the clock used for target timings, in seconds."""
+    return time.perf_counter()
+
+
+_lock = threading.Lock()
+_recorder: Optional[RunRecorder] = None
+_resolved = False
+
+
+def get_recorder() -> Optional[RunRecorder]:
+    """Returns the process-wide recorder, or None when PAIGE_REPORT is not set."""
+    global _recorder, _resolved
+    if _resolved:
+        return _recorder
+    with _lock:
+        if not _resolved:
+            value = os.environ.get(REPORT_ENV, "").lower()
+            if value not in ("", "0", "false", "no", "off"):
+                _recorder = RunRecorder()
+                atexit.register(write_report)
+            _resolved = True
+    return _recorder
+
+
+def write_report() -> None:
+    """Write the report now, for processes that exit without running atexit handlers."""
+    if _recorder is not None:
+        _recorder.write(os.environ.get(REPORT_ENV, ""))
+
+
+def reset_recorder() -> None:
+    """Forget the current recorder, so PAIGE_REPORT is read again on the next call."""
+    global _recorder, _resolved
+    with _lock:
+        if _recorder is not None:
+            atexit.unregister(write_report)
+        _recorder = None
+        _resolved = False
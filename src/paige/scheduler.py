@@ -0,0 +1,251 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+# Environment variable used to configure the job limit
+JOBS_ENV = "PAIGE_JOBS"
+
+
+def parse_jobs(value: str) -> int:
+    """Parse a job limit, raising a ValueError if it is not a positive integer."""
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise ValueError(f"job limit must be an integer, got: {value!r}")
+    if jobs < 1:
+        raise ValueError(f"job limit must be at least 1, got: {jobs}")
+    return jobs
+
+
+def default_jobs() -> int:
+    """Returns the job limit from PAIGE_JOBS, defaulting to the CPU count."""
+    value = os.environ.get(JOBS_ENV, "")
+    if value:
+        return parse_jobs(value)
+    return os.cpu_count() or 1
+
+
+class Task:
+    """A unit of work submitted to the Scheduler."""
+
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+
+    def __init__(self, fn: Callable[[], None]):
+        self.fn = fn
+        self.error: Optional[Exception] = None
+        # KeyboardInterrupt or SystemExit, re-raised by the thread waiting for the task
+        self.interrupt: Optional[BaseException] = None
+        self._state = Task.QUEUED
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def claim(self) -> bool:
+        """Mark the task as running, returning False if another thread already took it."""
+        with self._lock:
+            if self._state != Task.QUEUED:
+                return False
+            self._state = Task.RUNNING
+            return True
+
+    def run(self) -> None:
+        """Run a claimed task, recording any error instead of raising it.
+
+        KeyboardInterrupt and SystemExit are not errors of the task, they
+        propagate, also to the thread waiting for a task run by a worker.
+        """
+        try:
+            self.fn()
+        except Exception as e:
+            self.error = e
+        except BaseException as e:
+            self.interrupt = e
+            raise
+        finally:
+            self._state = Task.DONE
+            self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self) -> None:
+        self._done.wait()
+
+
+class Scheduler:
+    """Bounded pool of worker threads shared by all Deps calls.
+
+    At most `jobs` threads run tasks at a time. A thread waiting for its own
+    tasks runs the ones that are still queued inline, and gives up its slot
+    while it is blocked on the rest, so nested Deps calls cannot starve the pool.
+    """
+
+    def __init__(self, jobs: Optional[int] = None):
+        self._jobs = jobs
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._local = threading.local()
+        # Threads currently holding a slot, idle workers and workers not yet looping
+        self._active = 0
+        self._idle = 0
+        self._starting = 0
+        self._workers: List[threading.Thread] = []
+
+    @property
+    def jobs(self) -> int:
+        if self._jobs is None:
+            self._jobs = default_jobs()
+        return self._jobs
+
+    def set_jobs(self, jobs: int) -> None:
+        """Change the job limit."""
+        if jobs < 1:
+            raise ValueError(f"job limit must be at least 1, got: {jobs}")
+        with self._cond:
+            self._jobs = jobs
+            self._wake()
+
+    def submit(self, fns: List[Callable[[], None]]) -> List[Task]:
+        """Queue functions for execution and return their tasks."""
+        tasks = [Task(fn) for fn in fns]
+        with self._cond:
+            self._queue.extend(tasks)
+            self._wake()
+        return tasks
+
+    def wait(self, tasks: List[Task]) -> None:
+        """Wait for tasks to finish, running any that are still queued in this thread."""
+        with self._slot():
+            for task in tasks:
+                if task.claim():
+                    task.run()
+
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                with self.blocking():
+                    for task in pending:
+                        task.wait()
+
+        for task in tasks:
+            if task.interrupt is not None:
+                raise task.interrupt
+
+    def run_all(self, fns: List[Callable[[], None]]) -> List[Task]:
+        """Run functions in parallel and wait for all of them to finish.
+
+        The first function is kept back and run by the calling thread, so a
+        single function never hops threads.
+        """
+        if not fns:
+            return []
+        # Take our slot before queueing so workers see the correct count
+        with self._slot():
+            tasks = [Task(fns[0])] + self.submit(fns[1:])
+            self.wait(tasks)
+        return tasks
+
+    @contextmanager
+    def blocking(self) -> Iterator[None]:
+        """Give up this thread's slot while blocked so another worker can use it."""
+        if not self._holds_slot():
+            yield
+            return
+        with self._cond:
+            self._active -= 1
+            self._wake()
+        try:
+            yield
+        finally:
+            # A resumed thread takes its slot back without waiting, so the
+            # pool briefly runs above the limit instead of stalling the parent.
+            with self._cond:
+                self._active += 1
+
+    def _holds_slot(self) -> bool:
+        return getattr(self._local, "holds_slot", False)
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        """Hold a slot for the duration of the block, unless this thread already has one."""
+        if self._holds_slot():
+            yield
+            return
+        with self._cond:
+            self._active += 1
+        self._local.holds_slot = True
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def _release_slot(self) -> None:
+        self._local.holds_slot = False
+        with self._cond:
+            self._active -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """Wake or start workers for queued tasks. Must be called with the lock held."""
+        wanted = min(len(self._queue), self.jobs - self._active)
+        if wanted <= 0:
+            return
+        available = self._idle + self._starting
+        if available:
+            self._cond.notify(wanted)
+        for _ in range(wanted - available):
+            self._starting += 1
+            worker = threading.Thread(
+                target=self._worker,
+                name=f"paige-worker-{len(self._workers) + 1}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_task(self) -> Optional[Task]:
+        """Pop the next unclaimed task if a slot is free. Must be called with the lock held."""
+        if self._active >= self.jobs:
+            return None
+        while self._queue:
+            task = self._queue.popleft()
+            if task.claim():
+                return task
+        return None
+
+    def _worker(self) -> None:
+        with self._cond:
+            self._starting -= 1
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    task = self._next_task()
+                self._active += 1
+            self._local.holds_slot = True
+            try:
+                task.run()
+            except BaseException:
+                # Raised again by the thread waiting for the task, see wait
+                pass
+            finally:
+                self._release_slot()
+
+
+# Global scheduler instance
+_scheduler = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    """Returns the process-wide scheduler."""
+    return _scheduler
+
+
+def set_jobs(jobs: int) -> None:
+    """Set the maximum number of targets run in parallel."""
+    _scheduler.set_jobs(jobs)
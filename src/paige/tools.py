@@ -0,0 +1,208 @@
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import urllib.parse
+import urllib.request
+import zipfile
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Optional
+
+from paige.deps import Deps, Target
+from paige.fingerprint import temporary_path
+from paige.logger import get_logger
+from paige.path import from_bin_dir, from_tools_dir
+
+# Set PAIGE_TOOLS_STORE to share installed tools between worktrees, e.g. ~/.cache/paige
+STORE_ENV = "PAIGE_TOOLS_STORE"
+
+# Set PAIGE_TOOLS_MIRROR to fetch archives by file name from a mirror, e.g. file:///mirror
+MIRROR_ENV = "PAIGE_TOOLS_MIRROR"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def store_dir(*path_elems: str) -> str:
+    """Returns a path in the content-addressed tool store."""
+    root = os.environ.get(STORE_ENV, "")
+    if not root:
+        return from_tools_dir("store", *path_elems)
+    path = os.path.join(os.path.expanduser(root), *path_elems)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class Tool(Target):
+    """A versioned tool archive installed into the tool store and exposed in bin.
+
+    The archive is fetched from url, a local path or a file://, http:// or
+    https:// URL, in which {version} is replaced by the version. It is
+    verified against sha256 and unpacked into the store under its checksum,
+    so every worktree sharing the store shares one copy. binaries are paths
+    in the archive linked into the bin directory under their base name,
+    by default a file named like the tool. An archive that is not a tar or zip
+    file is the binary itself.
+
+    Tools are Targets, so passing several to Deps installs them in parallel,
+    each at most once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        url: str,
+        sha256: str,
+        binaries: Optional[List[str]] = None,
+    ):
+        self.tool_name = name
+        self.version = version
+        self.url = url.format(version=version)
+        self.sha256 = sha256.lower()
+        self.binaries = list(binaries or [name])
+
+    def name(self) -> str:
+        return f"{self.tool_name}@{self.version}"
+
+    def id(self) -> str:
+        return f"tool:{self.tool_name}@{self.version}:{self.sha256}"
+
+    def path(self) -> str:
+        """Returns the path of the tool's first binary in the bin directory."""
+        return from_bin_dir(os.path.basename(self.binaries[0]))
+
+    def run(self, ctx: dict) -> None:
+        self.install(ctx)
+
+    def install(self, ctx: dict) -> str:
+        """Install the tool if it is not in the store yet, link it into bin and return its path."""
+        unpacked = store_dir(self.sha256)
+        if not os.path.isdir(unpacked):
+            with _file_lock(store_dir(f"{self.sha256}.lock")):
+                # Another process may have installed it while we waited
+                if not os.path.isdir(unpacked):
+                    get_logger(ctx).info(f"installing {self.name()}")
+                    self._fetch_and_unpack(unpacked)
+        for binary in self.binaries:
+            link = from_bin_dir(os.path.basename(binary))
+            _link(_find_binary(unpacked, binary), link)
+        return self.path()
+
+    def _source(self) -> str:
+        mirror = os.environ.get(MIRROR_ENV, "")
+        if not mirror:
+            return self.url
+        file_name = os.path.basename(urllib.parse.urlparse(self.url).path)
+        return f"{mirror.rstrip('/')}/{file_name}"
+
+    def _fetch_and_unpack(self, unpacked: str) -> None:
+        source = self._source()
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(unpacked), prefix=".tmp-")
+        try:
+            archive = os.path.join(work_dir, "archive")
+            with _open_source(source) as src, open(archive, "wb") as dst:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            if digest.hexdigest() != self.sha256:
+                raise ValueError(
+                    f"checksum mismatch for {self.name()} from {source}: "
+                    f"expected {self.sha256}, got {digest.hexdigest()}"
+                )
+
+            contents = os.path.join(work_dir, "contents")
+            os.makedirs(contents)
+            _unpack(archive, contents, os.path.basename(self.binaries[0]))
+            os.rename(contents, unpacked)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def tool(
+    ctx: dict,
+    name: str,
+    version: str,
+    url: str,
+    sha256: str,
+    binaries: Optional[List[str]] = None,
+) -> str:
+    """Install a tool, see Tool, at most once per process and return the path of its binary."""
+    t = Tool(name, version, url, sha256, binaries)
+    Deps(ctx, t)
+    return t.path()
+
+
+@contextmanager
+def _open_source(source: str) -> Iterator[IO[bytes]]:
+    if urllib.parse.urlparse(source).scheme in ("file", "http", "https"):
+        with urllib.request.urlopen(source) as f:
+            yield f
+    else:
+        with open(source, "rb") as f:
+            yield f
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path, shared with other processes."""
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _unpack(archive: str, dest: str, binary_name: str) -> None:
+    """Unpack a tar or zip archive into dest, or copy a plain binary into it."""
+    if tarfile.is_tarfile(archive):
+        with tarfile.open(archive) as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(dest, filter="data")
+            else:
+                tar.extractall(dest)
+    elif zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                path = zf.extract(info, dest)
+                # Keep the executable bits zip stores in the external attributes
+                mode = info.external_attr >> 16
+                if mode & stat.S_IXUSR:
+                    os.chmod(path, mode & 0o777)
+    else:
+        binary = os.path.join(dest, binary_name)
+        shutil.copyfile(archive, binary)
+        os.chmod(binary, 0o755)
+
+
+def _find_binary(unpacked: str, binary: str) -> str:
+    """Returns the path of binary in the store, searching by name if it is not at the given path."""
+    path = os.path.join(unpacked, binary)
+    if os.path.isfile(path):
+        return path
+    name = os.path.basename(binary)
+    for root, _, files in os.walk(unpacked):
+        if name in files:
+            return os.path.join(root, name)
+    raise FileNotFoundError(f"{binary} not found in {unpacked}")
+
+
+def _link(target: str, link: str) -> None:
+    """Atomically point link at target, with a hardlink or a symlink across file systems."""
+    if os.path.exists(link) and os.path.samefile(target, link):
+        return
+    tmp_link = temporary_path(link)
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    try:
+        os.link(target, tmp_link)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        os.symlink(target, tmp_link)
+    os.replace(tmp_link, link)
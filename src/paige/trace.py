@@ -0,0 +1,145 @@
+import atexit
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from paige.fingerprint import atomic_write
+
+# Set PAIGE_TRACE=out.json to record a Chrome trace-event file of the run
+TRACE_ENV = "PAIGE_TRACE"
+
+
+class Tracer:
+    """Records spans in the Chrome trace-event format, viewable in Perfetto or chrome://tracing.
+
+    Timestamps are microseconds since the tracer was created. The events are
+    written to path when the process exits, or when save is called.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+
+    def now(self) -> float:
+        """Returns the current trace timestamp in microseconds."""
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def complete(
+        self, name: str, cat: str, start: float, end: float, args: Dict[str, Any]
+    ) -> None:
+        """Record a span that started at start and ended at end on the current thread."""
+        self._add(
+            {"name": name, "cat": cat, "ph": "X", "ts": start, "dur": end - start},
+            args,
+        )
+
+    def instant(self, name: str, cat: str, args: Dict[str, Any]) -> None:
+        """Record a point in time on the current thread."""
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self.now()}
+        self._add(event, args)
+
+    def _add(self, event: Dict[str, Any], args: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        event["args"] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Returns the recorded events, preceded by the thread name metadata."""
+        with self._lock:
+            metadata = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._threads.items()
+            ]
+            return metadata + list(self._events)
+
+    def save(self) -> None:
+        """Atomically write the trace file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+
+
+class TracedPopen(subprocess.Popen):
+    """Popen recording a span from the start of the process until it is waited for."""
+
+    def __init__(self, tracer: Tracer, args: List[str], **kwargs):
+        self._tracer = tracer
+        self._trace_start = tracer.now()
+        self._traced = False
+        super().__init__(args, **kwargs)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        code = super().wait(timeout)
+        if not self._traced:
+            self._traced = True
+            trace_command(self._tracer, list(self.args), self._trace_start, code)
+        return code
+
+
+def trace_command(tracer: Tracer, argv: List[str], start: float, code: int) -> None:
+    """Record the span of a command that started at start and exited with code."""
+    tracer.complete(
+        os.path.basename(argv[0]),
+        "command",
+        start,
+        tracer.now(),
+        {"argv": argv, "exit_code": code},
+    )
+
+
+_lock = threading.Lock()
+_tracer: Optional[Tracer] = None
+_resolved = False
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Returns the process-wide tracer, or None when PAIGE_TRACE is not set.
+
+    The environment is only read on the first call, so checking for a tracer
+    is cheap when tracing is off.
+    """
+    global _tracer, _resolved
+    if _resolved:
+        return _tracer
+    with _lock:
+        if not _resolved:
+            path = os.environ.get(TRACE_ENV, "")
+            if path:
+                _tracer = Tracer(os.path.abspath(path))
+                atexit.register(_tracer.save)
+            _resolved = True
+    return _tracer
+
+
+def save_trace() -> None:
+    """Write the trace file now, for processes that exit without running atexit handlers."""
+    if _tracer is not None:
+        _tracer.save()
+
+
+def reset_tracer() -> None:
+    """Forget the current tracer, so PAIGE_TRACE is read again on the next call."""
+    global _tracer, _resolved
+    with _lock:
+        if _tracer is not None:
+            atexit.unregister(_tracer.save)
+        _tracer = None
+        _resolved = False
@@ -0,0 +1,214 @@
+"""Sets up the .paige virtualenv, reusing environments from a shared cache.
+
+This module only uses the standard library: paige copies it into .paige as
+BOOTSTRAP_FILE, which generated Makefiles run to create the environment paige
+itself is installed into.
+"""
+
+import hashlib
+import os
+import platform
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+from typing import List, Optional
+
+# Set PAIGE_VENV_CACHE to the directory holding ready-made environments, or off
+VENV_CACHE_ENV = "PAIGE_VENV_CACHE"
+
+# Fingerprint of the environment, inside the environment and its cache entries
+FINGERPRINT_FILE = ".paige-fingerprint"
+
+# Copy of this module in .paige, without .py so it is not taken for targets
+BOOTSTRAP_FILE = "venv-bootstrap"
+
+
+def venv_cache_dir() -> Optional[str]:
+    """Returns the shared environment cache directory, or None when caching is off."""
+    value = os.environ.get(VENV_CACHE_ENV, "")
+    if value.lower() in ("0", "false", "no", "off"):
+        return None
+    if value:
+        return os.path.expanduser(value)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "paige", "venvs")
+
+
+def requires_python(paige_dir: str) -> Optional[str]:
+    """Returns the requires-python of the .paige project, if it has one."""
+    try:
+        with open(os.path.join(paige_dir, "pyproject.toml")) as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    match = re.search(r'^requires-python\s*=\s*"([^"]*)"', content, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def find_python(paige_dir: str) -> str:
+    """Returns the interpreter uv picks for the requires-python of the project."""
+    request = requires_python(paige_dir)
+    args = ["uv", "python", "find", "--system"] + ([request] if request else [])
+    output = subprocess.check_output(args, cwd=paige_dir, text=True)
+    return os.path.realpath(output.strip())
+
+
+def venv_fingerprint(paige_dir: str, python: str) -> str:
+    """Fingerprint of pyproject.toml, uv.lock and the interpreter of the environment."""
+    digest = hashlib.sha256()
+    for name in ("pyproject.toml", "uv.lock"):
+        digest.update(name.encode() + b"\0")
+        try:
+            with open(os.path.join(paige_dir, name), "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"missing")
+        digest.update(b"\0")
+    # An interpreter upgraded in place is a different one
+    st = os.stat(python)
+    for part in (
+        python,
+        st.st_size,
+        st.st_mtime_ns,
+        platform.system(),
+        platform.machine(),
+    ):
+        digest.update(str(part).encode() + b"\0")
+    return digest.hexdigest()
+
+
+def read_fingerprint(venv: str) -> Optional[str]:
+    """Returns the fingerprint recorded in an environment, if any."""
+    try:
+        with open(os.path.join(venv, FINGERPRINT_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _temporary_path(path: str) -> str:
+    # Same naming as paige.fingerprint.temporary_path, which this module cannot import
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def link_tree(src: str, dst: str) -> None:
+    """Copy the tree at src to dst, hardlinking files and copying where links fail."""
+    for directory, dirnames, filenames in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(directory, src))
+        os.makedirs(target, exist_ok=True)
+        for name in dirnames + filenames:
+            path = os.path.join(directory, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), os.path.join(target, name))
+            elif name in filenames:
+                try:
+                    os.link(path, os.path.join(target, name))
+                except OSError:
+                    shutil.copy2(path, os.path.join(target, name))
+
+
+def break_links(tree: str) -> None:
+    """Give every hardlinked file in tree its own copy.
+
+    A restored environment shares its files with the cache entry, which must
+    not change when the environment is synced again.
+    """
+    for directory, _, filenames in os.walk(tree):
+        for name in filenames:
+            path = os.path.join(directory, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode) and st.st_nlink > 1:
+                tmp = _temporary_path(path)
+                shutil.copy2(path, tmp)
+                os.replace(tmp, path)
+
+
+def write_fingerprint(venv: str, fingerprint: str) -> None:
+    """Record the fingerprint of an environment in a new file, see break_links."""
+    marker = os.path.join(venv, FINGERPRINT_FILE)
+    tmp = _temporary_path(marker)
+    with open(tmp, "w") as f:
+        f.write(fingerprint + "\n")
+    os.replace(tmp, marker)
+
+
+def restore_venv(entry: str, venv: str) -> None:
+    """Replace venv with a linked copy of the cache entry."""
+    tmp = _temporary_path(venv)
+    shutil.rmtree(tmp, ignore_errors=True)
+    link_tree(entry, tmp)
+    shutil.rmtree(venv, ignore_errors=True)
+    os.rename(tmp, venv)
+
+
+def store_venv(venv: str, entry: str) -> None:
+    """Add venv to the cache as entry, unless another process already did."""
+    if os.path.exists(entry):
+        return
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = _temporary_path(entry)
+    shutil.rmtree(tmp, ignore_errors=True)
+    link_tree(venv, tmp)
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def sync_venv(paige_dir: str) -> str:
+    """Make the .venv of paige_dir match its pyproject.toml and uv.lock.
+
+    Nothing is done when the fingerprint of the environment matches. Otherwise
+    an environment with the same fingerprint is linked in from the cache, and
+    only when there is none is uv sync run, updating the existing environment
+    and adding the result to the cache. Environments are created relocatable,
+    so they work from any checkout, with the interpreter uv finds for the
+    requires-python of the project. Returns what was done.
+    """
+    venv = os.path.join(paige_dir, ".venv")
+    python = find_python(paige_dir)
+    fingerprint = venv_fingerprint(paige_dir, python)
+    current = read_fingerprint(venv)
+    if current == fingerprint:
+        # Newer than pyproject.toml and uv.lock, so make considers it up to date
+        write_fingerprint(venv, fingerprint)
+        return "up to date"
+
+    cache_dir = venv_cache_dir()
+    if cache_dir and read_fingerprint(os.path.join(cache_dir, fingerprint)):
+        restore_venv(os.path.join(cache_dir, fingerprint), venv)
+        return "restored"
+
+    if current is None:
+        # Not created by paige, so it may not be relocatable
+        shutil.rmtree(venv, ignore_errors=True)
+        subprocess.check_call(
+            ["uv", "venv", "--relocatable", "--python", python, venv],
+            cwd=paige_dir,
+        )
+    else:
+        # uv sync must not change the cache entries sharing these files
+        break_links(venv)
+    env = dict(os.environ, VIRTUAL_ENV=venv)
+    subprocess.check_call(["uv", "sync", "--active"], cwd=paige_dir, env=env)
+
+    # uv sync creates uv.lock when there is none
+    fingerprint = venv_fingerprint(paige_dir, python)
+    write_fingerprint(venv, fingerprint)
+    if cache_dir:
+        store_venv(venv, os.path.join(cache_dir, fingerprint))
+    return "synced"
+
+
+def main(argv: List[str]) -> None:
+    if argv != ["sync"]:
+        print("usage: venv.py sync")
+        sys.exit(2)
+    print(f"Paige Python environment: {sync_venv(os.getcwd())}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from paige import bench
+
+
+class TestProjectShape(unittest.TestCase):
+    def test_targets_call_the_next_level(self):
+        shape = bench.ProjectShape(modules=1, targets=7, fan_out=2, depth=3)
+        self.assertEqual(shape.levels(), [[0, 1, 2], [3, 4], [5, 6]])
+        self.assertEqual(
+            shape.dependencies(),
+            {0: [3, 4], 1: [3, 4], 2: [3, 4], 3: [5, 6], 4: [5, 6], 5: [], 6: []},
+        )
+
+    def test_generated_project_parses(self):
+        shape = bench.ProjectShape(modules=3, targets=5, fan_out=2, depth=2)
+        with tempfile.TemporaryDirectory() as root:
+            project = bench.SyntheticProject(root, shape)
+            self.assertEqual(
+                sorted(project.functions), ["module0", "module1", "module2"]
+            )
+            self.assertEqual(sum(len(f) for f in project.functions.values()), 15)
+            self.assertEqual(len(project.root_targets()), 3 * 3)
+
+    def test_invalid_shape(self):
+        with self.assertRaisesRegex(ValueError, "at least 1"):
+            bench.ProjectShape(fan_out=0)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def run_quick(self, names):
+        shape = bench.ProjectShape(modules=2, targets=6, fan_out=2, depth=3)
+        return bench.run_benchmarks(shape, names, repeat=2, min_time=0.001)
+
+    def test_run_selected_benchmarks(self):
+        results = self.run_quick(["run_once", "generate_init_file", "project_schedule"])
+        self.assertEqual(results["version"], bench.BENCH_VERSION)
+        self.assertEqual(results["project"]["modules"], 2)
+        benchmarks = results["benchmarks"]
+        self.assertEqual(
+            list(benchmarks), ["run_once", "generate_init_file", "project_schedule"]
+        )
+        self.assertTrue(all(b["seconds"] > 0 for b in benchmarks.values()))
+        self.assertAlmostEqual(
+            benchmarks["project_schedule"]["per_target"],
+            benchmarks["project_schedule"]["seconds"] / 12,
+        )
+
+    def test_unknown_benchmark(self):
+        with self.assertRaisesRegex(ValueError, "unknown benchmarks: nope"):
+            self.run_quick(["nope"])
+
+    def test_find_regressions(self):
+        def results(**seconds):
+            return {
+                "version": bench.BENCH_VERSION,
+                "benchmarks": {k: {"seconds": v} for k, v in seconds.items()},
+            }
+
+        baseline = results(a=1.0, b=1.0, c=1.0)
+        current = results(a=1.1, b=2.0, d=5.0)
+        self.assertEqual(
+            bench.find_regressions(baseline, current),
+            ["b: 1.00s -> 2.00s (+100%)"],
+        )
+        self.assertEqual(bench.find_regressions(baseline, current, threshold=1.5), [])
+        with self.assertRaisesRegex(ValueError, "baseline has version"):
+            bench.find_regressions({"version": 0}, current)
+
+        # Results of another project or Python are not comparable
+        other = dict(baseline, project={"modules": 1}, python="3.0.0")
+        with self.assertRaisesRegex(ValueError, "baseline has project"):
+            bench.find_regressions(other, dict(current, project={"modules": 2}))
+        with self.assertRaisesRegex(ValueError, "baseline has python 3.0.0"):
+            bench.find_regressions(other, dict(current, project={"modules": 1}))
+
+    def test_compare_with_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            baseline = os.path.join(tmp, "baseline.json")
+            with open(baseline, "w") as f:
+                json.dump(
+                    {
+                        "version": bench.BENCH_VERSION,
+                        "benchmarks": {"run_once_cached": {"seconds": 1e-12}},
+                    },
+                    f,
+                )
+            args = ["-k", "^run_once_cached$", "--repeat", "2", "--min-time", "0.001"]
+            args += ["--modules", "1", "--targets", "2"]
+            with redirect_stdout(io.StringIO()) as out:
+                with self.assertRaises(SystemExit) as cm:
+                    bench.main(args + ["-o", output, "--compare", baseline])
+            self.assertEqual(cm.exception.code, 1)
+            self.assertIn("1 regressions against", out.getvalue())
+
+            # The results pass against themselves
+            with redirect_stdout(io.StringIO()):
+                bench.main(args + ["--compare", output, "--threshold", "100"])
+            with open(output) as f:
+                self.assertIn("run_once_cached", json.load(f)["benchmarks"])
+
+            # Another project shape is refused
+            with redirect_stdout(io.StringIO()):
+                with self.assertRaises(SystemExit) as cm:
+                    bench.main(args + ["--modules", "2", "--compare", output])
+            self.assertIn("baseline has project", str(cm.exception.code))
+
+    def test_filter_matching_nothing(self):
+        with redirect_stderr(io.StringIO()) as err:
+            with self.assertRaises(SystemExit) as cm:
+                bench.main(["-k", "no-such-benchmark"])
+        self.assertEqual(cm.exception.code, 2)
+        self.assertIn("no benchmarks match 'no-such-benchmark'", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige import cancel
+from paige.deps import Runner
+from paige.logger import new_logger, with_logger
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie is not running any more
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(") ")[1][0] != "Z"
+    except OSError:
+        return True
+
+
+class TestFailFast(unittest.TestCase):
+    def setUp(self):
+        pg.deps._runner = Runner()
+        self.ctx = with_logger({}, new_logger("paige.test-cancel"))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.dict(os.environ, {cancel.FAIL_FAST_ENV: "true"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = pg.scheduler.get_scheduler()
+        self.addCleanup(self.scheduler.set_jobs, self.scheduler.jobs)
+        self.scheduler.set_jobs(4)
+
+    def pid_file(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def read_pid(self, name):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                with open(self.pid_file(name)) as f:
+                    return int(f.read())
+            except (OSError, ValueError):
+                time.sleep(0.01)
+        self.fail(f"no pid written to {name}")
+
+    def test_failure_stops_siblings_and_nested_deps(self):
+        started = threading.Event()
+
+        def slow(ctx):
+            # The grandchild sleep is in the process group of sh
+            started.set()
+            script = f"sleep 30 & echo $! > {self.pid_file('slow')}; wait"
+            pg.run(ctx, "sh", "-c", script)
+
+        def outer(ctx):
+            pg.Deps(ctx, slow)
+
+        def fail(ctx):
+            started.wait(5)
+            self.read_pid("slow")
+            raise ValueError("boom")
+
+        start = time.monotonic()
+        with self.assertLogs("paige.test-cancel", level="INFO") as logs:
+            with self.assertRaisesRegex(RuntimeError, "Errors occurred in 1 targets"):
+                pg.Deps(self.ctx, outer, fail)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(alive(self.read_pid("slow")))
+        self.assertIn("ERROR:paige.test-cancel:Error in fail: boom", logs.output)
+        self.assertIn("INFO:paige.test-cancel:Cancelled 1 targets: outer", logs.output)
+
+    def test_pending_targets_do_not_start(self):
+        self.scheduler.set_jobs(1)
+        calls = []
+
+        def fail(ctx):
+            raise ValueError("boom")
+
+        def later(ctx):
+            calls.append("later")
+
+        with self.assertLogs("paige.test-cancel", level="INFO"):
+            with self.assertRaises(RuntimeError):
+                pg.Deps(self.ctx, fail, later)
+        self.assertEqual(calls, [])
+
+    def test_disabled_lets_siblings_finish(self):
+        calls = []
+
+        def fail(ctx):
+            raise ValueError("boom")
+
+        def slow(ctx):
+            pg.run(ctx, "sleep", "0.2")
+            calls.append("slow")
+
+        with patch.dict(os.environ, {cancel.FAIL_FAST_ENV: "false"}):
+            with self.assertLogs("paige.test-cancel", level="INFO"):
+                with self.assertRaises(RuntimeError):
+                    pg.Deps(self.ctx, fail, slow)
+        self.assertEqual(calls, ["slow"])
+
+    def test_defaults_to_on_in_ci(self):
+        with patch.dict(os.environ, {"CI": "true"}):
+            del os.environ[cancel.FAIL_FAST_ENV]
+            self.assertTrue(cancel.fail_fast_enabled())
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(cancel.fail_fast_enabled())
+
+
+class TestProcessRegistry(unittest.TestCase):
+    def test_kill_after_grace(self):
+        ctx, scope = cancel.with_cancel_scope({}, fail_fast=True)
+        cmd = pg.command(ctx, "sh", "-c", 'trap "" TERM; echo ready; sleep 30')
+        self.assertEqual(cmd.stdout.readline().strip(), "ready")
+        with patch("paige.cancel.TERMINATE_GRACE_SECONDS", 0.1):
+            scope.cancel("test")
+        self.assertEqual(cmd.wait(timeout=5), -9)
+        cmd.stdout.close()
+        cmd.stderr.close()
+        with self.assertRaises(pg.TargetCancelled):
+            pg.command(ctx, "true")
+
+    def test_only_cancellable_commands_get_their_own_session(self):
+        def sleep(ctx):
+            return pg.command(
+                ctx, "sleep", "30", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        cmd = sleep({})
+        self.assertEqual(os.getpgid(cmd.pid), os.getpgrp())
+        cmd.kill()
+        cmd.wait()
+
+        ctx, scope = cancel.with_cancel_scope({})
+        cmd = sleep(ctx)
+        self.assertEqual(os.getpgid(cmd.pid), os.getpgrp())
+        # Stopped by itself rather than as a group
+        scope.cancel("test")
+        self.assertEqual(cmd.wait(timeout=5), -15)
+
+        ctx, _ = cancel.with_cancel_scope({}, fail_fast=True)
+        nested, _ = cancel.with_cancel_scope(ctx)
+        cmd = sleep(nested)
+        self.assertEqual(os.getsid(cmd.pid), cmd.pid)
+        cmd.kill()
+        cmd.wait()
+
+    def test_commands_are_stopped_on_sigterm(self):
+        script = (
+            "import os, signal, time\n"
+            "import paige as pg\n"
+            "assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL\n"
+            "pg.cancel.install_signal_handlers()\n"
+            "cmd = pg.command({}, 'sleep', '30')\n"
+            "print(cmd.pid, flush=True)\n"
+            "os.kill(os.getpid(), signal.SIGTERM)\n"
+            "time.sleep(30)\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            timeout=20,
+        )
+        self.assertEqual(out.returncode, -15, out.stderr)
+        self.assertFalse(alive(int(out.stdout)))
+
+    def test_commands_are_stopped_on_interrupt(self):
+        script = (
+            "import paige as pg\n"
+            "cmd = pg.command({}, 'sleep', '30')\n"
+            "print(cmd.pid, flush=True)\n"
+            "raise KeyboardInterrupt\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            timeout=20,
+        )
+        self.assertFalse(alive(int(out.stdout)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from paige import components
+
+SOURCE = """\
+def hello(ctx, name):
+    print("hello", name)
+"""
+
+
+class TestComponents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.realpath(self.tmp.name)
+        subprocess.run(["git", "init", "-q", self.root], check=True)
+        with open(os.path.join(self.root, ".gitignore"), "w") as f:
+            f.write("vendor/\n")
+        for component in ("services/api", "services/web", "vendor/lib"):
+            self.write(component, "paigefile.py", SOURCE)
+        self.write("docs", "notes.txt", "")
+        self.write("", "paigefile.py", SOURCE)
+
+        patchers = [
+            patch("paige.components.from_git_root", side_effect=self.root_path),
+            patch("paige.components.from_paige_dir", side_effect=self.paige_path),
+            patch("paige.components.from_build_dir", side_effect=self.build_path),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def root_path(self, *elems):
+        return os.path.join(self.root, *elems)
+
+    def paige_path(self, *elems):
+        return self.root_path(".paige", *elems)
+
+    def build_path(self, *elems):
+        path = self.paige_path("build", *elems)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def write(self, component, name, content):
+        path = os.path.join(self.root, component, ".paige", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_find_paige_dirs_skips_ignored(self):
+        self.assertEqual(
+            components.find_paige_dirs(self.root),
+            [
+                self.root_path(".paige"),
+                self.root_path("services", "api", ".paige"),
+                self.root_path("services", "web", ".paige"),
+            ],
+        )
+
+    def test_generate_components(self):
+        found = components.generate_components()
+        self.assertEqual(sorted(found), [".", "services/api", "services/web"])
+        entry_point = self.paige_path("bin", components.COMPONENTS_BINARY)
+        out = subprocess.run(
+            [sys.executable, entry_point, "services/api", "hello", "api"],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        )
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertIn("hello api", out.stdout)
+
+    def test_regenerate_one_component(self):
+        components.generate_components()
+        self.write("services/new", "paigefile.py", SOURCE)
+        with patch("paige.components.find_paige_dirs") as mock_find:
+            found = components.generate_components(
+                [self.root_path("services", "new", ".paige")]
+            )
+        mock_find.assert_not_called()
+        self.assertEqual(
+            sorted(found), [".", "services/api", "services/new", "services/web"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from paige import daemon, deps, parser
+
+SOURCE = """\
+import paige as pg
+
+CALLS = []
+
+
+def lint(ctx):
+    CALLS.append("lint")
+"""
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        deps._runner = deps.Runner()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paige_dir = self.tmp.name
+        self.source = os.path.join(self.paige_dir, "daemonfile.py")
+        with open(self.source, "w") as f:
+            f.write(SOURCE)
+        for target in ("paige.daemon.from_paige_dir", "paige.parser.from_paige_dir"):
+            patcher = patch(target, return_value=self.paige_dir)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        sys.path.insert(0, self.paige_dir)
+        self.addCleanup(sys.path.remove, self.paige_dir)
+        self.addCleanup(sys.modules.pop, "daemonfile", None)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_reload_imports_modules(self):
+        d = daemon.Daemon()
+        d.reload_if_changed()
+        self.assertEqual(d.table, {"lint": ("daemonfile", None, "lint", 0)})
+        self.assertIn("daemonfile", sys.modules)
+
+        daemon.run_targets([(d.table["lint"], []), (d.table["lint"], [])])
+        self.assertEqual(sys.modules["daemonfile"].CALLS, ["lint"])
+
+    def test_reload_only_when_sources_change(self):
+        d = daemon.Daemon()
+        d.reload_if_changed()
+        module = sys.modules["daemonfile"]
+
+        d.reload_if_changed()
+        self.assertIs(sys.modules["daemonfile"], module)
+
+        with open(self.source, "a") as f:
+            f.write("\n\ndef test(ctx):\n    pass\n")
+        d.reload_if_changed()
+        self.assertIsNot(sys.modules["daemonfile"], module)
+        self.assertIn("test", d.table)
+
+    def test_reload_forgets_helper_modules(self):
+        with open(os.path.join(self.paige_dir, "daemonhelper.py"), "w") as f:
+            f.write("VALUE = 1\n")
+        self.addCleanup(sys.modules.pop, "daemonhelper", None)
+        d = daemon.Daemon()
+        d.reload_if_changed()
+        import daemonhelper
+
+        with open(self.source, "a") as f:
+            f.write("\n\ndef test(ctx):\n    pass\n")
+        d.reload_if_changed()
+        self.assertNotIn("daemonhelper", sys.modules)
+        self.assertIn("paige", sys.modules)
+        self.assertIsNot(daemonhelper, __import__("daemonhelper"))
+
+
+CLIENT_SOURCE = """\
+import os
+
+import daemonhelper
+
+
+def show(ctx):
+    # Children of the daemon run the targets
+    print(f"value {daemonhelper.VALUE} from {os.getppid()}")
+
+
+def fail(ctx):
+    raise ValueError("boom")
+"""
+
+
+class TestDaemonServer(unittest.TestCase):
+    """Runs targets through the generated binary and a daemon serving them."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.realpath(self.tmp.name)
+        subprocess.check_call(["git", "init", "-q", self.root])
+        self.paige_dir = os.path.join(self.root, ".paige")
+        os.makedirs(os.path.join(self.paige_dir, "bin"))
+        with open(os.path.join(self.paige_dir, "client.py"), "w") as f:
+            f.write(CLIENT_SOURCE)
+        self.write_helper(1)
+
+        self.binary = os.path.join(self.paige_dir, "bin", "paigefile")
+        functions = parser.parse_python_files(self.paige_dir)
+        with open(self.binary, "w") as f:
+            f.write(parser.generate_init_file(functions, []))
+
+        self.env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.env.pop(daemon.DAEMON_ENV, None)
+        self.server = server = subprocess.Popen(
+            [sys.executable, "-c", "from paige.daemon import serve; serve()"],
+            cwd=self.root,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(server.wait)
+        self.addCleanup(server.send_signal, signal.SIGINT)
+        sock = os.path.join(self.paige_dir, "build", daemon.SOCKET_NAME)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(sock):
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            self.assertIsNone(server.poll())
+            time.sleep(0.01)
+
+    def write_helper(self, value):
+        path = os.path.join(self.paige_dir, "daemonhelper.py")
+        with open(path, "w") as f:
+            f.write(f"VALUE = {value}\n")
+        # Make the change visible even within the mtime resolution
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + value))
+
+    def run_binary(self, *args):
+        return subprocess.run(
+            [sys.executable, self.binary, *args],
+            cwd=self.root,
+            env=self.env,
+            capture_output=True,
+            text=True,
+        )
+
+    def test_runs_targets_and_reloads_helpers(self):
+        result = self.run_binary("show")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, f"value 1 from {self.server.pid}\n")
+
+        self.write_helper(2)
+        result = self.run_binary("show")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, f"value 2 from {self.server.pid}\n")
+
+    def test_reports_exit_code(self):
+        result = self.run_binary("fail")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("boom", result.stderr)
@@ -0,0 +1,288 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige.deps import Runner
+from paige.logger import new_logger, with_logger
+from paige.pool import shutdown_process_pool
+from paige.scheduler import Scheduler
+
+
+@pg.target(process=True)
+def count_primes(ctx, limit):
+    primes = [n for n in range(2, limit) if all(n % d for d in range(2, n))]
+    print(f"{len(primes)} primes in pid {os.getpid()}")
+
+
+@pg.target(process=True)
+def fail_in_process(ctx):
+    raise ValueError("boom in worker")
+
+
+class TestDeps(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = pg.scheduler.get_scheduler()
+        self.original_jobs = self.scheduler.jobs
+        pg.deps._runner = Runner()
+
+    def tearDown(self):
+        self.scheduler.set_jobs(self.original_jobs)
+
+    def test_runs_each_target_once(self):
+        calls = []
+        lock = threading.Lock()
+
+        def shared(ctx):
+            with lock:
+                calls.append("shared")
+
+        def a(ctx):
+            pg.Deps(ctx, shared)
+
+        def b(ctx):
+            pg.Deps(ctx, shared)
+
+        pg.Deps({}, a, b, shared)
+        self.assertEqual(calls, ["shared"])
+
+    def test_respects_job_limit(self):
+        pg.set_jobs(2)
+        state = {"running": 0, "max": 0}
+        lock = threading.Lock()
+
+        def work(ctx, i):
+            with lock:
+                state["running"] += 1
+                state["max"] = max(state["max"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+
+        pg.Deps({}, *[pg.Fn(work, i) for i in range(20)])
+        self.assertLessEqual(state["max"], 2)
+
+    def test_nested_deps_do_not_deadlock(self):
+        pg.set_jobs(1)
+        done = []
+
+        def leaf(ctx, i):
+            done.append(i)
+
+        def middle(ctx, i):
+            pg.Deps(ctx, *[pg.Fn(leaf, i * 10 + j) for j in range(5)])
+
+        def top(ctx):
+            pg.Deps(ctx, *[pg.Fn(middle, i) for i in range(5)])
+
+        pg.Deps({}, top)
+        self.assertEqual(len(done), 25)
+
+    def test_errors_are_reported(self):
+        def fail(ctx):
+            raise ValueError("boom")
+
+        def ok(ctx):
+            pass
+
+        with self.assertRaisesRegex(RuntimeError, "Errors occurred in 1 targets"):
+            pg.Deps({}, fail, ok)
+
+    def test_dependency_cycle(self):
+        def loop(ctx):
+            pg.Deps(ctx, loop)
+
+        with self.assertRaisesRegex(RuntimeError, "Errors occurred"):
+            pg.Deps({}, loop)
+
+    def test_serial_deps_order(self):
+        order = []
+
+        def first(ctx):
+            order.append("first")
+
+        def second(ctx):
+            order.append("second")
+
+        pg.SerialDeps({}, first, second)
+        self.assertEqual(order, ["first", "second"])
+
+
+class TestAsyncDeps(unittest.TestCase):
+    def setUp(self):
+        pg.deps._runner = Runner()
+
+    def test_deps_runs_async_targets(self):
+        calls = []
+
+        async def fetch(ctx, i):
+            await asyncio.sleep(0)
+            calls.append(i)
+
+        pg.Deps({}, *[pg.Fn(fetch, i) for i in range(3)])
+        self.assertEqual(sorted(calls), [0, 1, 2])
+
+    def test_async_deps_shares_run_once_cache(self):
+        calls = []
+
+        def shared(ctx):
+            calls.append("shared")
+
+        async def a(ctx):
+            await pg.AsyncDeps(ctx, shared)
+
+        async def b(ctx):
+            await pg.AsyncDeps(ctx, shared)
+            pg.Deps(ctx, shared)
+
+        asyncio.run(pg.AsyncDeps({}, a, b, shared))
+        pg.Deps({}, shared)
+        self.assertEqual(calls, ["shared"])
+
+    def test_async_deps_reports_errors(self):
+        async def fail(ctx):
+            raise ValueError("boom")
+
+        async def ok(ctx):
+            pass
+
+        with self.assertRaisesRegex(RuntimeError, "Errors occurred in 1 targets"):
+            asyncio.run(pg.AsyncDeps({}, fail, ok))
+
+
+class TestProcessTargets(unittest.TestCase):
+    def setUp(self):
+        pg.deps._runner = Runner()
+        self.ctx = with_logger({}, new_logger("paige.test-pool"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_process_pool()
+
+    def test_runs_in_worker_process(self):
+        with self.assertLogs("paige.test-pool", level="INFO") as logs:
+            pg.Deps(self.ctx, pg.Fn(count_primes, 100), pg.Fn(count_primes, 100))
+        messages = [record.getMessage() for record in logs.records]
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith("25 primes in pid "))
+        self.assertNotEqual(messages[0].split()[-1], str(os.getpid()))
+
+    def test_errors_are_sent_back(self):
+        with self.assertLogs("paige.test-pool", level="ERROR") as logs:
+            with self.assertRaisesRegex(RuntimeError, "Errors occurred in 1 targets"):
+                pg.Deps(self.ctx, fail_in_process)
+        self.assertIn("boom in worker", "\n".join(logs.output))
+
+
+class TestPlannedDeps(unittest.TestCase):
+    def setUp(self):
+        pg.deps._runner = Runner()
+        env = patch.dict(os.environ, {"PAIGE_FAIL_FAST": "false"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_runs_prerequisites_first(self):
+        order = []
+        lock = threading.Lock()
+
+        def record(name):
+            with lock:
+                order.append(name)
+
+        def generate(ctx):
+            record("generate")
+
+        @pg.target(deps=[generate])
+        def lint(ctx):
+            record("lint")
+
+        @pg.target(deps=[generate])
+        def test(ctx):
+            record("test")
+
+        @pg.target(deps=[lint, test])
+        def ci(ctx):
+            pg.Deps(ctx, lint, test)
+            record("ci")
+
+        pg.PlannedDeps({}, ci)
+        self.assertEqual(order[0], "generate")
+        self.assertEqual(sorted(order[1:3]), ["lint", "test"])
+        self.assertEqual(order[3:], ["ci"])
+
+    def test_rejects_cycles_before_running(self):
+        calls = []
+
+        def a(ctx):
+            calls.append("a")
+
+        def b(ctx):
+            calls.append("b")
+
+        pg.target(deps=[b])(a)
+        pg.target(deps=[a])(b)
+
+        with self.assertRaisesRegex(RuntimeError, r"dependency cycle: a -> b -> a"):
+            pg.PlannedDeps({}, a)
+        self.assertEqual(calls, [])
+
+    def test_skips_dependents_of_failed_targets(self):
+        calls = []
+
+        def fail(ctx):
+            raise ValueError("boom")
+
+        def ok(ctx):
+            calls.append("ok")
+
+        def after(ctx):
+            calls.append("after")
+
+        with self.assertRaisesRegex(RuntimeError, "Errors occurred in 1 targets"):
+            pg.PlannedDeps({}, pg.Fn(after, deps=[fail]), ok)
+        self.assertEqual(calls, ["ok"])
+
+
+class TestScheduler(unittest.TestCase):
+    def test_run_all_records_errors(self):
+        scheduler = Scheduler(jobs=2)
+
+        def fail():
+            raise ValueError("boom")
+
+        tasks = scheduler.run_all([lambda: None, fail])
+        self.assertIsNone(tasks[0].error)
+        self.assertIsInstance(tasks[1].error, ValueError)
+
+    def test_run_all_propagates_system_exit(self):
+        scheduler = Scheduler(jobs=2)
+        started = threading.Event()
+
+        def wait_for_worker():
+            started.wait(5)
+
+        def exit_on_worker():
+            started.set()
+            sys.exit(3)
+
+        with self.assertRaises(SystemExit) as cm:
+            scheduler.run_all([wait_for_worker, exit_on_worker])
+        self.assertEqual(cm.exception.code, 3)
+
+        # The worker survived and keeps running tasks
+        tasks = scheduler.run_all([lambda: None, lambda: None])
+        self.assertEqual([t.error for t in tasks], [None, None])
+
+    def test_invalid_jobs(self):
+        with self.assertRaises(ValueError):
+            pg.scheduler.parse_jobs("0")
+        with self.assertRaises(ValueError):
+            pg.scheduler.parse_jobs("many")
+
+
+if __name__ == "__main__":
+    unittest.main()
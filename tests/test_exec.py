@@ -0,0 +1,402 @@
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige.deps import Runner
+from paige.logger import new_logger, with_logger
+
+
+class TestRun(unittest.TestCase):
+    def setUp(self):
+        self.ctx = with_logger({}, new_logger("paige.test-exec"))
+        pg.deps._runner = Runner()
+
+    def test_run_streams_output(self):
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            pg.run(self.ctx, "sh", "-c", "echo out; echo err >&2")
+        self.assertIn("INFO:paige.test-exec:out", logs.output)
+        self.assertIn("WARNING:paige.test-exec:err", logs.output)
+
+    def test_run_reports_stderr_tail(self):
+        with self.assertLogs("paige.test-exec", level="INFO"):
+            with self.assertRaisesRegex(RuntimeError, "^first\nsecond$"):
+                pg.run(self.ctx, "sh", "-c", "echo first >&2; echo second >&2; exit 3")
+
+    def test_run_reports_exit_code(self):
+        with self.assertRaisesRegex(RuntimeError, "sh failed with exit code 4"):
+            pg.run(self.ctx, "sh", "-c", "exit 4")
+
+    def test_grouped_output_is_flushed_per_target(self):
+        ctx = pg.context_with_grouped_output(self.ctx)
+
+        def first(ctx):
+            pg.run(ctx, "sh", "-c", "echo a1; sleep 0.05; echo a2")
+
+        def second(ctx):
+            pg.run(ctx, "sh", "-c", "echo b1; sleep 0.02; echo b2")
+
+        with self.assertLogs("paige.test-exec", level=logging.INFO) as logs:
+            pg.Deps(ctx, first, second)
+        messages = [record.getMessage() for record in logs.records]
+        self.assertIn(messages, (["a1", "a2", "b1", "b2"], ["b1", "b2", "a1", "a2"]))
+
+
+class TestLogWriter(unittest.TestCase):
+    def setUp(self):
+        pg.exec._path_cache.clear()
+
+    def test_has_file_references(self):
+        with patch("os.path.exists", return_value=True) as mock_exists:
+            self.assertTrue(pg.exec.has_file_references("src/a.py:12:3: E501"))
+            self.assertTrue(pg.exec.has_file_references("Makefile:4: missing"))
+            self.assertFalse(pg.exec.has_file_references("12:30:45 started"))
+            self.assertFalse(pg.exec.has_file_references("key: value"))
+            self.assertFalse(pg.exec.has_file_references("no colon here"))
+        self.assertEqual(mock_exists.call_count, 2)
+
+    def test_stat_results_are_cached(self):
+        with patch("os.path.exists", return_value=False) as mock_exists:
+            for i in range(1000):
+                pg.exec.has_file_references(f"a.py:{i}: not a file")
+        mock_exists.assert_called_once_with("a.py")
+
+    def test_file_reference_lines_are_written_in_one_batch(self):
+        stream = io.StringIO()
+        ctx = with_logger({}, new_logger("paige.test-exec"))
+        writer = pg.exec.LogWriter(ctx, stream)
+        with patch("os.path.exists", return_value=True):
+            with self.assertLogs("paige.test-exec", level="INFO") as logs:
+                writer.write("checking\n  a.py:1:1: E1\nb.py:2:1: E2\n")
+        self.assertEqual(
+            stream.getvalue(), "[paige.test-exec] \na.py:1:1: E1\nb.py:2:1: E2\n"
+        )
+        self.assertEqual([r.getMessage() for r in logs.records], ["checking"])
+
+
+class TestSpooledOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch("paige.exec.from_build_dir", side_effect=self.build_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ctx = pg.context_with_spooled_output(
+            with_logger({}, new_logger("paige.test-exec"))
+        )
+        pg.deps._runner = Runner()
+
+    def build_path(self, *elems):
+        return os.path.join(self.tmp.name, *elems)
+
+    def test_output_goes_to_target_log(self):
+        def noisy(ctx):
+            pg.run(ctx, "sh", "-c", "seq 1 1000")
+
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            pg.Deps(self.ctx, noisy)
+        log_path = self.build_path("logs", "noisy.log")
+        with open(log_path, "rb") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], b"$ sh -c seq 1 1000")
+        self.assertEqual(lines[1:], [str(i).encode() for i in range(1, 1001)])
+        self.assertLess(len(logs.records), 5)
+
+    def test_parallel_commands_of_a_target_keep_their_output(self):
+        errors = {}
+
+        def spool(ctx, letter):
+            script = f"for i in $(seq 1 300); do echo {letter}$i; done; exit 1"
+            try:
+                pg.run(ctx, "sh", "-c", script)
+            except RuntimeError as e:
+                errors[letter] = str(e).splitlines()[1:]
+
+        def parallel(ctx):
+            threads = [threading.Thread(target=spool, args=(ctx, c)) for c in "AB"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        pg.Deps(self.ctx, parallel)
+        for letter in "AB":
+            expected = [f"{letter}{i}" for i in range(251, 301)]
+            self.assertEqual(errors[letter], expected)
+
+        with open(self.build_path("logs", "parallel.log")) as f:
+            blocks = f.read().split("$ sh -c ")[1:]
+        self.assertEqual(len(blocks), 2)
+        for block in blocks:
+            letter = block.splitlines()[1][0]
+            self.assertEqual(
+                block.splitlines()[1:], [f"{letter}{i}" for i in range(1, 301)]
+            )
+
+    def test_failure_reports_tail(self):
+        with self.assertRaises(RuntimeError) as cm:
+            pg.run(self.ctx, "sh", "-c", "seq 1 100; exit 3")
+        message = str(cm.exception).splitlines()
+        self.assertIn("exit code 3", message[0])
+        self.assertEqual(message[-1], "100")
+        self.assertEqual(len(message), 51)
+
+    def test_output_mmap(self):
+        data = pg.output_mmap(self.ctx, "sh", "-c", "printf 'abc'")
+        self.assertEqual(data[:], b"abc")
+        data.close()
+        self.assertEqual(pg.output_mmap(self.ctx, "true"), b"")
+
+    def test_output_bytes(self):
+        cmd = pg.command(self.ctx, "printf", "\\377", text=False)
+        self.assertEqual(pg.output(cmd), b"\xff")
+
+
+class TestCommandEnv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch("paige.exec.from_paige_dir", side_effect=self.paige_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bin_dir = self.paige_path("bin")
+        os.makedirs(self.bin_dir)
+        self.env = pg.exec.CommandEnv()
+
+    def paige_path(self, *elems):
+        return os.path.join(self.tmp.name, *elems)
+
+    def install(self, name):
+        path = os.path.join(self.bin_dir, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(path, 0o755)
+        return path
+
+    def test_base_env_is_reused(self):
+        first = self.env.environ()
+        second = self.env.environ(("FOO=bar", "PATH=/opt/bin"))
+        self.assertIs(self.env.environ(), first)
+        with self.assertRaises(TypeError):
+            first["FOO"] = "bar"
+        self.assertTrue(first["PATH"].startswith(f"{self.bin_dir}:"))
+        self.assertEqual(second["FOO"], "bar")
+        self.assertEqual(second["PATH"], f"{self.bin_dir}:/opt/bin")
+        self.assertNotIn("FOO", first)
+
+    def test_environ_changes_are_seen(self):
+        self.env.environ()
+        with patch.dict(os.environ, {"PAIGE_TEST_VAR": "1"}):
+            self.assertEqual(self.env.environ()["PAIGE_TEST_VAR"], "1")
+        self.assertNotIn("PAIGE_TEST_VAR", self.env.environ())
+
+    def test_unchanged_environ_is_reused(self):
+        first = self.env.environ()
+        os.environ["PATH"] = os.environ["PATH"]
+        self.assertIs(self.env.environ(), first)
+
+    def test_executable_is_cached_until_bin_dir_changes(self):
+        env = self.env.environ()
+        sh = self.env.executable("sh", env, self.tmp.name)
+        self.assertTrue(os.path.isabs(sh))
+        with patch("shutil.which") as mock_which:
+            self.assertEqual(
+                self.env.executable("sh", self.env.environ(), self.tmp.name), sh
+            )
+        mock_which.assert_not_called()
+        self.assertIsNone(self.env.executable("./sh", env, self.tmp.name))
+
+        # Installing a tool changes the bin directory
+        os.utime(self.bin_dir, ns=(0, 0))
+        tool = self.install("sh")
+        self.assertEqual(
+            self.env.executable("sh", self.env.environ(), self.tmp.name), tool
+        )
+
+    def test_relative_path_entries_use_the_command_cwd(self):
+        tool = self.install("paige-test-tool")
+        env = {"PATH": "bin"}
+        self.assertEqual(
+            self.env.executable("paige-test-tool", env, self.tmp.name), tool
+        )
+        self.assertIsNone(self.env.executable("paige-test-tool", env, self.bin_dir))
+
+    def test_command_keeps_argv(self):
+        ctx = with_logger({}, new_logger("paige.test-exec"))
+        self.assertEqual(pg.output(pg.command(ctx, "sh", "-c", 'echo "$0"')), "sh")
+
+
+class TestAsyncRun(unittest.TestCase):
+    def setUp(self):
+        self.ctx = with_logger({}, new_logger("paige.test-exec"))
+
+    def test_async_run_streams_output(self):
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            asyncio.run(pg.async_run(self.ctx, "sh", "-c", "echo out; echo err >&2"))
+        self.assertIn("INFO:paige.test-exec:out", logs.output)
+        self.assertIn("WARNING:paige.test-exec:err", logs.output)
+
+    def test_async_run_reports_stderr_tail(self):
+        with self.assertLogs("paige.test-exec", level="INFO"):
+            with self.assertRaisesRegex(RuntimeError, "^first\nsecond$"):
+                asyncio.run(
+                    pg.async_run(
+                        self.ctx, "sh", "-c", "echo first >&2; echo second >&2; exit 3"
+                    )
+                )
+
+    def test_async_run_handles_long_lines(self):
+        script = 'print("x" * 200000); print("end")'
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            asyncio.run(pg.async_run(self.ctx, sys.executable, "-c", script))
+        self.assertEqual(
+            logs.output,
+            ["INFO:paige.test-exec:" + "x" * 200000, "INFO:paige.test-exec:end"],
+        )
+
+    def test_async_run_kills_command_on_output_error(self):
+        def fail(level, line):
+            raise ValueError("cannot log")
+
+        async def main():
+            with patch("paige.exec.get_line_logger", return_value=fail):
+                with self.assertRaisesRegex(ValueError, "cannot log"):
+                    await pg.async_run(self.ctx, "sh", "-c", "echo x; exec sleep 30")
+            return time.monotonic() - start
+
+        start = time.monotonic()
+        self.assertLess(asyncio.run(main()), 10)
+
+    def test_async_output_error_names_command(self):
+        async def main():
+            proc = await pg.async_command(self.ctx, "sh", "-c", "echo bad >&2; exit 1")
+            return await pg.async_output(proc)
+
+        with self.assertRaisesRegex(RuntimeError, "^sh failed: bad"):
+            asyncio.run(main())
+
+    def test_async_output_runs_concurrently(self):
+        async def main():
+            procs = [
+                await pg.async_command(self.ctx, "sh", "-c", f"echo {i}")
+                for i in range(20)
+            ]
+            return await asyncio.gather(*[pg.async_output(p) for p in procs])
+
+        self.assertEqual(asyncio.run(main()), [str(i) for i in range(20)])
+
+
+class TestRunMany(unittest.TestCase):
+    def setUp(self):
+        self.ctx = with_logger({}, new_logger("paige.test-exec"))
+        env = patch.dict(os.environ, {"PAIGE_FAIL_FAST": "false"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_output_is_prefixed_and_results_returned(self):
+        commands = [["sh", "-c", f"echo {i}"] for i in range(5)]
+        commands.append(
+            pg.CommandSpec("sh", "-c", "echo $X >&2", name="x", env=["X=1"])
+        )
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            results = pg.run_many(self.ctx, commands, max_parallel=2)
+        self.assertIn("INFO:paige.test-exec:[sh -c echo 3] 3", logs.output)
+        self.assertIn("WARNING:paige.test-exec:[x] 1", logs.output)
+        self.assertEqual([r.exit_code for r in results], [0] * 6)
+        self.assertEqual(results[5].output_tail, ["1"])
+        self.assertTrue(all(r.duration > 0 for r in results))
+
+    def test_failures_are_aggregated(self):
+        commands = [
+            pg.CommandSpec("sh", "-c", "echo bad; exit 2", name="a"),
+            ["true"],
+            pg.CommandSpec("sh", "-c", "exit 3", name="b"),
+        ]
+        with self.assertLogs("paige.test-exec", level="INFO"):
+            with self.assertRaises(RuntimeError) as cm:
+                pg.run_many(self.ctx, commands)
+        self.assertEqual(
+            str(cm.exception).splitlines(),
+            [
+                "2 of 3 commands failed:",
+                "[a] exit code 2",
+                "  bad",
+                "[b] exit code 3",
+            ],
+        )
+        results = pg.run_many(self.ctx, commands, check=False)
+        self.assertEqual([r.ok for r in results], [False, True, False])
+
+    def test_fail_fast_cancels_the_rest(self):
+        commands = [["sh", "-c", "exit 1"], ["sleep", "10"]] + [["true"]] * 5
+        with self.assertRaisesRegex(RuntimeError, "6 commands were cancelled"):
+            pg.run_many(self.ctx, commands, max_parallel=2, fail_fast=True)
+        results = pg.run_many(
+            self.ctx, commands, max_parallel=2, fail_fast=True, check=False
+        )
+        self.assertEqual(results[0].exit_code, 1)
+        self.assertTrue(all(r.cancelled for r in results[1:]))
+        self.assertLess(results[1].duration, 5)
+
+    def test_failure_on_its_own_is_not_cancelled(self):
+        commands = [
+            # Exits at once, but its background child keeps the output open
+            pg.CommandSpec("sh", "-c", "(sleep 0.5; echo late) & exit 2", name="a"),
+            pg.CommandSpec("sh", "-c", "sleep 0.1; exit 1", name="b"),
+        ]
+        with self.assertLogs("paige.test-exec", level="INFO") as logs:
+            results = pg.run_many(
+                self.ctx, commands, max_parallel=2, fail_fast=True, check=False
+            )
+        self.assertEqual([r.exit_code for r in results], [2, 1])
+        self.assertEqual([r.cancelled for r in results], [False, False])
+        self.assertIn("INFO:paige.test-exec:[a] late", logs.output)
+
+    def test_output_errors_are_aggregated(self):
+        def get_line_logger(ctx):
+            def log(level, line):
+                if line.endswith("boom"):
+                    raise ValueError("bad line")
+
+            return log
+
+        commands = [["sh", "-c", "echo boom; exec sleep 30"], ["true"]]
+        with patch("paige.exec.get_line_logger", get_line_logger):
+            start = time.monotonic()
+            results = pg.run_many(self.ctx, commands, max_parallel=2, check=False)
+            self.assertLess(time.monotonic() - start, 10)
+            self.assertIsInstance(results[0].error, ValueError)
+            self.assertFalse(results[0].ok)
+            self.assertFalse(results[0].cancelled)
+            self.assertTrue(results[1].ok)
+
+            with self.assertRaises(RuntimeError) as cm:
+                pg.run_many(self.ctx, commands, max_parallel=2)
+        self.assertEqual(
+            str(cm.exception).splitlines()[:2],
+            [
+                "1 of 2 commands failed:",
+                "[sh -c echo boom; exec sleep 30] ValueError: bad line",
+            ],
+        )
+
+    def test_missing_executable(self):
+        with self.assertLogs("paige.test-exec", level="INFO"):
+            results = pg.run_many(self.ctx, [["paige-no-such-command"]], check=False)
+        self.assertEqual(results[0].exit_code, 127)
+
+    def test_max_parallel_must_be_positive(self):
+        for max_parallel in (0, -1):
+            with self.assertRaises(ValueError):
+                pg.run_many(self.ctx, [["true"]], max_parallel=max_parallel)
+
+
+if __name__ == "__main__":
+    unittest.main()
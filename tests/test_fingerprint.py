@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+import paige as pg
+from paige.deps import Runner
+
+
+class TestUpToDate(unittest.TestCase):
+    def setUp(self):
+        self.original_cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        os.makedirs(os.path.join(self.root, ".git"))
+        os.makedirs(os.path.join(self.root, "src"))
+        self.write("src/a.txt", "a")
+        os.chdir(self.root)
+        pg.deps._runner = Runner()
+        self.calls = []
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.tmp.cleanup()
+
+    def write(self, path: str, content: str) -> None:
+        with open(os.path.join(self.root, path), "w") as f:
+            f.write(content)
+
+    def build_target(self):
+        @pg.target(inputs=["src/*.txt"], outputs=["out.txt"])
+        def build(ctx):
+            self.calls.append("build")
+            self.write("out.txt", "built")
+
+        return build
+
+    def run_target(self, fn) -> None:
+        pg.Fn(fn).run({})
+
+    def test_skips_when_unchanged(self):
+        build = self.build_target()
+        self.run_target(build)
+        self.run_target(build)
+        self.assertEqual(self.calls, ["build"])
+
+    def test_reruns_when_input_changes(self):
+        build = self.build_target()
+        self.run_target(build)
+        self.write("src/b.txt", "b")
+        self.run_target(build)
+        self.assertEqual(self.calls, ["build", "build"])
+
+    def test_reruns_when_output_removed(self):
+        build = self.build_target()
+        self.run_target(build)
+        os.remove(os.path.join(self.root, "out.txt"))
+        self.run_target(build)
+        self.assertEqual(self.calls, ["build", "build"])
+
+    def test_reruns_when_input_changes_during_run(self):
+        @pg.target(inputs=["src/*.txt"], outputs=["out.txt"])
+        def build(ctx):
+            self.calls.append("build")
+            self.write("out.txt", "built")
+            self.write("src/a.txt", "edited")
+
+        self.run_target(build)
+        self.run_target(build)
+        self.assertEqual(self.calls, ["build", "build"])
+
+    def test_skips_after_rewriting_own_inputs(self):
+        @pg.target(inputs=["src/*.txt"], outputs=["src/a.txt"])
+        def format(ctx):
+            self.calls.append("format")
+            self.write("src/a.txt", "formatted")
+
+        self.run_target(format)
+        self.run_target(format)
+        self.assertEqual(self.calls, ["format"])
+
+    def test_failed_run_is_not_recorded(self):
+        @pg.target(inputs=["src/*.txt"])
+        def fail(ctx):
+            self.calls.append("fail")
+            raise ValueError("boom")
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.run_target(fail)
+        self.assertEqual(self.calls, ["fail", "fail"])
+
+    def test_arguments_are_part_of_fingerprint(self):
+        def generate(ctx, name):
+            self.calls.append(name)
+
+        pg.Fn(generate, "x", inputs=["src/*.txt"]).run({})
+        pg.Fn(generate, "y", inputs=["src/*.txt"]).run({})
+        pg.Fn(generate, "x", inputs=["src/*.txt"]).run({})
+        self.assertEqual(self.calls, ["x", "y"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import logging
+import sys
+import threading
+import unittest
+import unittest.mock
+
+import paige as pg
+from paige import logger as pg_logger
+from paige.deps import Runner
+from paige.logger import (
+    append_logger_prefix,
+    flush_logs,
+    get_line_logger,
+    get_logger,
+    new_logger,
+    with_logger,
+)
+
+
+class TestLogger(unittest.TestCase):
+    def test_loggers_are_cached(self):
+        self.assertIs(new_logger("paige.test-cache"), new_logger("paige.test-cache"))
+
+    def test_append_prefix_does_not_add_handlers(self):
+        ctx = with_logger({}, new_logger("paige.test-prefix"))
+        for _ in range(10):
+            child = get_logger(append_logger_prefix(ctx, ".child"))
+        self.assertEqual(child.handlers, [pg_logger._handler])
+        self.assertEqual(child.prefix, "[paige.test-prefix] .child")
+
+    def test_parallel_lines_keep_their_order(self):
+        logger = new_logger("paige.test-queue")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            threads = [
+                threading.Thread(
+                    target=lambda i=i: [logger.info(f"{i}-{j}") for j in range(100)]
+                )
+                for i in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            flush_logs()
+        lines = stderr.getvalue().splitlines()
+        self.assertEqual(len(lines), 400)
+        for i in range(4):
+            mine = [
+                line for line in lines if line.startswith(f"[paige.test-queue] {i}-")
+            ]
+            self.assertEqual(mine, [f"[paige.test-queue] {i}-{j}" for j in range(100)])
+
+    def test_raw_lines_skip_log_records(self):
+        logger = new_logger("paige.test-raw")
+        log = get_line_logger(with_logger({}, logger))
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            with unittest.mock.patch.object(logging.Logger, "makeRecord") as make:
+                log(logging.INFO, "plain line")
+                log(logging.DEBUG, "hidden")
+                make.assert_not_called()
+            flush_logs()
+        self.assertEqual(stderr.getvalue(), "[paige.test-raw] plain line\n")
+
+    def test_lines_are_prefixed_per_logger(self):
+        ctx = with_logger({}, new_logger("paige.test-lines"))
+        lint = append_logger_prefix(ctx, "[lint] ")
+        build = append_logger_prefix(ctx, "[build] ")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            get_logger(lint).info("record\nsecond line")
+            get_line_logger(build)(logging.INFO, "raw")
+            get_logger(ctx).warning("plain")
+            flush_logs()
+        self.assertEqual(
+            stderr.getvalue().splitlines(),
+            [
+                "[paige.test-lines] [lint] record",
+                "[paige.test-lines] [lint] second line",
+                "[paige.test-lines] [build] raw",
+                "[paige.test-lines] plain",
+            ],
+        )
+
+    def test_lines_are_written_before_logging_returns(self):
+        ctx = with_logger({}, new_logger("paige.test-order"))
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            get_line_logger(ctx)(logging.INFO, "first")
+            print("second", file=sys.stderr)
+            get_logger(ctx).info("third")
+            print("fourth", file=sys.stderr)
+        self.assertEqual(
+            stderr.getvalue().splitlines(),
+            [
+                "[paige.test-order] first",
+                "second",
+                "[paige.test-order] third",
+                "fourth",
+            ],
+        )
+
+    def test_targets_log_with_their_name(self):
+        def gen(ctx):
+            get_line_logger(ctx)(logging.INFO, "generated")
+
+        def lint(ctx):
+            pg.Deps(ctx, gen)
+            get_logger(ctx).info("linted")
+
+        pg.deps._runner = Runner()
+        ctx = with_logger({}, new_logger("paige.test-targets"))
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            pg.Deps(ctx, lint)
+            get_logger(ctx).info("done")
+        self.assertEqual(
+            stderr.getvalue().splitlines(),
+            ["[gen] generated", "[lint] linted", "[paige.test-targets] done"],
+        )
+
+        # Records of targets reach the handlers of the context's logger
+        with self.assertLogs("paige.test-targets", level="INFO") as logs:
+            pg.deps._runner = Runner()
+            pg.Deps(ctx, lint)
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:paige.test-targets.gen:generated",
+                "INFO:paige.test-targets.lint:linted",
+            ],
+        )
+
+    def test_raw_lines_respect_captured_handlers(self):
+        logger = new_logger("paige.test-raw-capture")
+        log = get_line_logger(with_logger({}, logger))
+        with self.assertLogs("paige.test-raw-capture", level="INFO") as logs:
+            log(logging.WARNING, "captured")
+        self.assertEqual(logs.output, ["WARNING:paige.test-raw-capture:captured"])
+
+
+if __name__ == "__main__":
+    unittest.main()
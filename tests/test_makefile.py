@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import paige as pg
+from paige.fingerprint import atomic_write
+from paige.generate import write_if_changed
+from paige.makefile import generate_makefile_content
+from paige.parser import parse_source
+
+SOURCE = """\
+import paige as pg
+
+
+class Docker(pg.Namespace):
+    def build(self, ctx):
+        pass
+
+
+class Proto(pg.Namespace):
+    def generate(self, ctx):
+        pass
+
+
+def lint(ctx):
+    pass
+"""
+
+
+class Docker(pg.Namespace):
+    pass
+
+
+class TestMakefileContent(unittest.TestCase):
+    def setUp(self):
+        self.functions = {"paigefile": parse_source(SOURCE, "paigefile")}
+        self.main = pg.Makefile(path="Makefile")
+        self.docker = pg.Makefile(path="docker/Makefile", namespace=Docker)
+
+    def targets(self, makefile):
+        content = generate_makefile_content(
+            makefile, self.functions, "bin/paigefile", [self.main, self.docker]
+        )
+        line = next(l for l in content.splitlines() if l.startswith("paige_targets"))
+        return line.split(" := ")[1].split(), content
+
+    def test_main_makefile(self):
+        targets, content = self.targets(self.main)
+        self.assertEqual(targets, ["lint", "proto-generate"])
+        self.assertIn("paige_args_proto-generate = Proto:generate", content)
+        self.assertIn("\t$(MAKE) -f docker/Makefile", content)
+
+    def test_namespace_makefile(self):
+        targets, content = self.targets(self.docker)
+        self.assertEqual(targets, ["build"])
+        self.assertIn("paige_args_build = Docker:build", content)
+
+
+class TestWriteIfChanged(unittest.TestCase):
+    def test_unchanged_file_is_not_rewritten(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "Makefile")
+            self.assertTrue(write_if_changed(path, "all:\n"))
+            os.utime(path, ns=(0, 0))
+            self.assertFalse(write_if_changed(path, "all:\n"))
+            self.assertEqual(os.stat(path).st_mtime_ns, 0)
+            self.assertTrue(write_if_changed(path, "all: x\n"))
+            with open(path) as f:
+                self.assertEqual(f.read(), "all: x\n")
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["Makefile"])
+
+    def test_threads_writing_one_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "Makefile")
+            contents = [f"all: {i}\n" * 1000 for i in range(8)]
+            threads = [
+                threading.Thread(target=write_if_changed, args=(path, content))
+                for content in contents
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with open(path) as f:
+                self.assertIn(f.read(), contents)
+            self.assertEqual(os.listdir(tmp), ["Makefile"])
+
+    def test_failed_write_keeps_the_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "Makefile")
+            write_if_changed(path, "all:\n")
+            with self.assertRaises(ValueError):
+                with atomic_write(path) as f:
+                    f.write("half")
+                    raise ValueError("boom")
+            with open(path) as f:
+                self.assertEqual(f.read(), "all:\n")
+            self.assertEqual(os.listdir(tmp), ["Makefile"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,261 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from paige import parser
+
+SOURCE = """\
+import paige as pg
+
+
+class Docker(pg.Namespace):
+    def build(self, ctx, tag):
+        pass
+
+
+def lint(ctx):
+    pass
+
+
+def _helper(ctx):
+    pass
+"""
+
+MULTI_SOURCE = """\
+import paige as pg
+
+
+def gen(ctx):
+    print("gen")
+
+
+def lint(ctx):
+    pg.Deps(ctx, gen)
+    print("lint")
+
+
+def build(ctx, tag):
+    pg.Deps(ctx, gen)
+    print("build", tag)
+"""
+
+NAMESPACE_SOURCE = """\
+import os
+import signal
+import time
+
+import paige as pg
+
+
+class Go(pg.Namespace):
+    def lint(self, ctx):
+        print("go")
+
+
+class Py(pg.Namespace):
+    def lint(self, ctx):
+        print("py")
+
+
+def fail(ctx):
+    raise ValueError("boom")
+
+
+def stop(ctx):
+    cmd = pg.command(ctx, "sleep", "30")
+    print(cmd.pid, flush=True)
+    os.kill(os.getpid(), signal.SIGTERM)
+    time.sleep(30)
+"""
+
+
+class TestParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paige_dir = self.tmp.name
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(SOURCE)
+        patcher = patch("paige.parser.from_paige_dir", return_value=self.paige_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_parse_source(self):
+        functions = parser.parse_source(SOURCE, "paigefile")
+        self.assertEqual(
+            functions,
+            [
+                {
+                    "name": "lint",
+                    "args": ["ctx"],
+                    "module": "paigefile",
+                    "namespace": None,
+                },
+                {
+                    "name": "build",
+                    "args": ["ctx", "tag"],
+                    "module": "paigefile",
+                    "namespace": "Docker",
+                },
+            ],
+        )
+
+    def test_methods_belong_to_their_namespace(self):
+        source = SOURCE + (
+            "\n\nclass Proto(pg.Namespace):\n    def gen(self, ctx):\n        pass\n"
+            "\n\nclass Plain:\n    def run(self, ctx):\n        pass\n"
+        )
+        namespaces = {
+            f["name"]: f["namespace"] for f in parser.parse_source(source, "paigefile")
+        }
+        self.assertEqual(namespaces, {"lint": None, "build": "Docker", "gen": "Proto"})
+
+    def test_build_target_table(self):
+        table = parser.build_target_table(
+            {"paigefile": parser.parse_source(SOURCE, "paigefile")}
+        )
+        self.assertEqual(
+            table,
+            {
+                "lint": ("paigefile", None, "lint", 0),
+                "Docker:build": ("paigefile", "Docker", "build", 1),
+            },
+        )
+
+    def test_generated_file_imports_modules_lazily(self):
+        content = parser.generate_init_file(
+            {"paigefile": parser.parse_source(SOURCE, "paigefile")}, []
+        )
+        self.assertNotIn("import paigefile", content)
+        compile(content, "paigefile", "exec")
+
+    def test_fingerprint_roundtrip(self):
+        functions = {"paigefile": parser.parse_source(SOURCE, "paigefile")}
+        path = os.path.join(self.paige_dir, "paigefile.bin")
+        with open(path, "w") as f:
+            f.write(parser.generate_init_file(functions, [], "abc123"))
+        self.assertEqual(parser.read_fingerprint(path), "abc123")
+        parser.validate_init_file(parser.generate_init_file(functions, []), functions)
+
+    def test_parse_python_files_uses_cache(self):
+        first = parser.parse_python_files()
+        with patch("paige.parser.parse_source") as mock_parse_source:
+            second = parser.parse_python_files()
+            mock_parse_source.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_parse_python_files_reparses_changed_files(self):
+        parser.parse_python_files()
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "a") as f:
+            f.write("\n\ndef test(ctx):\n    pass\n")
+        names = [f["name"] for f in parser.parse_python_files()["paigefile"]]
+        self.assertIn("test", names)
+
+    def test_generated_file_runs_several_targets(self):
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(MULTI_SOURCE)
+        functions = parser.parse_python_files()
+        os.makedirs(os.path.join(self.paige_dir, "bin"))
+        path = os.path.join(self.paige_dir, "bin", "paigefile")
+        with open(path, "w") as f:
+            f.write(parser.generate_init_file(functions, []))
+
+        env = dict(os.environ, PAIGE_DAEMON="false")
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        result = subprocess.run(
+            [sys.executable, path, "lint", "build", "v1", "lint"],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["gen", "lint", "build", "v1"])
+
+        result = subprocess.run(
+            [sys.executable, path, "lint", "build"],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("wrong number of arguments to build", result.stdout)
+
+    def test_generated_file_runs_same_named_namespace_methods(self):
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(NAMESPACE_SOURCE)
+        result = self.run_generated_file("Go:lint", "Py:lint", "Go:lint")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["go", "py"])
+
+    def test_generated_file_shows_the_target_error(self):
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(NAMESPACE_SOURCE)
+        result = self.run_generated_file("fail")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('raise ValueError("boom")', result.stderr)
+        self.assertIn("ValueError: boom", result.stderr)
+        self.assertNotIn("Errors occurred", result.stderr)
+        self.assertEqual(result.stderr.count("Error in fail"), 1)
+
+    def test_generated_file_stops_commands_on_sigterm(self):
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(NAMESPACE_SOURCE)
+        result = self.run_generated_file("stop")
+        self.assertEqual(result.returncode, -15, result.stderr)
+        pid = int(result.stdout)
+        with self.assertRaises(ProcessLookupError):
+            # Reaped by init once it was stopped
+            for _ in range(100):
+                os.kill(pid, 0)
+                time.sleep(0.05)
+
+    def run_generated_file(self, *args):
+        functions = parser.parse_python_files()
+        path = os.path.join(self.paige_dir, "paigefile.bin")
+        with open(path, "w") as f:
+            f.write(parser.generate_init_file(functions, []))
+        env = dict(os.environ, PAIGE_DAEMON="false")
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        return subprocess.run(
+            [sys.executable, path, *args], capture_output=True, text=True, env=env
+        )
+
+    def test_generated_file_sets_job_limit(self):
+        with open(os.path.join(self.paige_dir, "paigefile.py"), "w") as f:
+            f.write(
+                "import os\n\n\ndef jobs(ctx):\n    print(os.environ['PAIGE_JOBS'])\n"
+            )
+        functions = parser.parse_python_files()
+        path = os.path.join(self.paige_dir, "paigefile.bin")
+        with open(path, "w") as f:
+            f.write(parser.generate_init_file(functions, []))
+
+        env = dict(os.environ, PAIGE_DAEMON="false")
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        for option in (["-j", "3"], ["-j3"], ["--jobs", "3"], ["--jobs=3"]):
+            result = subprocess.run(
+                [sys.executable, path, *option, "jobs"],
+                capture_output=True,
+                text=True,
+                env=env,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout, "3\n")
+
+        for option in (["-j"], ["--jobs="], ["-j0"], ["-j", "jobs"]):
+            result = subprocess.run(
+                [sys.executable, path, *option],
+                capture_output=True,
+                text=True,
+                env=env,
+            )
+            self.assertEqual(result.returncode, 1, option)
+            self.assertIn("needs a job limit of at least 1", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
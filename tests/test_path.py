@@ -1,6 +1,7 @@
 import unittest
 import os
 import subprocess
+import tempfile
 
 import paige as pg
 from paige.const import PAIGE_DIR_NAME
@@ -9,11 +10,12 @@ from unittest.mock import patch
 
 class TestPathFunctions(unittest.TestCase):
     def setUp(self):
+        pg.path.invalidate_path_cache()
         self.test_git_root = "/tmp/test_git_root"
         os.makedirs(self.test_git_root, exist_ok=True)
 
     def tearDown(self):
-        pass
+        pg.path.invalidate_path_cache()
 
     def test_from_work_dir(self):
         cwd = os.getcwd()
@@ -22,12 +24,44 @@ class TestPathFunctions(unittest.TestCase):
         expected_path = os.path.join(cwd, *test_subdir_file)
         self.assertEqual(pg.path.from_work_dir(*test_subdir_file), expected_path)
 
+    def test_from_git_root_walks_to_dot_git(self):
+        with tempfile.TemporaryDirectory() as root:
+            root = os.path.realpath(root)
+            os.makedirs(os.path.join(root, ".git"))
+            subdir = os.path.join(root, "a", "b")
+            os.makedirs(subdir)
+            with (
+                patch("os.getcwd", return_value=subdir),
+                patch("subprocess.check_output") as mock_check_output,
+            ):
+                self.assertEqual(
+                    pg.path.from_git_root("file.txt"), os.path.join(root, "file.txt")
+                )
+                mock_check_output.assert_not_called()
+
     @patch("subprocess.check_output")
-    def test_from_git_root_success(self, mock_check_output):
+    def test_from_git_root_caches_result(self, mock_check_output):
         mock_check_output.return_value = self.test_git_root.encode("utf-8")
-        test_subdir_file = ("subdir", "file.txt")
-        expected_path = os.path.join(self.test_git_root, *test_subdir_file)
-        self.assertEqual(pg.path.from_git_root(*test_subdir_file), expected_path)
+        with tempfile.TemporaryDirectory() as cwd, patch("os.getcwd", return_value=cwd):
+            pg.path.from_git_root()
+            pg.path.from_git_root("other")
+            mock_check_output.assert_called_once()
+            pg.path.invalidate_path_cache()
+            pg.path.from_git_root()
+            self.assertEqual(mock_check_output.call_count, 2)
+
+    @patch("subprocess.check_output")
+    def test_from_git_root_falls_back_to_git(self, mock_check_output):
+        mock_check_output.return_value = self.test_git_root.encode("utf-8")
+        with tempfile.TemporaryDirectory() as root:
+            # A .git file marks a worktree or submodule
+            open(os.path.join(root, ".git"), "w").close()
+            with patch("os.getcwd", return_value=root):
+                test_subdir_file = ("subdir", "file.txt")
+                expected_path = os.path.join(self.test_git_root, *test_subdir_file)
+                self.assertEqual(
+                    pg.path.from_git_root(*test_subdir_file), expected_path
+                )
         mock_check_output.assert_called_once_with(
             ["git", "rev-parse", "--show-toplevel"], stderr=subprocess.DEVNULL
         )
@@ -37,10 +71,11 @@ class TestPathFunctions(unittest.TestCase):
         mock_check_output.side_effect = subprocess.CalledProcessError(
             returncode=1, cmd=["git", "rev-parse", "--show-toplevel"]
         )
-        with self.assertRaisesRegex(
-            Exception, "Not in a git repository or git command failed."
-        ):
-            pg.path.from_git_root()
+        with tempfile.TemporaryDirectory() as cwd, patch("os.getcwd", return_value=cwd):
+            with self.assertRaisesRegex(
+                Exception, "Not in a git repository or git command failed."
+            ):
+                pg.path.from_git_root()
 
     @patch("os.makedirs")
     @patch("os.path.exists")
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige import report
+from paige.deps import Runner
+
+
+class TestRunRecorder(unittest.TestCase):
+    def test_critical_path_and_slack(self):
+        recorder = report.RunRecorder()
+        # root waits on a fast and a slow dependency running in parallel
+        recorder.add_timing("root", 0.0, 5.0)
+        recorder.add_timing("fast", 1.0, 2.0)
+        recorder.add_timing("slow", 1.0, 4.0)
+        recorder.add_edge("root", "fast")
+        recorder.add_edge("root", "slow")
+
+        result = recorder.report(jobs=2)
+        self.assertEqual(result["critical_path"], ["root", "slow"])
+        self.assertAlmostEqual(result["critical_path_time"], 5.0)
+        self.assertAlmostEqual(result["targets"]["root"]["own_time"], 2.0)
+        self.assertAlmostEqual(result["targets"]["slow"]["slack"], 0.0)
+        self.assertAlmostEqual(result["targets"]["fast"]["slack"], 2.0)
+        self.assertAlmostEqual(result["average_concurrency"], 6.0 / 5.0)
+        self.assertAlmostEqual(result["efficiency"], 0.6)
+
+    def test_format_report(self):
+        recorder = report.RunRecorder()
+        recorder.add_timing("a", 0.0, 1.0)
+        lines = report.format_report(recorder.report(jobs=4))
+        self.assertTrue(lines[0].startswith("critical path (1.00s"))
+        self.assertIn("of 4 jobs", lines[-1])
+
+
+class TestReportEnv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "report.json")
+        patcher = patch.dict(os.environ, {report.REPORT_ENV: self.path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        report.reset_recorder()
+        self.addCleanup(report.reset_recorder)
+        pg.deps._runner = Runner()
+
+    def test_records_deps_edges(self):
+        def leaf(ctx):
+            time.sleep(0.02)
+
+        def quick(ctx):
+            pass
+
+        def root(ctx):
+            pg.Deps(ctx, leaf, quick)
+
+        pg.Deps({}, root)
+        report.write_report()
+        with open(self.path) as f:
+            result = json.load(f)
+        self.assertEqual(result["critical_path"], ["root([])", "leaf([])"])
+        self.assertEqual(
+            sorted(result["targets"]["root([])"]["dependencies"]),
+            ["leaf([])", "quick([])"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
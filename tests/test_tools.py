@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige import tools
+from paige.deps import Runner
+
+
+def make_archive(path: str, name: str, content: bytes) -> str:
+    """Write a tar.gz holding an executable name/bin/name and return its sha256."""
+    with tarfile.open(path, "w:gz") as tar:
+        info = tarfile.TarInfo(f"{name}/bin/{name}")
+        info.size = len(content)
+        info.mode = 0o755
+        tar.addfile(info, io.BytesIO(content))
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class TestTool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        for name in ("from_tools_dir", "from_bin_dir"):
+            patcher = patch(f"paige.tools.{name}", side_effect=self.paige_path(name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.mirror = os.path.join(self.root, "mirror")
+        os.makedirs(self.mirror)
+        self.archive = os.path.join(self.mirror, "hello-1.0.tar.gz")
+        self.sha256 = make_archive(self.archive, "hello", b"#!/bin/sh\necho hello\n")
+        pg.deps._runner = Runner()
+
+    def paige_path(self, name):
+        base = os.path.join(self.root, ".paige", name[len("from_") : -len("_dir")])
+
+        def resolve(*elems):
+            path = os.path.join(base, *elems)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return path
+
+        return resolve
+
+    def test_installs_from_local_path(self):
+        path = pg.tool({}, "hello", "1.0", self.archive, self.sha256)
+        self.assertEqual(path, os.path.join(self.root, ".paige", "bin", "hello"))
+        self.assertTrue(os.access(path, os.X_OK))
+        store = os.path.join(self.root, ".paige", "tools", "store", self.sha256)
+        self.assertTrue(
+            os.path.samefile(path, os.path.join(store, "hello", "bin", "hello"))
+        )
+
+    def test_installs_from_mirror(self):
+        url = "https://example.invalid/releases/v{version}/hello-{version}.tar.gz"
+        with patch.dict(os.environ, {tools.MIRROR_ENV: f"file://{self.mirror}"}):
+            path = pg.tool({}, "hello", "1.0", url, self.sha256)
+        self.assertTrue(os.path.exists(path))
+
+    def test_rejects_checksum_mismatch(self):
+        with self.assertRaisesRegex(RuntimeError, "Errors occurred"):
+            pg.tool({}, "hello", "1.0", self.archive, "0" * 64)
+        store = os.path.join(self.root, ".paige", "tools", "store")
+        self.assertFalse(os.path.exists(os.path.join(store, "0" * 64)))
+
+    def test_concurrent_installs_fetch_once(self):
+        fetched = []
+        fetch = tools.Tool._fetch_and_unpack
+
+        def counting_fetch(self, unpacked):
+            fetched.append(unpacked)
+            fetch(self, unpacked)
+
+        installs = [
+            tools.Tool("hello", "1.0", self.archive, self.sha256) for _ in range(2)
+        ]
+        with patch.object(tools.Tool, "_fetch_and_unpack", counting_fetch):
+            threads = [threading.Thread(target=t.install, args=({},)) for t in installs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(fetched), 1)
+
+    def test_shared_store(self):
+        shared = os.path.join(self.root, "shared")
+        with patch.dict(os.environ, {tools.STORE_ENV: shared}):
+            pg.tool({}, "hello", "1.0", self.archive, self.sha256)
+        self.assertTrue(os.path.isdir(os.path.join(shared, self.sha256)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige import trace
+from paige.deps import Runner
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "trace.json")
+        patcher = patch.dict(os.environ, {trace.TRACE_ENV: self.path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        trace.reset_tracer()
+        self.addCleanup(trace.reset_tracer)
+        pg.deps._runner = Runner()
+
+    def events(self):
+        trace.save_trace()
+        with open(self.path) as f:
+            return json.load(f)["traceEvents"]
+
+    def test_records_targets_and_deduplicated_runs(self):
+        def shared(ctx):
+            pass
+
+        def a(ctx):
+            pg.Deps(ctx, shared)
+
+        pg.Deps({}, a, shared)
+        events = self.events()
+        spans = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(
+            sorted(e["args"]["id"] for e in spans), ["a([])", "shared([])"]
+        )
+        instants = [e for e in events if e["ph"] == "i"]
+        self.assertEqual([e["args"]["id"] for e in instants], ["shared([])"])
+        self.assertTrue(any(e["ph"] == "M" for e in events))
+        for span in spans:
+            self.assertGreaterEqual(span["dur"], 0)
+
+    def test_records_commands(self):
+        with patch("paige.exec.from_git_root", return_value=self.tmp.name):
+            self.assertEqual(pg.output(pg.command({}, "sh", "-c", "echo hi")), "hi")
+            with self.assertRaises(RuntimeError):
+                pg.run({}, "sh", "-c", "exit 2")
+        commands = [e for e in self.events() if e.get("cat") == "command"]
+        self.assertEqual(
+            [(e["args"]["argv"], e["args"]["exit_code"]) for e in commands],
+            [(["sh", "-c", "echo hi"], 0), (["sh", "-c", "exit 2"], 2)],
+        )
+
+    def test_disabled_without_env(self):
+        with patch.dict(os.environ, {trace.TRACE_ENV: ""}):
+            trace.reset_tracer()
+            self.assertIsNone(trace.get_tracer())
+            pg.Deps({}, lambda ctx: None)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
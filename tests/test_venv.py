@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import paige as pg
+from paige import venv
+from paige.generate import write_venv_bootstrap
+from paige.makefile import generate_makefile_content
+
+# Stands in for uv, logging the commands it was run with
+FAKE_UV = f"""\
+#!/bin/sh
+echo "$@" >> "$UV_LOG"
+case "$1" in
+python) echo "{sys.executable}" ;;
+venv) mkdir -p "$5/bin" && ln -sf "$4" "$5/bin/python" ;;
+sync) echo "$(cat pyproject.toml)" > "$VIRTUAL_ENV/installed" ;;
+esac
+"""
+
+
+class TestVenv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paige_dir = os.path.join(self.tmp.name, ".paige")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        bin_dir = os.path.join(self.tmp.name, "fake-bin")
+        os.makedirs(bin_dir)
+        os.makedirs(self.paige_dir)
+        with open(os.path.join(bin_dir, "uv"), "w") as f:
+            f.write(FAKE_UV)
+        os.chmod(os.path.join(bin_dir, "uv"), 0o755)
+        self.uv_log = os.path.join(self.tmp.name, "uv.log")
+        self.write_pyproject("a")
+
+        patcher = patch.dict(
+            os.environ,
+            {
+                "PATH": f"{bin_dir}:{os.environ['PATH']}",
+                "UV_LOG": self.uv_log,
+                venv.VENV_CACHE_ENV: self.cache_dir,
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_pyproject(self, content):
+        with open(os.path.join(self.paige_dir, "pyproject.toml"), "w") as f:
+            f.write(content)
+
+    def uv_calls(self):
+        """The uv commands run, other than uv python find, which every sync runs."""
+        try:
+            with open(self.uv_log) as f:
+                calls = [line.split()[0] for line in f]
+        except FileNotFoundError:
+            return []
+        return [call for call in calls if call != "python"]
+
+    def read_tree(self, root):
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(directory, name)
+                if not os.path.islink(path):
+                    with open(path) as f:
+                        files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_sync_restore_and_update(self):
+        self.assertEqual(venv.sync_venv(self.paige_dir), "synced")
+        self.assertEqual(self.uv_calls(), ["venv", "sync"])
+        self.assertEqual(venv.sync_venv(self.paige_dir), "up to date")
+
+        # A fresh checkout links in the cached environment without uv
+        installed = os.path.join(self.paige_dir, ".venv", "installed")
+        inode = os.stat(installed).st_ino
+        subprocess.run(["rm", "-rf", os.path.join(self.paige_dir, ".venv")])
+        self.assertEqual(venv.sync_venv(self.paige_dir), "restored")
+        self.assertEqual(self.uv_calls(), ["venv", "sync"])
+        self.assertEqual(os.stat(installed).st_ino, inode)
+        python = os.path.join(self.paige_dir, ".venv", "bin", "python")
+        self.assertTrue(os.path.islink(python))
+
+        # A changed project syncs the existing environment and caches it too
+        entry = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        cached = self.read_tree(entry)
+        self.write_pyproject("b")
+        self.assertEqual(venv.sync_venv(self.paige_dir), "synced")
+        self.assertEqual(self.uv_calls(), ["venv", "sync", "sync"])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        with open(installed) as f:
+            self.assertEqual(f.read(), "b\n")
+
+        # The entry the environment was restored from is unchanged
+        self.assertEqual(self.read_tree(entry), cached)
+        self.assertEqual(cached["installed"], "a\n")
+
+    def test_python_from_requires_python(self):
+        self.write_pyproject('[project]\nrequires-python = ">=3.8"\n')
+        self.assertEqual(venv.sync_venv(self.paige_dir), "synced")
+        with open(self.uv_log) as f:
+            self.assertIn("python find --system >=3.8\n", f.readlines())
+        python = os.path.join(self.paige_dir, ".venv", "bin", "python")
+        self.assertEqual(os.readlink(python), os.path.realpath(sys.executable))
+
+    def test_cache_can_be_turned_off(self):
+        with patch.dict(os.environ, {venv.VENV_CACHE_ENV: "off"}):
+            self.assertEqual(venv.sync_venv(self.paige_dir), "synced")
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_makefile_rule(self):
+        makefile = pg.Makefile(path=os.path.join(self.tmp.name, "Makefile"))
+        content = generate_makefile_content(makefile, {}, "bin/paigefile")
+        with open(makefile.path, "w") as f:
+            f.write(content)
+        write_venv_bootstrap(self.paige_dir)
+        self.assertNotIn("define", content)
+        ready = os.path.join(self.paige_dir, ".venv", venv.FINGERPRINT_FILE)
+        pyproject = os.path.join(self.paige_dir, "pyproject.toml")
+        for expected in ("synced", "up to date"):
+            # Pretend pyproject.toml changed, e.g. in a fresh checkout
+            out = subprocess.run(
+                ["make", "-s", "-f", makefile.path, ready, "-W", pyproject],
+                cwd=self.tmp.name,
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(out.returncode, 0, out.stderr)
+            self.assertEqual(out.stdout, f"Paige Python environment: {expected}\n")
+        self.assertEqual(
+            subprocess.run(["make", "-q", "-f", makefile.path, ready]).returncode, 0
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()